@@ -0,0 +1,81 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import URLPattern
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from ShortenerIndex.async_views import AsyncView
+from .views import list_links_data, retrieve_link_data, conditional_headers
+
+
+class AsyncReadView(AsyncView):
+    """
+    Serves JSON GET requests of the API natively in the event loop, only the database query runs in a thread.
+    Every other request (writes, browsable API) is passed to the wrapped sync DRF view.
+    """
+    sync_view = None
+    renderer = JSONRenderer()
+
+    def is_plain_json_read(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if request.GET.get('format', 'json') != 'json':
+            return False
+        return 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.is_plain_json_read(request):
+            return await self.get(request, *args, **kwargs)
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    def render(self, data, status=200, etag=None):
+        if etag is not None and data is None:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(self.renderer.render(data), status=status, content_type='application/json')
+        if etag is not None:
+            for header, value in conditional_headers(etag).items():
+                response[header] = value
+        return response
+
+
+class AsyncLinkListView(AsyncReadView):
+    async def get(self, request):
+        try:
+            # Paginator reads query parameters of DRF request
+            etag, data = await sync_to_async(list_links_data)(Request(request))
+        except NotFound as error:
+            return self.render({'detail': error.detail}, status=404)
+        return self.render(data, etag=etag)
+
+
+class AsyncLinkDetailView(AsyncReadView):
+    async def get(self, request, pk):
+        etag, data = await sync_to_async(retrieve_link_data)(request, pk)
+        if etag is None:
+            return HttpResponse(status=404)
+        return self.render(data, etag=etag)
+
+
+ASYNC_READ_VIEWS = {
+    'links-list': AsyncLinkListView,
+    'links-detail': AsyncLinkDetailView,
+}
+
+
+def with_async_reads(urlpatterns):
+    """
+    Replaces views of router generated url patterns with their async variants, keeping the original
+    views for the non read requests. Patterns without async variant are returned unchanged.
+    """
+    replaced = []
+    for pattern in urlpatterns:
+        view_class = ASYNC_READ_VIEWS.get(pattern.name) if isinstance(pattern, URLPattern) else None
+        if view_class is not None:
+            callback = view_class.as_view(sync_view=pattern.callback)
+            # csrf_exempt decorator would hide the coroutine function, DRF views are exempt as well
+            callback.csrf_exempt = True
+            pattern = URLPattern(pattern.pattern, callback, pattern.default_args, pattern.name)
+        replaced.append(pattern)
+    return replaced
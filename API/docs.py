@@ -0,0 +1,214 @@
+"""
+OpenAPI documentation of the API. Imported by API.urls only if API_DOCS_ENABLED is set,
+so workers serving the API without docs never import drf_yasg.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import etag
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, yaml_sane_dump
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+from .pagination import LinkCursorPagination
+from .serializers import LinkSerializer
+from .views import LinkViewSet
+
+
+api_info = openapi.Info(
+    title="LinkShortener API",
+    default_version='v1',
+    description="Documentation for Rest API of the LinkShortener application.",
+)
+
+cursor = openapi.Parameter('cursor', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                           description='Opaque cursor taken from "next" or "previous" link of the previous page')
+page_size = openapi.Parameter('page_size', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f'Number of links on the page, at most {LinkCursorPagination.max_page_size}')
+export_format = openapi.Parameter('format', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['jsonl', 'csv'],
+                                  description='Format of the export, overrides Accept header')
+
+# Arguments of swagger_auto_schema for actions of LinkViewSet
+LINK_VIEWSET_DOCS = {
+    'retrieve': dict(
+        type=openapi.TYPE_STRING,
+        parameters=['url_input'],
+        name='url_input',
+        operation_description='Returns details of single Link of the user making the request. ' +
+                              'In the field "ID" input the "url_output" value of the specific shortened link.',
+        responses={
+            200: LinkSerializer(many=True),
+            404: "Link not found"
+        },
+        tags=['Links'],
+    ),
+    'list': dict(
+        type=openapi.TYPE_STRING,
+        manual_parameters=[cursor, page_size],
+        responses={
+            200: openapi.Response('Page of links, ordered from the oldest', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'next': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI, x_nullable=True),
+                    'previous': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI,
+                                               x_nullable=True),
+                    'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Items(type='object')),
+                })),
+            404: 'Invalid cursor'
+        },
+        tags=['Links'],
+    ),
+    'export': dict(
+        method='get',
+        manual_parameters=[export_format],
+        operation_description='Streams all links of the user making the request, ordered from the oldest, ' +
+                              'as JSON lines or CSV with a header row.',
+        responses={
+            200: openapi.Response('Links of the user, one per line',
+                                  openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_BINARY)),
+            406: 'Not acceptable'
+        },
+        tags=['Links'],
+    ),
+    'create': dict(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['url_input'],
+            properties={
+                'url_input': openapi.Schema(type=openapi.TYPE_STRING),
+                'duration': openapi.Schema(type=openapi.TYPE_INTEGER, description='Lifetime of the link in hours')
+            }),
+        responses={
+            200: openapi.Response('Existing link of the user to the same destination', LinkSerializer),
+            201: LinkSerializer(many=True),
+            400: 'Bad request',
+            403: 'Forbidden'
+        },
+        tags=['Links'],
+    ),
+    'batch': dict(
+        method='post',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['url_inputs'],
+            properties={
+                'url_inputs': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                'duration': openapi.Schema(type=openapi.TYPE_INTEGER, description='Lifetime of links in hours')
+            }),
+        responses={
+            201: LinkSerializer(many=True),
+            400: 'Bad request',
+            403: 'Forbidden'
+        },
+        tags=['Links'],
+    ),
+    'destroy': dict(
+        operation_description='Deletes a link of the user making the request and updates users url_count value. ' +
+                              'In the field ID input the url_output of the specific shortened link.',
+        responses={
+            204: "No content",
+            404: "Not found"
+        },
+        tags=['Links'],
+    ),
+}
+
+
+def document_viewset(viewset, docs):
+    """
+    Applies swagger_auto_schema to actions of the viewset, like the decorator would on their definitions.
+    """
+    for action_name, arguments in docs.items():
+        swagger_auto_schema(**arguments)(getattr(viewset, action_name))
+
+
+document_viewset(LinkViewSet, LINK_VIEWSET_DOCS)
+
+
+schema_view = get_schema_view(
+    api_info,
+    public=True,
+    permission_classes=[permissions.AllowAny],
+)
+
+
+class APISchema:
+    """
+    Rendered OpenAPI schema, generated once per process on first request, or loaded from API_SCHEMA_FILE
+    created by generate_api_schema command. Schema is generated without request, so it never depends
+    on Host header of the request that happened to generate it, swagger UI uses host of the page.
+    """
+    def __init__(self, schema_file=None):
+        self.schema_file = schema_file
+        self._documents = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(schema_file=settings.API_SCHEMA_FILE)
+
+    @staticmethod
+    def generate():
+        """
+        Returns schema of the API as plain JSON compatible data.
+        """
+        schema = OpenAPISchemaGenerator(api_info).get_schema(request=None, public=True)
+        return json.loads(OpenAPICodecJson(validators=[]).encode(schema))
+
+    def _render(self):
+        if self.schema_file:
+            with open(self.schema_file) as file:
+                schema = json.load(file)
+        else:
+            schema = self.generate()
+        documents = {}
+        for format, document, content_type in (
+                ('.json', json.dumps(schema, indent=4).encode(), 'application/json'),
+                ('.yaml', yaml_sane_dump(schema, binary=True), 'application/yaml')):
+            documents[format] = (document, content_type, hashlib.sha256(document).hexdigest()[:32])
+        return documents
+
+    def get(self, format):
+        """
+        Returns (document, content type, ETag) of the schema in format ".json" or ".yaml".
+        """
+        if self._documents is None:
+            with self._lock:
+                if self._documents is None:
+                    self._documents = self._render()
+        return self._documents[format]
+
+
+_api_schema = None
+_api_schema_lock = threading.Lock()
+
+
+def get_api_schema():
+    """
+    Returns schema shared by the whole worker process, creates it on first use.
+    """
+    global _api_schema
+    if _api_schema is None:
+        with _api_schema_lock:
+            if _api_schema is None:
+                _api_schema = APISchema.from_settings()
+    return _api_schema
+
+
+def schema_etag(request, format):
+    return get_api_schema().get(format)[2]
+
+
+@etag(schema_etag)
+def schema_document_view(request, format):
+    """
+    Serves the precomputed schema, answers 304 to clients which already have it.
+    """
+    document, content_type, _ = get_api_schema().get(format)
+    return HttpResponse(document, content_type=f'{content_type}; charset=utf-8')
@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework.renderers import JSONRenderer
+
+from API.serializers import LinkSerializer
+from API.views import link_rows
+from ShortenerIndex.models import Link, Client
+
+
+class Command(BaseCommand):
+    help = ('Compares time of fetching and rendering links to JSON with LinkSerializer and with its row '
+            'serializer fast path. Runs on a fresh test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000],
+                            help='Numbers of serialized links.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='How many times every variant is measured.')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            client = Client.objects.create(client_address='127.0.0.1', urls_count=0)
+            created = 0
+            for rows in sorted(options['rows']):
+                Link.objects.bulk_create([Link(url_input='www.example.com', url_output=f'bench{number}',
+                                               client=client, hits=number)
+                                          for number in range(created, rows)])
+                created = rows
+                queryset = Link.objects.filter(client=client).order_by('id')[:rows]
+
+                variants = {
+                    'LinkSerializer': lambda: renderer.render(LinkSerializer(queryset.all(), many=True).data),
+                    'RowSerializer': lambda: renderer.render(link_rows.to_representation_many(
+                        queryset.values_list(*link_rows.sources))),
+                }
+                outputs = {name: variant() for name, variant in variants.items()}
+                if len(set(outputs.values())) != 1:
+                    self.stdout.write(self.style.ERROR(f"Outputs differ for {rows} rows"))
+
+                medians = {name: self.measure(variant, options['repeat']) for name, variant in variants.items()}
+                self.stdout.write(f"{rows} rows: " + ", ".join(f"{name} {median:.2f} ms"
+                                                               for name, median in medians.items()) +
+                                  f", speedup {medians['LinkSerializer'] / medians['RowSerializer']:.1f}x")
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    @staticmethod
+    def measure(variant, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            variant()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
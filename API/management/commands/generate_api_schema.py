@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Writes OpenAPI schema of the API to a JSON file. Point API_SCHEMA_FILE setting to the file, '
+            'so workers serve it instead of generating the schema on first request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the written JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            from API.docs import APISchema
+        except ImportError as error:
+            raise CommandError(f"Schema can't be generated without drf_yasg: {error}")
+
+        with open(options['output'], 'w') as file:
+            json.dump(APISchema.generate(), file, indent=4)
+        self.stdout.write(self.style.SUCCESS(f"Schema written to {options['output']}"))
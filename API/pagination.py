@@ -0,0 +1,28 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class LinkCursorPagination(CursorPagination):
+    """
+    Paginates links by (creation_date, id) with opaque cursors, using index on client, creation_date and id.
+    Unlike page numbers it doesn't count rows nor skip them with OFFSET, so every page costs the same.
+    Page size defaults to PAGE_SIZE of REST_FRAMEWORK setting and can be changed with page_size parameter.
+    """
+    ordering = ('creation_date', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_paginated_data(self, data):
+        """
+        Returns page data without wrapping it in response, shared by sync and async views.
+        """
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders list of serialized rows as CSV lines. Used by streamed exports, which call header once
+    and render for every chunk of rows.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def header(self, fields):
+        return self.render([dict(zip(fields, fields))], renderer_context={'fields': fields})
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors are single objects
+        data = [data] if isinstance(data, dict) else data
+        if not data:
+            return b''
+        # Columns are in order of the fields, or of keys of the first row
+        fields = (renderer_context or {}).get('fields') or list(data[0])
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fields)
+        writer.writerows(data)
+        return output.getvalue().encode(self.charset)
+
+
+class JSONLinesRenderer(BaseRenderer):
+    """
+    Renders list of serialized rows as JSON lines, one object per line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def header(self, fields):
+        return b''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = [data] if isinstance(data, dict) else data
+        return ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in data).encode(self.charset)
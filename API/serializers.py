@@ -1,9 +1,65 @@
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings, ISO_8601
+
 from ShortenerIndex.models import Link
 
 
 class LinkSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Link
-        fields = ('url_input', 'url_output', 'creation_date')
+        fields = ('url_input', 'url_output', 'creation_date', 'hits', 'duration', 'expiration_date')
+        read_only_fields = ('hits', 'expiration_date')
+        extra_kwargs = {'duration': {'write_only': True}}
+
+
+class RowSerializer:
+    """
+    Read only fast path of a model serializer, for list and retrieve views. Serializes rows of
+    values_list(*row_serializer.sources) with formatters prepared once per field, without model instances
+    and DRF field objects, producing the same data as the wrapped serializer.
+    Fields without fast formatter fall back to their to_representation.
+    """
+    def __init__(self, serializer_class):
+        fields = [field for field in serializer_class().fields.values() if not field.write_only]
+        self.sources = tuple(field.source for field in fields)
+        self.names = tuple(field.field_name for field in fields)
+        self.formatters = tuple(self.get_formatter(field) for field in fields)
+
+    @staticmethod
+    def get_formatter(field):
+        """
+        Returns function formatting not None value of the field in the given timezone,
+        or None if value is used as it is.
+        """
+        if isinstance(field, serializers.DateTimeField):
+            if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() == ISO_8601 and \
+                    getattr(field, 'timezone', None) is None:
+                return format_iso_datetime
+        elif isinstance(field, (serializers.CharField, serializers.IntegerField)):
+            # Database already returns str and int values
+            return None
+        return lambda value, zone: field.to_representation(value)
+
+    def to_representation(self, row):
+        return self.to_representation_many([row])[0]
+
+    def to_representation_many(self, rows):
+        # Current timezone is looked up once, it is slower than formatting of a date
+        zone = timezone.get_current_timezone()
+        names, formatters = self.names, self.formatters
+        return [{name: value if value is None or formatter is None else formatter(value, zone)
+                 for name, formatter, value in zip(names, formatters, row)}
+                for row in rows]
+
 
+def format_iso_datetime(value, zone):
+    """
+    Same output as DateTimeField.to_representation with default ISO 8601 format.
+    """
+    if value.tzinfo is not None and value.tzinfo is not zone:
+        value = value.astimezone(zone)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
@@ -1,7 +1,14 @@
+import json
+from datetime import timedelta
+
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
+from API.renderers import JSONLinesRenderer
+from API.views import export_chunks, link_rows
 from ShortenerIndex.models import Link, Client
+from ShortenerIndex.utils.rate_limit import get_rate_limiter
+from ShortenerIndex.test.test_clients import reserved_slug_allocator
 from ShortenerIndex.utils.utils import random_sequence
 from rest_framework import status
 
@@ -19,6 +26,7 @@ class TestAPIViewSet(APITestCase):
         Prepares Link and Client entities, creates variables used in other tests.
         """
         # Arrange
+        get_rate_limiter().clear()
         self.default_url_input = 'www.wp.pl'
         self.alternative_url_input = 'www.google.com'
         self.default_client_address = '127.0.0.1'  # Local ip address,be careful for possibilities of it being different
@@ -54,7 +62,26 @@ class TestAPIViewSet(APITestCase):
 
         # Assert
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_list_view_pagination(self):
+        """
+        Tests walking through pages with cursors, links are ordered from the oldest,
+        every page is fetched with a single query regardless of its position
+        """
+        # Act
+        first_page = self.client.get(self.list_url, {'page_size': 1}, format='json')
+        with self.assertNumQueries(1):
+            second_page = self.client.get(first_page.data['next'], format='json')
+        invalid_cursor = self.client.get(self.list_url, {'cursor': 'invalid'}, format='json')
+
+        # Assert
+        self.assertEqual(first_page.data['results'][0]['url_output'], self.default_test_link_url_output)
+        self.assertEqual(second_page.data['results'][0]['url_output'], self.alternative_test_link_url_output)
+        self.assertIsNone(second_page.data['next'])
+        self.assertIsNotNone(second_page.data['previous'])
+        self.assertEqual(invalid_cursor.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_retrieve_view(self):
         """
@@ -66,7 +93,8 @@ class TestAPIViewSet(APITestCase):
 
         # Assert
         self.assertEqual(get_note.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(get_note.data), 3)  # 3 displayed fields of created item
+        self.assertEqual(len(get_note.data), 5)  # 5 displayed fields of created item
+        self.assertEqual(get_note.data['hits'], 0)
         self.assertEqual(get_note.data['url_output'], self.default_test_link_url_output)
         self.assertEqual(get_note.data['url_input'], self.default_url_input)
         self.assertEqual(get_nonexistant_note.status_code, status.HTTP_404_NOT_FOUND)
@@ -85,14 +113,17 @@ class TestAPIViewSet(APITestCase):
         response_correct_data = self.client.post(self.list_url, data=correct_data, format='json')
         response_incorrect_data = self.client.post(self.list_url, data=incorrect_data, format='json')
         response_incorrect_data_2 = self.client.post(self.list_url, data=incorrect_data_2, format='json')
-        response_excess_data_test_fourth_item = self.client.post(self.list_url, data=correct_data, format='json')
-        response_excess_data_test_fifth_item = self.client.post(self.list_url, data=correct_data, format='json')
-        response_excess_data_test_sixth_item = self.client.post(self.list_url, data=correct_data, format='json')
+        response_excess_data_test_fourth_item = self.client.post(self.list_url, data={'url_input': 'www.onet.pl'},
+                                                                 format='json')
+        response_excess_data_test_fifth_item = self.client.post(self.list_url, data={'url_input': 'www.interia.pl'},
+                                                                format='json')
+        response_excess_data_test_sixth_item = self.client.post(self.list_url, data={'url_input': 'www.o2.pl'},
+                                                                format='json')
         test_client_data = Client.objects.get(client_address=self.default_client_address)
 
         # Assert
         self.assertEqual(response_correct_data.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(len(response_correct_data.data), 3)  # 3 columns from single Link model row in db
+        self.assertEqual(len(response_correct_data.data), 5)  # 5 columns from single Link model row in db
         self.assertEqual(response_incorrect_data.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response_incorrect_data_2.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response_excess_data_test_fourth_item.status_code, status.HTTP_201_CREATED)
@@ -101,6 +132,49 @@ class TestAPIViewSet(APITestCase):
         self.assertEqual(response_excess_data_test_sixth_item.data['Fail'], '5 link limit reached.')
         self.assertEqual(test_client_data.urls_count, 5)
 
+    def test_create_view_returns_existing_link(self):
+        """
+        Tests that shortening destination which the user already shortened returns the existing link,
+        unless it expires before the requested duration would end
+        """
+        # Act
+        response_same = self.client.post(self.list_url, data={'url_input': 'http://WWW.wp.pl/'}, format='json')
+        response_with_duration = self.client.post(self.list_url, data={'url_input': 'www.wp.pl', 'duration': 2},
+                                                  format='json')
+        response_short_lived = self.client.post(self.list_url, data={'url_input': 'www.onet.pl', 'duration': 1},
+                                                format='json')
+        response_longer = self.client.post(self.list_url, data={'url_input': 'www.onet.pl'}, format='json')
+        test_client_data = Client.objects.get(client_address=self.default_client_address)
+
+        # Assert
+        self.assertEqual(response_same.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_same.data['url_output'], self.default_test_link_url_output)
+        self.assertEqual(response_with_duration.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_with_duration.data['url_output'], self.default_test_link_url_output)
+        self.assertEqual(response_short_lived.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response_longer.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response_longer.data['url_output'], response_short_lived.data['url_output'])
+        self.assertEqual(test_client_data.urls_count, 4)
+
+    def test_create_view_with_duration(self):
+        """
+        Tests that duration sets expiration date of created link, and is validated
+        """
+        # Act
+        response = self.client.post(self.list_url, data={'url_input': 'www.youtube.com', 'duration': 2},
+                                    format='json')
+        response_incorrect_duration = self.client.post(self.list_url,
+                                                       data={'url_input': 'www.youtube.com', 'duration': 0},
+                                                       format='json')
+        created_link = Link.objects.get(url_output=response.data['url_output'])
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('duration', response.data)
+        self.assertAlmostEqual(created_link.expiration_date - created_link.creation_date,
+                               timedelta(hours=2), delta=timedelta(seconds=1))
+        self.assertEqual(response_incorrect_duration.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_destroy_view(self):
         """
         Tests status codes, correct urls_count field value for main user, and alternative user
@@ -129,3 +203,141 @@ class TestAPIViewSet(APITestCase):
         self.assertEqual(response_delete_nonexistant_link.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(test_client_data.urls_count, 1)
         self.assertEqual(alternative_test_client.urls_count, 1)
+
+    def test_batch_create_view(self):
+        """
+        Tests creation of many links at once, limit of links is enforced for the whole batch,
+        batches with invalid URLs are rejected as a whole.
+        """
+        # Arrange
+        batch_url = reverse('links-batch')
+        correct_data = {'url_inputs': ['www.youtube.com', 'www.onet.pl', 'www.google.pl']}
+        incorrect_data = {'url_inputs': ['www.youtube.com', 'ąęąś']}
+        too_many_data = {'url_inputs': ['www.youtube.com']}
+
+        # Act
+        response_incorrect_data = self.client.post(batch_url, data=incorrect_data, format='json')
+        response_empty_data = self.client.post(batch_url, data={'url_inputs': []}, format='json')
+        response_correct_data = self.client.post(batch_url, data=correct_data, format='json')
+        response_too_many_data = self.client.post(batch_url, data=too_many_data, format='json')
+        test_client_data = Client.objects.get(client_address=self.default_client_address)
+
+        # Assert
+        self.assertEqual(response_incorrect_data.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response_empty_data.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response_correct_data.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([link['url_input'] for link in response_correct_data.data], correct_data['url_inputs'])
+        self.assertEqual(len({link['url_output'] for link in response_correct_data.data}), 3)
+        self.assertEqual(response_too_many_data.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(test_client_data.urls_count, 5)
+        self.assertEqual(Link.objects.filter(client=self.test_client).count(), 5)
+
+    def test_etag_of_list_and_retrieve(self):
+        """
+        Tests that unchanged list and link are answered with 304 without body, and changes of links change ETag
+        """
+        # Arrange
+        list_response = self.client.get(self.list_url, format='json')
+        detail_response = self.client.get(self.test_link_detail_url, format='json')
+
+        # Act
+        not_modified_list = self.client.get(self.list_url, format='json', HTTP_IF_NONE_MATCH=list_response['ETag'])
+        not_modified_detail = self.client.get(self.test_link_detail_url, format='json',
+                                              HTTP_IF_NONE_MATCH=detail_response['ETag'])
+        Link.objects.filter(url_output=self.default_test_link_url_output).update(hits=10)
+        modified_list = self.client.get(self.list_url, format='json', HTTP_IF_NONE_MATCH=list_response['ETag'])
+        other_page = self.client.get(self.list_url, {'page_size': 1}, format='json',
+                                     HTTP_IF_NONE_MATCH=modified_list['ETag'])
+
+        # Assert
+        self.assertEqual(list_response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(not_modified_list.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified_list.content, b'')
+        self.assertEqual(not_modified_list['ETag'], list_response['ETag'])
+        self.assertEqual(not_modified_detail.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(modified_list.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(modified_list['ETag'], list_response['ETag'])
+        self.assertEqual(other_page.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_representation(self):
+        """
+        Tests that JSON and browsable API responses of the same links have different ETags
+        """
+        # Arrange
+        json_response = self.client.get(self.list_url, HTTP_ACCEPT='application/json')
+
+        # Act
+        html_response = self.client.get(self.list_url, HTTP_ACCEPT='text/html',
+                                        HTTP_IF_NONE_MATCH=json_response['ETag'])
+
+        # Assert
+        self.assertEqual(html_response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(html_response['ETag'], json_response['ETag'])
+        self.assertIn('Accept', json_response['Vary'])
+
+    def test_export_view(self):
+        """
+        Tests streaming all links of the user as JSON lines or CSV, links are fetched only while streaming
+        """
+        # Arrange
+        export_url = reverse('links-export')
+        other_client = Client.objects.create(client_address='10.0.0.1', urls_count=1)
+        Link.objects.create(url_input='www.onet.pl', url_output=random_sequence(10), client=other_client)
+
+        # Act
+        with self.assertNumQueries(0):
+            response = self.client.get(export_url)
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        csv_response = self.client.get(export_url, HTTP_ACCEPT='text/csv')
+        csv_lines = b''.join(csv_response.streaming_content).decode().splitlines()
+        format_response = self.client.get(export_url, {'format': 'csv'})
+        chunks = list(export_chunks(JSONLinesRenderer(), Link.objects.values_list(*link_rows.sources),
+                                    chunk_size=2))
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="links.jsonl"')
+        self.assertEqual([json.loads(line)['url_output'] for line in lines],
+                         [self.default_test_link_url_output, self.alternative_test_link_url_output])
+        self.assertTrue(csv_response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(csv_lines[0], 'url_input,url_output,creation_date,hits,expiration_date')
+        self.assertEqual(csv_lines[1].split(',')[:2], [self.default_url_input, self.default_test_link_url_output])
+        self.assertEqual(len(csv_lines), 3)
+        self.assertTrue(format_response['Content-Type'].startswith('text/csv'))
+        # Header and two chunks of links
+        self.assertEqual(len(chunks), 3)
+
+    def test_query_counts(self):
+        """
+        Tests number of queries of every view, client is resolved once and quota is claimed by a single UPDATE
+        """
+        # Arrange
+        batch_url = reverse('links-batch')
+
+        # Act
+        with reserved_slug_allocator():
+            with self.assertNumQueries(1):
+                response_list = self.client.get(self.list_url, format='json')
+            with self.assertNumQueries(1):
+                response_retrieve = self.client.get(self.test_link_detail_url, format='json')
+            # Client, links to the same destination, savepoint, claim of the link, new link, savepoint release
+            with self.assertNumQueries(6):
+                response_create = self.client.post(self.list_url, data={'url_input': 'www.youtube.com'},
+                                                   format='json')
+            # Client, savepoint, claim of links, new links, savepoint release
+            with self.assertNumQueries(5):
+                response_batch = self.client.post(batch_url, data={'url_inputs': ['www.onet.pl', 'www.google.pl']},
+                                                  format='json')
+            # Link, deletion, release of the link
+            with self.assertNumQueries(3):
+                response_destroy = self.client.delete(self.test_link_detail_url, format='json')
+
+        # Assert
+        self.assertEqual(response_list.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_create.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response_batch.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response_destroy.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Client.objects.get(client_address=self.default_client_address).urls_count, 4)
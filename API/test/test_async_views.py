@@ -0,0 +1,72 @@
+import json
+
+from django.test.client import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ShortenerIndex.models import Link, Client
+from ..async_views import with_async_reads
+from ..urls import router
+
+
+class TestAsyncAPIViews(APITestCase):
+    """
+    Tests async variants of read-only API views.
+    """
+    def setUp(self):
+        # Arrange
+        self.factory = AsyncRequestFactory()
+        self.test_client = Client.objects.create(client_address='127.0.0.1', urls_count=1)
+        Link.objects.create(url_input='www.wp.pl', url_output='abcdeFGHIJ', client=self.test_client)
+        self.views = {pattern.name: pattern.callback for pattern in with_async_reads(router.urls)}
+
+    async def test_list_and_retrieve(self):
+        """
+        Async views return the same JSON as the sync ones
+        """
+        # Act
+        list_response = await self.views['links-list'](self.factory.get(reverse('links-list')))
+        detail_response = await self.views['links-detail'](self.factory.get('/'), pk='abcdeFGHIJ')
+        missing_response = await self.views['links-detail'](self.factory.get('/'), pk='asdfASDFas')
+        invalid_cursor_response = await self.views['links-list'](
+            self.factory.get(reverse('links-list') + '?cursor=invalid'))
+        sync_response = await self.async_client.get(reverse('links-list'), HTTP_ACCEPT='application/json')
+
+        # Assert
+        self.assertEqual(list_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list_response.content, sync_response.content)
+        self.assertEqual(json.loads(detail_response.content)['url_output'], 'abcdeFGHIJ')
+        self.assertEqual(missing_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(invalid_cursor_response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_etag(self):
+        """
+        Async views answer requests with the current ETag with 304, like the sync ones
+        """
+        # Arrange
+        list_response = await self.views['links-list'](self.factory.get(reverse('links-list')))
+        sync_response = await self.async_client.get(reverse('links-list'), HTTP_ACCEPT='application/json')
+
+        request = self.factory.get(reverse('links-list'))
+        request.META['HTTP_IF_NONE_MATCH'] = list_response['ETag']
+
+        # Act
+        not_modified = await self.views['links-list'](request)
+
+        # Assert
+        self.assertEqual(list_response['ETag'], sync_response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+
+    async def test_writes_are_passed_to_sync_view(self):
+        """
+        POST request to the async list view creates link with the DRF viewset
+        """
+        # Act
+        request = self.factory.post(reverse('links-list'), data={'url_input': 'www.onet.pl'},
+                                    content_type='application/json')
+        response = await self.views['links-list'](request)
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from API.docs import APISchema, get_api_schema
+
+
+class TestAPIDocs(TestCase):
+    """
+    Tests serving of the precomputed OpenAPI schema
+    """
+    def test_schema_is_served_with_etag(self):
+        """
+        Tests that schema documents describe the API, and repeated requests with ETag get 304 without body
+        """
+        # Arrange
+        json_url = reverse('schema-json', kwargs={'format': '.json'})
+
+        # Act
+        response = self.client.get(json_url)
+        not_modified = self.client.get(json_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        yaml_response = self.client.get(reverse('schema-json', kwargs={'format': '.yaml'}))
+        ui_response = self.client.get(reverse('schema-swagger-ui'))
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/links/batch/', json.loads(response.content)['paths'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(yaml_response.status_code, status.HTTP_200_OK)
+        self.assertTrue(yaml_response['Content-Type'].startswith('application/yaml'))
+        self.assertNotEqual(yaml_response['ETag'], response['ETag'])
+        self.assertContains(ui_response, json_url)
+
+    def test_schema_is_generated_once(self):
+        """
+        Tests that schema is generated on first request only, and may be loaded from file written by command
+        """
+        # Arrange
+        schema = APISchema()
+
+        # Act
+        with patch.object(APISchema, 'generate', wraps=APISchema.generate) as generate:
+            first = schema.get('.json')
+            second = schema.get('.json')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.json')
+            call_command('generate_api_schema', path, stdout=open(os.devnull, 'w'))
+            from_file = APISchema(schema_file=path).get('.json')
+
+        # Assert
+        self.assertEqual(generate.call_count, 1)
+        self.assertIs(first, second)
+        self.assertEqual(from_file, first)
+        self.assertEqual(get_api_schema().get('.json')[2], first[2])
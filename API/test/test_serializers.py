@@ -0,0 +1,39 @@
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from ShortenerIndex.models import Link, Client
+from ..serializers import LinkSerializer, RowSerializer
+
+
+class TestRowSerializer(TestCase):
+    """
+    Tests that the fast path renders the same JSON as LinkSerializer
+    """
+    def setUp(self):
+        # Arrange
+        self.renderer = JSONRenderer()
+        self.row_serializer = RowSerializer(LinkSerializer)
+        test_client = Client.objects.create(client_address='127.0.0.1', urls_count=2)
+        Link.objects.create(url_input='www.wp.pl', url_output='abcdeFGHIJ', client=test_client, duration=5)
+        Link.objects.create(url_input='www.onet.pl', url_output='KLMNOpqrst', client=test_client, hits=7)
+        self.queryset = Link.objects.order_by('id')
+
+    def assert_same_json(self):
+        expected = self.renderer.render(LinkSerializer(self.queryset, many=True).data)
+        rows = self.queryset.values_list(*self.row_serializer.sources)
+
+        self.assertEqual(self.renderer.render(self.row_serializer.to_representation_many(rows)), expected)
+        self.assertEqual(self.renderer.render(self.row_serializer.to_representation(rows[0])),
+                         self.renderer.render(LinkSerializer(self.queryset[0]).data))
+
+    def test_same_json(self):
+        # Act & Assert
+        self.assertEqual(self.row_serializer.names,
+                         ('url_input', 'url_output', 'creation_date', 'hits', 'expiration_date'))
+        self.assert_same_json()
+
+    def test_same_json_in_other_timezone(self):
+        # Act & Assert
+        with timezone.override('Europe/Warsaw'):
+            self.assert_same_json()
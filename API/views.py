@@ -1,120 +1,245 @@
-from django.db.models import F
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import viewsets
 from rest_framework import status
 
-from .serializers import LinkSerializer
-from ShortenerIndex.models import Link, Client
-from ShortenerIndex.utils.utils import random_sequence, get_client_ip
-from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+from .pagination import LinkCursorPagination
+from .renderers import CSVRenderer, JSONLinesRenderer
+from .serializers import LinkSerializer, RowSerializer
+from ShortenerIndex.models import Link
+from ShortenerIndex.utils.clients import resolve_client, check_quota, claim_links, release_links, find_existing_link, \
+    CLIENT_BANNED
+from ShortenerIndex.utils.link_cache import get_link_resolver
+from ShortenerIndex.utils.link_fragments import bump_links_version
+from ShortenerIndex.utils.slugs import get_slug_allocator
+from ShortenerIndex.utils.utils import get_client_ip
+
+
+def refused_response(refusal):
+    """
+    Returns 403 response explaining why claim_links refused to create links.
+    """
+    if refusal == CLIENT_BANNED:
+        return Response({"Fail": "You are banned from shortening links."}, status=status.HTTP_403_FORBIDDEN)
+    return Response({"Fail": f"{settings.CLIENT_LINK_LIMIT} link limit reached."}, status=status.HTTP_403_FORBIDDEN)
+
+
+# Serializes links for list, retrieve and export views, without building model instances
+link_rows = RowSerializer(LinkSerializer)
+# Number of links fetched from the database and rendered at once by streamed exports
+EXPORT_CHUNK_SIZE = 2000
 
 
-url_input = openapi.Parameter('url_input', in_=openapi.IN_BODY, type=openapi.TYPE_STRING)
+def rows_etag(request, rows):
+    """
+    Returns ETag of serialized rows, computed from raw rows, absolute URL of the request
+    (which determines pagination links) and format of the response, so it's known before serialization.
+    Async views render JSON only, their requests have no negotiated renderer.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    response_format = renderer.format if renderer is not None else 'json'
+    digest = hashlib.sha256(repr((request.build_absolute_uri(), response_format, rows)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    """
+    Returns True if If-None-Match header of the request contains the ETag.
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag.strip('"') in [tag.strip('"') for tag in etags]
+
+
+def list_links_data(request):
+    """
+    Returns (ETag, page of serialized links of the client), shared by sync and async list views.
+    Page isn't serialized and None is returned instead, if the request already has the ETag.
+    Raises NotFound if cursor is invalid.
+    """
+    paginator = LinkCursorPagination()
+    # Named rows, paginator reads creation_date of the last row for the cursor
+    queryset = Link.objects.filter(client__client_address=get_client_ip(request))\
+        .values_list(*link_rows.sources, named=True)
+    page = paginator.paginate_queryset(queryset, request)
+    etag = rows_etag(request, page)
+    if etag_matches(request, etag):
+        return etag, None
+    return etag, paginator.get_paginated_data(link_rows.to_representation_many(page))
+
+
+def retrieve_link_data(request, url_output):
+    """
+    Returns (ETag, serialized link of the client), or (None, None) if client has no such link,
+    shared by sync and async views. Like list_links_data, link isn't serialized if the request has the ETag.
+    """
+    try:
+        row = Link.objects.filter(client__client_address=get_client_ip(request)).values_list(*link_rows.sources)\
+            .get(url_output=url_output)
+    except Link.DoesNotExist:
+        return None, None
+    etag = rows_etag(request, [row])
+    if etag_matches(request, etag):
+        return etag, None
+    return etag, link_rows.to_representation(row)
+
+
+def export_chunks(renderer, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields streamed export of rows rendered chunk by chunk, starting with the header of the renderer,
+    so memory use doesn't depend on the number of links. Rows are fetched only when the response is sent.
+    """
+    context = {'fields': link_rows.names}
+    yield renderer.header(link_rows.names)
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield renderer.render(link_rows.to_representation_many(chunk), renderer_context=context)
+
 
-category_response = openapi.Response('Data of the specific retrieved Link', LinkSerializer)
+def conditional_headers(etag):
+    """
+    Headers of list and retrieve responses. They depend on address of the client, so shared caches must not
+    store them, and clients have to revalidate them with the ETag. Representation is chosen by Accept header.
+    """
+    return {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
 
 
 class LinkViewSet(viewsets.ViewSet):
     """
-    Viewset for the application API
-    """
-    @swagger_auto_schema(
-        type=openapi.TYPE_STRING,
-        parameters=['url_input'],
-        name='url_input',
-        operation_description='Returns details of single Link of the user making the request. ' +
-                              'In the field "ID" input the "url_output" value of the specific shortened link.',
-        responses={
-            200: LinkSerializer(many=True),
-            404: "Link not found"
-        },
-        tags=['Links'],
-    )
+    Viewset for the application API, its OpenAPI documentation is in API.docs
+    """
     def retrieve(self, request, pk):
         """
         Returns details of single Link of the user making the request.
         """
         url_output = pk  # Use more descriptive variable for url in our case
-        user_ip = get_client_ip(request)
-        try:
-            queryset = Link.objects.filter(client__client_address=user_ip).get(url_output=url_output)
-        except Link.DoesNotExist:
+        etag, data = retrieve_link_data(request, url_output)
+        if etag is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        serializer = LinkSerializer(queryset)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
-    @swagger_auto_schema(
-        type=openapi.TYPE_STRING,
-        responses={200: LinkSerializer(many=True)},
-        tags=['Links'],
-    )
+        if data is None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=conditional_headers(etag))
+        return Response(data, status=status.HTTP_200_OK, headers=conditional_headers(etag))
+
     def list(self, request):
         """
-        Returns all links of the user making the request.
+        Returns page of links of the user making the request, ordered from the oldest.
         """
-        user_ip = get_client_ip(request)
-        queryset = Link.objects.filter(client__client_address=user_ip)
-        serializer = LinkSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
-    @swagger_auto_schema(
-        request_body=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            required=['url_input'],
-            properties={
-                'url_input': openapi.Schema(type=openapi.TYPE_STRING)
-            }),
-        responses={
-            201: LinkSerializer(many=True),
-            400: 'Bad request',
-            403: 'Forbidden'
-        },
-        tags=['Links'],
-    )
+        etag, data = list_links_data(request)
+        if data is None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=conditional_headers(etag))
+        return Response(data, status=status.HTTP_200_OK, headers=conditional_headers(etag))
+
+    @action(detail=False, methods=['get'], renderer_classes=[JSONLinesRenderer, CSVRenderer])
+    def export(self, request, format=None):
+        """
+        Streams all links of the user making the request, ordered from the oldest, as JSON lines or CSV,
+        chosen by Accept header or format parameter. Links are read by iterator, with server-side cursor
+        on PostgreSQL, so the response starts right away and memory use is flat for any number of links.
+        """
+        rows = Link.objects.filter(client__client_address=get_client_ip(request))\
+            .order_by('creation_date', 'id').values_list(*link_rows.sources).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(export_chunks(renderer, rows),
+                                         content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="links.{renderer.format}"'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     def create(self, request):
         """
         Creates a link of the user making the request and updates users url_count value.
         Requires request to cointain 'url_input': 'value' field,
-        where value is the URL to be shortened.
+        where value is the URL to be shortened. Optional 'duration' field sets lifetime of the link in hours.
+        If the user already has a link to the same destination, living at least as long, it's returned with 200.
         """
-        user_ip = get_client_ip(request)
+        # create user if he doesnt exist, deny request if he's banned, the limit is checked after existing links
+        client = resolve_client(request)
+        refusal = check_quota(client)
+        if refusal == CLIENT_BANNED:
+            return refused_response(refusal)
+
+        serializer = LinkSerializer(data=request.data)
+        if not serializer.is_valid():
+            # Clients at the limit can only get their existing links
+            if refusal is not None:
+                return refused_response(refusal)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Shortening the same destination again returns the existing link, without using the quota
+        existing = find_existing_link(client, serializer.validated_data['url_input'],
+                                      serializer.validated_data.get('duration'))
+        if existing is not None:
+            return Response(LinkSerializer(existing).data, status=status.HTTP_200_OK)
+        # Slug is reserved outside of the transaction, reservation must not be rolled back
+        slug = get_slug_allocator().allocate()
+        with transaction.atomic():
+            # Claimed quota is rolled back with the link, if it can't be saved
+            refusal = claim_links(client)
+            if refusal is not None:
+                return refused_response(refusal)
+            # manually add server-generated fields, allocated slugs are unique
+            link = serializer.save(client=client, url_output=slug)
+        get_link_resolver().register(link.url_output)
+        bump_links_version(client.client_address)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Creates many links of the user making the request at once and updates users url_count value.
+        Requires request to contain 'url_inputs': ['value', ...] field with the URLs to be shortened.
+        Optional 'duration' field sets lifetime of all created links in hours.
+        Either all links are created, or none of them.
+        """
+        url_inputs = request.data.get('url_inputs') if hasattr(request.data, 'get') else None
+        if not isinstance(url_inputs, list) or not url_inputs:
+            return Response({"url_inputs": ["Non-empty list of URLs is required."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(url_inputs) > settings.LINK_BATCH_MAX_SIZE:
+            return Response({"url_inputs": [f"At most {settings.LINK_BATCH_MAX_SIZE} URLs can be sent at once."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        duration = request.data.get('duration')
+        serializer = LinkSerializer(data=[{'url_input': url, 'duration': duration} for url in url_inputs], many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        client = resolve_client(request)
+        count = len(serializer.validated_data)
+        refusal = check_quota(client, count)
+        if refusal is not None:
+            return refused_response(refusal)
+
+        # Slugs are reserved outside of the transaction, reservation must not be rolled back
+        slugs = get_slug_allocator().allocate_many(count)
+        with transaction.atomic():
+            # Quota is checked again by the UPDATE itself, in case of concurrent requests of the same client
+            refusal = claim_links(client, count)
+            if refusal is not None:
+                return refused_response(refusal)
+            links = [Link(client=client, url_output=slug, **data)
+                     for slug, data in zip(slugs, serializer.validated_data)]
+            for link in links:
+                link.apply_duration()
+                link.apply_url_hash()
+            Link.objects.bulk_create(links)
+        get_link_resolver().register(*slugs)
+        bump_links_version(client.client_address)
+
+        return Response(LinkSerializer(links, many=True).data, status=status.HTTP_201_CREATED)
 
-        # create user if he doesnt exist
-        try:
-            client = Client.objects.get(client_address=user_ip)
-        except Client.DoesNotExist:
-            selected_client = Client(client_address=user_ip)
-            selected_client.save()
-            client = Client.objects.get(client_address=user_ip)
-
-        # If user has 5 or more links, deny request, send link limit reached message if possible
-        if client.urls_count >= 5:
-            return Response({"Fail": "5 link limit reached."}, status=status.HTTP_403_FORBIDDEN)
-
-        # manually add server-generated fields
-        request_data_added_client = request.data
-        request_data_added_client['client'] = client
-        request_data_added_client['url_output'] = random_sequence(10)
-
-        serializer = LinkSerializer(data=request_data_added_client)
-        if serializer.is_valid():
-            Client.objects.filter(client_address=user_ip).update(urls_count=F('urls_count') + 1)
-            serializer.save(client=client)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    @swagger_auto_schema(
-        operation_description='Deletes a link of the user making the request and updates users url_count value. ' +
-                              'In the field ID input the url_output of the specific shortened link.',
-        responses={
-            204: "No content",
-            404: "Not found"
-        },
-        tags=['Links'],
-    )
     def destroy(self, request, pk):
         """
         Deletes a link of the user making the request and updates users url_count value.
@@ -122,14 +247,15 @@ class LinkViewSet(viewsets.ViewSet):
         url_output = pk
         user_ip = get_client_ip(request)
         try:
-            queryset = Link.objects.filter(client__client_address=user_ip).get(url_output=url_output)
+            link = Link.objects.filter(client__client_address=user_ip).get(url_output=url_output)
         except Link.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
-        serializer = LinkSerializer(queryset)
-        if not queryset:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        queryset.delete()
-        Client.objects.filter(client_address=user_ip).update(urls_count=F('urls_count') - 1)
+        serializer = LinkSerializer(link)
+        deleted, _ = link.delete()
+        get_link_resolver().invalidate(url_output)
+        # Link may have been deleted concurrently, e.g. by purge of expired links, which lowered the count
+        if deleted:
+            release_links(link.client_id)
+        bump_links_version(user_ip)
         return Response(serializer.data, status=status.HTTP_204_NO_CONTENT)
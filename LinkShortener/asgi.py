@@ -2,6 +2,9 @@
 ASGI config for LinkShortener project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Set ASYNC_VIEWS=1 environment variable to serve redirects and read-only API
+requests with async views, e.g. ``ASYNC_VIEWS=1 uvicorn LinkShortener.asgi:application``.
+Redirects of live links are answered in front of Django unless FAST_REDIRECTS=0.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -14,3 +17,16 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LinkShortener.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+from ShortenerIndex.utils.hit_counter import get_hit_counter  # noqa: E402
+from ShortenerIndex.utils.link_cache import get_link_resolver  # noqa: E402
+
+# Slug filter is built while the worker starts serving requests
+get_link_resolver().start()
+if settings.HIT_COUNTER_ENABLED:
+    get_hit_counter().start()
+
+if settings.FAST_REDIRECTS:
+    from ShortenerIndex.fast_redirects import FastRedirectASGI
+    application = FastRedirectASGI(application)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
 import string
+import tempfile
 from os.path import join, dirname
 from pathlib import Path
 from django.core.management.utils import get_random_secret_key
@@ -72,15 +73,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-
-    'drf_yasg',
 ]
 
 MIDDLEWARE = [
+    'ShortenerIndex.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'ShortenerIndex.middleware.RateLimitMiddleware',
+    'ShortenerIndex.middleware.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -118,7 +120,11 @@ LOGGING = {
         'testlogger': {
             'handlers': ['console'],
             'level': 'INFO',
-        }
+        },
+        'ShortenerIndex': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
     }
 }
 ROOT_URLCONF = 'LinkShortener.urls'
@@ -141,6 +147,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'LinkShortener.wsgi.application'
 
+# Serve redirects and read-only API requests with async views, useful only when running under ASGI server
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -192,6 +201,114 @@ USE_TZ = True
 
 
 
+# Caches
+# Local memory cache is private to every worker process, set MEMCACHED_LOCATION
+# (comma separated host:port list) to add cache shared by all workers and nodes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+SHARED_CACHE_ALIAS = None
+if os.getenv('MEMCACHED_LOCATION'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('MEMCACHED_LOCATION').split(','),
+    }
+    SHARED_CACHE_ALIAS = 'shared'
+
+# Maximal number of links owned by a single client, and of links created with one API batch request
+CLIENT_LINK_LIMIT = 5
+LINK_BATCH_MAX_SIZE = 500
+
+# Slug resolution cache used by redirects, TTLs are in seconds
+LINK_CACHE_MAX_ENTRIES = 10000
+LINK_CACHE_LOCAL_TTL = 60
+LINK_CACHE_SHARED_ALIAS = SHARED_CACHE_ALIAS
+LINK_CACHE_SHARED_TTL = 300
+
+# Immutable snapshot of live links written by build_link_snapshot command and memory mapped by every worker,
+# so its pages are shared through the page cache. Workers reopen the file within LINK_SNAPSHOT_RELOAD_INTERVAL
+# seconds after it's replaced. Links created later are resolved by the tiers above. Links deleted later
+# are hidden in other workers by tombstones in LINK_CACHE_SHARED_ALIAS, without shared cache they are served
+# by other workers until the next snapshot. Snapshot exported more than LINK_SNAPSHOT_MAX_AGE seconds ago
+# isn't used at all, so it should be rebuilt often (e.g. every few minutes).
+LINK_SNAPSHOT_PATH = os.getenv('LINK_SNAPSHOT_PATH')
+LINK_SNAPSHOT_RELOAD_INTERVAL = 5
+LINK_SNAPSHOT_MAX_AGE = 600
+
+# Per worker Bloom filter of all slugs, unknown slugs are answered with 404 without queries.
+# It's built by a background thread started by wsgi.py and asgi.py, without it all slugs are looked up.
+# Links created by other workers are picked up within SLUG_FILTER_REFRESH_INTERVAL seconds,
+# filter is rebuilt from scratch every SLUG_FILTER_REBUILD_INTERVAL seconds to drop deleted links.
+# Links of transactions longer than SLUG_FILTER_SETTLE_WINDOW seconds may get 404 until the next rebuild,
+# misses are looked up in the database for this long after the worker starts.
+SLUG_FILTER_ENABLED = True
+SLUG_FILTER_ERROR_RATE = 0.001
+SLUG_FILTER_REFRESH_INTERVAL = 1.0
+SLUG_FILTER_REBUILD_INTERVAL = 3600
+SLUG_FILTER_SETTLE_WINDOW = 60
+
+# Rendered table of links of the client on the main page, bumped version of the client invalidates it.
+# Without shared cache other workers may show outdated table for up to LINKS_FRAGMENT_TTL seconds.
+LINKS_FRAGMENT_CACHE_ALIAS = SHARED_CACHE_ALIAS or 'default'
+LINKS_FRAGMENT_TTL = 60
+
+# Generated slugs length, legacy slugs are 10 letters long, so other lengths never collide with them.
+# Every worker reserves SLUG_BLOCK_SIZE numbers for slugs at once.
+SLUG_LENGTH = 8
+SLUG_BLOCK_SIZE = 100
+
+# Redirects may be cached by browsers and proxies for REDIRECT_MAX_AGE seconds, never past expiration of the link.
+# Cached redirects don't reach the application, so they aren't counted in hits, and deleted links keep redirecting
+# for up to REDIRECT_MAX_AGE seconds. 0 disables caching. With REDIRECT_PERMANENT=1 redirects are 301 instead of 302.
+REDIRECT_PERMANENT = os.getenv('REDIRECT_PERMANENT', '0') == '1'
+REDIRECT_MAX_AGE = int(os.getenv('REDIRECT_MAX_AGE', '300'))
+
+# Redirects of live links are answered by a fast lane in front of Django in wsgi.py and asgi.py, without
+# middleware, URL resolver and view. Unknown and expired links and all other requests reach Django.
+# Answered redirects still count hits and are reported in metrics of the redirect view.
+FAST_REDIRECTS = os.getenv('FAST_REDIRECTS', '1') == '1'
+
+# Redirects are counted in memory of every worker and written to the database in bulk by a background thread
+# started by wsgi.py and asgi.py, every HIT_COUNTER_FLUSH_INTERVAL seconds or sooner after HIT_COUNTER_MAX_PENDING
+# hits, and when the worker exits.
+# Up to HIT_COUNTER_FLUSH_INTERVAL seconds of hits per worker can be lost if the worker is killed.
+HIT_COUNTER_ENABLED = True
+HIT_COUNTER_FLUSH_INTERVAL = 10
+HIT_COUNTER_MAX_PENDING = 1000
+
+# Per view request metrics exposed at /metrics in Prometheus text format, every worker reports its own.
+# Requests slower than METRICS_SLOW_REQUEST seconds are logged with their query count and database time.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_SLOW_REQUEST = 1.0
+
+# Token bucket limits of requests of every client IP, keys are (view name, method),
+# values are (requests per minute, burst size). Buckets are shared by workers of one host
+# through memory mapped file at RATE_LIMIT_PATH, holding RATE_LIMIT_SLOTS buckets.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', os.path.join(tempfile.gettempdir(), 'linkshortener-rate-limit'))
+RATE_LIMIT_SLOTS = 65536
+RATE_LIMITS = {
+    ('index', 'POST'): (10, 10),
+    ('links-list', 'POST'): (10, 10),
+    ('links-batch', 'POST'): (5, 5),
+    ('links-export', 'GET'): (5, 5),
+}
+
+# OpenAPI docs at /api/swagger/, drf_yasg isn't even imported when they are disabled.
+# Schema is generated once per process, unless API_SCHEMA_FILE points to a file written
+# by generate_api_schema command, e.g. when building the image.
+API_DOCS_ENABLED = os.getenv('API_DOCS_ENABLED', '1') == '1'
+API_SCHEMA_FILE = os.getenv('API_SCHEMA_FILE')
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_yasg')
+SWAGGER_SETTINGS = {
+    # Swagger UI loads the precomputed schema instead of generating it with ?format=openapi
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
@@ -210,9 +327,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Rest framework settings
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'API.pagination.LinkCursorPagination',
     'PAGE_SIZE': 5
 }
 DATABASES = {}
 DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
 django_heroku.settings(locals())
+
+# Read replicas, comma separated database URLs, each may end with "|weight" (1 by default).
+# Safe requests to DATABASE_REPLICA_VIEWS read from a replica picked by weight, except for clients which
+# created or deleted links in the last DATABASE_REPLICA_PIN_SECONDS seconds, they read from the primary.
+# Pins are kept in DATABASE_PIN_CACHE_ALIAS, without shared cache they hold only in the worker which
+# handled the write. For local tests, replicas may be copies of the SQLite database file.
+DATABASE_REPLICAS = {}
+for number, replica in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(','))):
+    replica_url, separator, weight = replica.rpartition('|')
+    if not separator or not weight.isdigit():
+        replica_url, weight = replica, '1'
+    DATABASES[f'replica_{number}'] = dj_database_url.parse(replica_url, conn_max_age=600)
+    DATABASES[f'replica_{number}']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS[f'replica_{number}'] = int(weight)
+DATABASE_ROUTERS = ['ShortenerIndex.db_router.ReplicaRouter'] if DATABASE_REPLICAS else []
+DATABASE_REPLICA_VIEWS = ('redirect', 'index', 'links-list', 'links-detail')
+DATABASE_REPLICA_PIN_SECONDS = 10
+DATABASE_PIN_CACHE_ALIAS = SHARED_CACHE_ALIAS or 'default'
@@ -2,6 +2,7 @@
 WSGI config for LinkShortener project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Redirects of live links are answered in front of Django unless FAST_REDIRECTS=0.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
@@ -14,3 +15,16 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LinkShortener.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+from ShortenerIndex.utils.hit_counter import get_hit_counter  # noqa: E402
+from ShortenerIndex.utils.link_cache import get_link_resolver  # noqa: E402
+
+# Slug filter is built while the worker starts serving requests
+get_link_resolver().start()
+if settings.HIT_COUNTER_ENABLED:
+    get_hit_counter().start()
+
+if settings.FAST_REDIRECTS:
+    from ShortenerIndex.fast_redirects import FastRedirectWSGI
+    application = FastRedirectWSGI(application)
@@ -1,19 +1,100 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Q
+
 from .models import Link, Client
+from .pagination import EstimatedCountPaginator
+from .utils.clients import recount_links
+from .utils.link_cache import get_link_resolver
+from .utils.link_fragments import bump_links_version
+from .utils.utils import url_hash
 
 # Register your models here.
+# Changelists are built for millions of rows: related rows are joined instead of queried per row,
+# counts of unfiltered tables are estimated, search and filters use indexed columns only,
+# and actions run as set based SQL.
+
 
-@admin.display(description='Client ID')
+@admin.display(description='Client ID', ordering='client_id')
 def client_id_display(object):
-    return f"{object.client.id}"
+    return f"{object.client_id}"
+
+
+@admin.display(description='Client address')
+def client_address_display(object):
+    return object.client.client_address
+
 
-# TODO: when you delete link on admin page, that user's link count should decrease by 1
 class LinkAdmin(admin.ModelAdmin):
-    list_display = ('id', client_id_display, 'url_input', 'url_output', 'duration', 'creation_date', 'expiration_date')
+    list_display = ('id', client_id_display, client_address_display, 'url_input', 'url_output', 'duration',
+                    'creation_date', 'expiration_date', 'hits')
+    list_select_related = ('client',)
+    list_filter = ('expiration_date',)
+    readonly_fields = ('hits',)
+    # Clients are picked by id, select with all clients would be rendered otherwise
+    raw_id_fields = ('client',)
+    # Searched by get_search_results, using indexes instead of scanning the table
+    search_fields = ('url_input', 'url_output')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Finds links with the exact slug, or leading to the searched destination, which is matched
+        by url_hash, so "example.com/" finds links to "http://example.com".
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(Q(url_output=search_term) | Q(url_hash=url_hash(search_term))), False
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recount_links(Client.objects.filter(pk=obj.client_id))
+        get_link_resolver().invalidate(obj.url_output)
+        bump_links_version(obj.client.client_address)
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('url_output', 'client_id', 'client__client_address'))
+        super().delete_queryset(request, queryset)
+        recount_links(Client.objects.filter(pk__in={client_id for _, client_id, _ in rows}))
+        get_link_resolver().invalidate(*[slug for slug, _, _ in rows])
+        bump_links_version(*{address for *_, address in rows})
 
 
 class ClientAdmin(admin.ModelAdmin):
     list_display = ('id', 'urls_count', 'client_address', 'is_banned')
+    # Banned clients are found by partial index, exact address by the unique index
+    list_filter = ('is_banned',)
+    search_fields = ('=client_address',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('ban_clients', 'unban_clients', 'purge_links', 'recount_client_links')
+
+    @admin.action(description='Ban selected clients')
+    def ban_clients(self, request, queryset):
+        banned = queryset.update(is_banned=True)
+        self.message_user(request, f"Banned {banned} clients.", messages.SUCCESS)
+
+    @admin.action(description='Unban selected clients')
+    def unban_clients(self, request, queryset):
+        unbanned = queryset.update(is_banned=False)
+        self.message_user(request, f"Unbanned {unbanned} clients.", messages.SUCCESS)
+
+    @admin.action(description='Delete all links of selected clients')
+    def purge_links(self, request, queryset):
+        links = Link.objects.filter(client__in=queryset)
+        slugs = list(links.values_list('url_output', flat=True))
+        # Links aren't referenced by other tables, so they are deleted by a single DELETE
+        deleted, _ = links.delete()
+        recount_links(queryset)
+        get_link_resolver().invalidate(*slugs)
+        bump_links_version(*queryset.values_list('client_address', flat=True))
+        self.message_user(request, f"Deleted {deleted} links.", messages.SUCCESS)
+
+    @admin.action(description='Recount links of selected clients')
+    def recount_client_links(self, request, queryset):
+        recounted = recount_links(queryset)
+        self.message_user(request, f"Recounted links of {recounted} clients.", messages.SUCCESS)
 
 
 admin.site.register(Link, LinkAdmin)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class ShortenerindexConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ShortenerIndex'
+
+    def ready(self):
+        from .utils.metrics import install_query_timer
+        if settings.METRICS_ENABLED:
+            # Measures queries of every connection, see MetricsMiddleware
+            connection_created.connect(install_query_timer)
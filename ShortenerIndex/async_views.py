@@ -0,0 +1,47 @@
+import asyncio
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views import View
+
+from .utils.hit_counter import get_hit_counter
+from .utils.link_cache import get_link_resolver
+from .views import RedirectView, redirect_to_link
+
+
+class AsyncView(View):
+    """
+    Base for class based views with async handlers. Django 3.2 can only await function views,
+    so as_view returns a coroutine function awaiting the handler chosen by dispatch.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        dispatching_view = super().as_view(**initkwargs)
+
+        async def view(request, *args, **kwargs):
+            response = dispatching_view(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+
+        update_wrapper(view, dispatching_view)
+        return view
+
+
+class AsyncRedirectView(AsyncView):
+    """
+    Async variant of RedirectView for ASGI deployments, enabled with ASYNC_VIEWS setting.
+    Warm redirects are answered without leaving the event loop.
+    """
+    sync_view = staticmethod(RedirectView.as_view())
+
+    async def get(self, request, url_output):
+        data = await get_link_resolver().aresolve(url_output)
+        if data is not None and not data.is_expired and settings.HIT_COUNTER_ENABLED:
+            get_hit_counter().record(data.id)
+        return redirect_to_link(data)
+
+    # Deletion of the link is rare, it's handled by the sync view in a thread
+    async def post(self, request, url_output):
+        return await sync_to_async(self.sync_view)(request, url_output=url_output)
@@ -0,0 +1,88 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+# ReplicaReads of the request being handled, set by ReplicaRoutingMiddleware for read-only views only
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def pin_key(client_ip):
+    return f'db_pin:{client_ip}'
+
+
+def pin_client(client_ip):
+    """
+    Sends reads of the client to the primary database for DATABASE_REPLICA_PIN_SECONDS, called after
+    the client created or deleted links, so it sees its own writes before replicas catch up.
+    """
+    caches[settings.DATABASE_PIN_CACHE_ALIAS].set(pin_key(client_ip), 1, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(client_ip):
+    return caches[settings.DATABASE_PIN_CACHE_ALIAS].get(pin_key(client_ip)) is not None
+
+
+def choose_replica(replicas):
+    """
+    Returns alias of a replica picked at random, proportionally to its weight.
+    """
+    return random.choices(list(replicas), weights=list(replicas.values()))[0]
+
+
+class ReplicaReads:
+    """
+    Database used for reads of a single request. Chosen on the first query only, so requests answered
+    from caches never check the pin, and all reads of the request see the same database.
+    """
+    def __init__(self, client_ip):
+        self.client_ip = client_ip
+        self.alias = None
+
+    def get_alias(self):
+        if self.alias is None:
+            self.alias = DEFAULT_DB_ALIAS if is_pinned(self.client_ip) else choose_replica(settings.DATABASE_REPLICAS)
+        return self.alias
+
+
+def start_replica_reads(client_ip):
+    """
+    Routes reads of the current request to replicas, returns token for finish_replica_reads.
+    """
+    return _replica_reads.set(ReplicaReads(client_ip))
+
+
+def finish_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of read-only views (DATABASE_REPLICA_VIEWS) to replicas in DATABASE_REPLICAS,
+    everything else, including all writes, goes to the primary database.
+
+    Replicas lag behind the primary, so a link may be served for a moment after it was deleted
+    and new links of other clients may be missing from listings, clients which wrote recently are pinned
+    to the primary. Slug filter scans always read the primary, it must never miss created links.
+    """
+    def db_for_read(self, model, **hints):
+        replica_reads = _replica_reads.get()
+        if replica_reads is None:
+            return None
+        return replica_reads.get_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,211 @@
+"""
+Fast lane for redirects, mounted in front of the Django application by wsgi.py and asgi.py
+when FAST_REDIRECTS setting is on. GET and HEAD requests to /l/<slug>/ of existing, not expired links
+are answered right away, without middleware, URL resolver and view. Everything else, including
+unknown and expired links, requests for hosts not in ALLOWED_HOSTS and plain HTTP requests when
+SECURE_SSL_REDIRECT is on, falls through to the Django application unchanged.
+"""
+import re
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http.request import split_domain_port, validate_host
+
+from .db_router import start_replica_reads, finish_replica_reads
+from .utils.hit_counter import get_hit_counter
+from .utils.link_cache import get_link_resolver
+from .utils.metrics import get_request_metrics, start_request, finish_request
+from .utils.utils import get_client_ip
+from .views import redirect_to_link
+
+# Same slugs as accepted by is_valid_slug, in path of the redirect URL pattern
+REDIRECT_PATH = re.compile(r'/l/([A-Za-z0-9]{1,255})/')
+REDIRECT_METHODS = ('GET', 'HEAD')
+
+
+def redirect_headers(response, secure):
+    """
+    Returns headers of the redirect, with those which the skipped middleware would add and matter for redirects.
+    """
+    headers = list(response.items())
+    headers.append(('Content-Length', str(len(response.content))))
+    # Same as SecurityMiddleware.process_response
+    if settings.SECURE_HSTS_SECONDS and secure:
+        sts_header = f'max-age={settings.SECURE_HSTS_SECONDS}'
+        if settings.SECURE_HSTS_INCLUDE_SUBDOMAINS:
+            sts_header += '; includeSubDomains'
+        if settings.SECURE_HSTS_PRELOAD:
+            sts_header += '; preload'
+        headers.append(('Strict-Transport-Security', sts_header))
+    if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+        headers.append(('X-Content-Type-Options', 'nosniff'))
+    if settings.SECURE_BROWSER_XSS_FILTER:
+        headers.append(('X-XSS-Protection', '1; mode=block'))
+    if settings.SECURE_REFERRER_POLICY:
+        # Browsers apply it to the request to the destination
+        headers.append(('Referrer-Policy', settings.SECURE_REFERRER_POLICY))
+    return headers
+
+
+def is_secure(meta, scheme):
+    """
+    Returns True if the request was made over HTTPS, checked like by HttpRequest.is_secure.
+    """
+    if settings.SECURE_PROXY_SSL_HEADER:
+        header, secure_value = settings.SECURE_PROXY_SSL_HEADER
+        header_value = meta.get(header)
+        if header_value is not None:
+            return header_value == secure_value
+    return scheme == 'https'
+
+
+def needs_ssl_redirect(secure):
+    """
+    Returns True if SecurityMiddleware would redirect the request to HTTPS, so it has to be left to Django.
+    """
+    return settings.SECURE_SSL_REDIRECT and not secure
+
+
+def is_allowed_host(meta):
+    """
+    Returns True if host of the request is in ALLOWED_HOSTS, checked like by HttpRequest.get_host.
+    Requests without Host header are left to Django as well.
+    """
+    if settings.USE_X_FORWARDED_HOST and 'HTTP_X_FORWARDED_HOST' in meta:
+        host = meta['HTTP_X_FORWARDED_HOST']
+    else:
+        host = meta.get('HTTP_HOST')
+    if not host:
+        return False
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    domain, _ = split_domain_port(host)
+    return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+def asgi_meta(scope):
+    """
+    Returns META with headers and client address of the ASGI request, built like by ASGIRequest.
+    """
+    meta = {}
+    if scope.get('client'):
+        meta['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', ()):
+        name = 'HTTP_' + name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name in meta:
+            # Repeated headers are joined, like by Django
+            value = meta[name] + ',' + value
+        meta[name] = value
+    return meta
+
+
+class FastRedirects:
+    """
+    Base of WSGI and ASGI fast lanes, records metrics of answered redirects under name of the redirect view.
+    """
+    view_name = 'redirect'
+
+    def __init__(self, application):
+        self.application = application
+        self.metrics = get_request_metrics() if settings.METRICS_ENABLED else None
+
+    def start(self, client_ip):
+        replica_token = start_replica_reads(client_ip) if settings.DATABASE_REPLICAS else None
+        timer, token = start_request()
+        return time.perf_counter(), timer, token, replica_token
+
+    def finish(self, state, answered):
+        started, timer, token, replica_token = state
+        finish_request(token)
+        if replica_token is not None:
+            finish_replica_reads(replica_token)
+        if answered and self.metrics is not None:
+            self.metrics.record(self.view_name, time.perf_counter() - started, timer.db_time, timer.queries)
+
+
+class FastRedirectWSGI(FastRedirects):
+    def resolve(self, slug):
+        """
+        Returns redirect response, or None if the request has to be handled by Django.
+        """
+        data = get_link_resolver().resolve(slug)
+        if data is None or data.is_expired:
+            return None
+        if settings.HIT_COUNTER_ENABLED:
+            get_hit_counter().record(data.id)
+        return redirect_to_link(data)
+
+    def __call__(self, environ, start_response):
+        match = REDIRECT_PATH.fullmatch(environ.get('PATH_INFO', ''))
+        if match is None or environ['REQUEST_METHOD'] not in REDIRECT_METHODS or not is_allowed_host(environ):
+            return self.application(environ, start_response)
+        secure = is_secure(environ, environ.get('wsgi.url_scheme'))
+        if needs_ssl_redirect(secure):
+            return self.application(environ, start_response)
+
+        state = self.start(get_client_ip(SimpleNamespace(META=environ)))
+        response = None
+        # Like request_started and request_finished signals of Django handler
+        close_old_connections()
+        try:
+            response = self.resolve(match.group(1))
+        finally:
+            close_old_connections()
+            self.finish(state, response is not None)
+        if response is None:
+            return self.application(environ, start_response)
+
+        start_response(f'{response.status_code} {response.reason_phrase}', redirect_headers(response, secure))
+        # Content-Length of HEAD response is the one of GET, like in Django
+        return [b''] if environ['REQUEST_METHOD'] == 'HEAD' else [response.content]
+
+
+class FastRedirectASGI(FastRedirects):
+    """
+    Warm redirects are answered without leaving the event loop, like by AsyncRedirectView.
+    Connections used in threads by lookups which miss the caches are recycled by requests handled by Django.
+    """
+    async def resolve(self, slug):
+        data = await get_link_resolver().aresolve(slug)
+        if data is None or data.is_expired:
+            return None
+        if settings.HIT_COUNTER_ENABLED:
+            get_hit_counter().record(data.id)
+        return redirect_to_link(data)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in REDIRECT_METHODS:
+            return await self.application(scope, receive, send)
+        path, root_path = scope['path'], scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        match = REDIRECT_PATH.fullmatch(path)
+        if match is None:
+            return await self.application(scope, receive, send)
+        meta = asgi_meta(scope)
+        secure = is_secure(meta, scope.get('scheme') or 'http')
+        if not is_allowed_host(meta) or needs_ssl_redirect(secure):
+            return await self.application(scope, receive, send)
+
+        state = self.start(get_client_ip(SimpleNamespace(META=meta)))
+        response = None
+        try:
+            response = await self.resolve(match.group(1))
+        finally:
+            self.finish(state, response is not None)
+        if response is None:
+            return await self.application(scope, receive, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (name.encode('latin1'), value.encode('latin1')) for name, value in redirect_headers(response, secure)
+            ],
+        })
+        body = b'' if scope['method'] == 'HEAD' else response.content
+        await send({'type': 'http.response.body', 'body': body})
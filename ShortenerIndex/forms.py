@@ -1,5 +1,5 @@
 from django import forms
-from django.forms import TextInput
+from django.forms import NumberInput, TextInput
 
 from .models import Link
 
@@ -9,9 +9,14 @@ class ShortenLinkForm(forms.ModelForm):
         model = Link
         fields = [
             'url_input',
+            'duration',
         ]
+        labels = {
+            'duration': 'Expires after (hours)',
+        }
 
         widgets = {
-            'url_input': TextInput(attrs={'class': 'form-horizontal form-input-url'})
+            'url_input': TextInput(attrs={'class': 'form-horizontal form-input-url'}),
+            'duration': NumberInput(attrs={'class': 'form-horizontal form-input-duration'}),
         }
 
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from ShortenerIndex.utils.rate_limit import SharedTokenBuckets
+
+
+def run_checks(path, slots, checks, clients):
+    """
+    Runs checks of clients round robin on buckets in file at path, returns elapsed seconds.
+    """
+    buckets = SharedTokenBuckets(path, slots=slots)
+    keys = [f'index|10.0.{number >> 8 & 255}.{number & 255}' for number in range(clients)]
+    start = time.perf_counter()
+    for number in range(checks):
+        buckets.take(keys[number % clients], 1.0, 10)
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = ('Measures cost of rate limit checks, in one process and in several processes sharing '
+            'the buckets file. Uses temporary file, buckets of the running application are not touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=100000,
+                            help='Number of checks done by every process.')
+        parser.add_argument('--processes', type=int, nargs='+', default=[1, 4],
+                            help='Numbers of concurrent processes to measure.')
+        parser.add_argument('--clients', type=int, default=1000,
+                            help='Number of distinct client addresses.')
+        parser.add_argument('--slots', type=int, default=65536,
+                            help='Number of buckets in the file.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'buckets')
+            arguments = (path, options['slots'], options['checks'], options['clients'])
+            for processes in options['processes']:
+                with multiprocessing.Pool(processes) as pool:
+                    start = time.perf_counter()
+                    elapsed = pool.starmap(run_checks, [arguments] * processes)
+                    wall = time.perf_counter() - start
+                per_check = sum(elapsed) / (processes * options['checks']) * 1e6
+                self.stdout.write(f"{processes} processes: {per_check:.2f} us per check, "
+                                  f"{processes * options['checks'] / wall:.0f} checks/s in total")
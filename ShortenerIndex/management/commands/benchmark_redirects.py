@@ -0,0 +1,81 @@
+import io
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.utils import timezone
+
+from ShortenerIndex.fast_redirects import FastRedirectWSGI
+from ShortenerIndex.models import Link
+
+
+def request_environ(path, host):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Measures redirects served by the whole Django stack and by the fast lane in front of it, '
+            'in this process, without a server. Both resolve the link from warm caches, so the '
+            'difference is the cost of middleware, URL resolver and view.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slug', help='Slug of the measured link, the newest live link by default.')
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Number of redirects measured in every round.')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Number of rounds, the median round is reported.')
+
+    def handle(self, *args, **options):
+        slug = options['slug'] or Link.objects.filter(expiration_date__gt=timezone.now())\
+            .order_by('-id').values_list('url_output', flat=True).first()
+        if slug is None:
+            raise CommandError("Database has no live links, create one or pass --slug")
+
+        django_application = get_wsgi_application()
+        applications = {
+            'django': django_application,
+            'fast lane': FastRedirectWSGI(django_application),
+        }
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        environ = request_environ(f'/l/{slug}/', host)
+        statuses = []
+
+        def start_response(status, headers):
+            statuses.append(status)
+
+        results = {}
+        for name, application in applications.items():
+            # Warms up caches of the link
+            b''.join(application(dict(environ), start_response))
+            if not statuses[-1].startswith('30'):
+                raise CommandError(f"{name} answered {statuses[-1]} instead of redirect to {slug}")
+            rounds = []
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    response = application(dict(environ), start_response)
+                    b''.join(response)
+                    getattr(response, 'close', lambda: None)()
+                rounds.append((time.perf_counter() - start) / options['requests'] * 1e6)
+            results[name] = statistics.median(rounds)
+            self.stdout.write(f"{name}: {results[name]:.1f} us per redirect")
+
+        saved = results['django'] - results['fast lane']
+        self.stdout.write(self.style.SUCCESS(
+            f"Fast lane saves {saved:.1f} us per redirect ({saved / results['django']:.0%})"))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.db.models.functions import Collate, Length
+from django.utils import timezone
+
+from ShortenerIndex.models import Link
+from ShortenerIndex.utils.link_snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = ('Writes snapshot of all live links, which workers memory map and use to resolve redirects '
+            'without queries. Should be run periodically, links deleted after the snapshot are served by it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default=settings.LINK_SNAPSHOT_PATH,
+                            help='Path of the snapshot, LINK_SNAPSHOT_PATH setting by default.')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Number of links fetched from the database at once.')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('Pass path of the snapshot or set LINK_SNAPSHOT_PATH.')
+
+        started_at = timezone.now()
+        live_links = Link.objects.filter(expiration_date__gt=started_at)
+        key_width = live_links.aggregate(width=Max(Length('url_output')))['width'] or 1
+        # Keys are compared as bytes, PostgreSQL has to sort them the same way
+        ordering = Collate('url_output', 'C') if connection.vendor == 'postgresql' else 'url_output'
+        rows = live_links.order_by(ordering).values_list('url_output', 'id', 'url_input', 'expiration_date')\
+            .iterator(chunk_size=options['chunk_size'])
+        # Links with longer slugs, created since the width was read, are resolved from the database
+        count = write_snapshot(options['output'], (row for row in rows if len(row[0]) <= key_width),
+                               key_width, started_at)
+
+        self.stdout.write(self.style.SUCCESS(f"Snapshot of {count} links written to {options['output']}"))
@@ -0,0 +1,103 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ShortenerIndex.models import Link, Client
+from ShortenerIndex.utils.link_cache import RESOLVED_FIELDS
+
+BENCH_SLUG_PREFIX = 'bench'
+# Synthetic clients have addresses which can't belong to real clients, only they are ever deleted by --clear
+BENCH_CLIENT_PREFIX = 'bench-'
+
+
+def bench_address(number):
+    return f'{BENCH_CLIENT_PREFIX}{number}'
+
+
+class Command(BaseCommand):
+    help = ('Prints query plans and latency of the hot lookups: redirect, client by address and ordered '
+            'listing of client links. Run it before and after migrating to compare effects of indexes, '
+            'use --seed to fill the database with synthetic links first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of synthetic links to insert before measuring.')
+        parser.add_argument('--links-per-client', type=int, default=3,
+                            help='Synthetic links are spread over seed / links-per-client clients.')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of rows inserted with one query while seeding.')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='How many times every lookup is run for latency measurement.')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete synthetic links and clients and exit.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = Link.objects.filter(client__client_address__startswith=BENCH_CLIENT_PREFIX).delete()
+            deleted_clients, _ = Client.objects.filter(client_address__startswith=BENCH_CLIENT_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted + deleted_clients} synthetic rows")
+            return
+
+        if options['seed']:
+            self.seed(options['seed'], options['links_per_client'], options['batch_size'])
+
+        links = Link.objects.select_related('client').order_by('-id')
+        sample = links.filter(client__client_address__startswith=BENCH_CLIENT_PREFIX).first() or links.first()
+        if sample is None:
+            raise CommandError("Database has no links, use --seed to create some")
+
+        address = sample.client.client_address
+        lookups = {
+            'redirect': Link.objects.filter(url_output=sample.url_output).values_list(*RESOLVED_FIELDS)[:1],
+            'client by address': Client.objects.filter(client_address=address)[:1],
+            'client links listing': Link.objects.filter(client__client_address=address)
+                                                .order_by('creation_date', 'id')[:20],
+        }
+        self.stdout.write(f"{connection.vendor}, {Link.objects.count()} links, {Client.objects.count()} clients")
+        for name, queryset in lookups.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+            self.stdout.write(self.explain(queryset))
+            self.stdout.write(self.measure(queryset, options['repeat']))
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    @staticmethod
+    def measure(queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return f"median {statistics.median(timings):.3f} ms, p95 {p95:.3f} ms, max {timings[-1]:.3f} ms"
+
+    def seed(self, count, links_per_client, batch_size):
+        # Continues numbering of previous runs, so seeding can be repeated to grow the table
+        first = Link.objects.filter(client__client_address__startswith=BENCH_CLIENT_PREFIX).count()
+        client_ids = dict(Client.objects.filter(client_address__startswith=BENCH_CLIENT_PREFIX)
+                          .values_list('client_address', 'id'))
+
+        missing = [bench_address(number) for number in range(first // links_per_client,
+                                                             (first + count - 1) // links_per_client + 1)
+                   if bench_address(number) not in client_ids]
+        for start in range(0, len(missing), batch_size):
+            Client.objects.bulk_create([Client(client_address=address, urls_count=links_per_client)
+                                        for address in missing[start:start + batch_size]])
+        if missing:
+            client_ids = dict(Client.objects.filter(client_address__startswith=BENCH_CLIENT_PREFIX)
+                              .values_list('client_address', 'id'))
+
+        for start in range(first, first + count, batch_size):
+            stop = min(start + batch_size, first + count)
+            Link.objects.bulk_create([
+                Link(url_input='www.example.com', url_output=f'{BENCH_SLUG_PREFIX}{number}',
+                     client_id=client_ids[bench_address(number // links_per_client)])
+                for number in range(start, stop)
+            ])
+            self.stdout.write(f"Seeded {stop - first} of {count} links")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ShortenerIndex.utils.link_transfer import FORMATS, export_rows, guess_format, open_transfer_file, write_rows
+
+
+class Command(BaseCommand):
+    help = ('Streams all links with their owners to JSON lines or CSV file, which can be loaded by import_links. '
+            'Links are read in chunks, memory use is constant regardless of the number of links.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the file, "-" for standard output. Paths ending with .gz '
+                                           'are compressed.')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='Format of the file, by default csv for .csv files and jsonl otherwise.')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Number of links fetched from the database at once.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or guess_format(options['output'])
+        # Report doesn't mix with exported links written to standard output
+        report = self.stderr if options['output'] == '-' else self.stdout
+
+        start = time.perf_counter()
+        with open_transfer_file(options['output'], 'w') as file:
+            count = write_rows(file, export_rows(options['chunk_size']), file_format)
+        elapsed = time.perf_counter() - start
+
+        report.write(self.style.SUCCESS(f"Exported {count} links in {elapsed:.1f}s "
+                                        f"({count / max(elapsed, 1e-9):.0f} links/s)"))
@@ -0,0 +1,30 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from ShortenerIndex.utils.load_test import TrafficGenerator, write_traffic
+
+
+class Command(BaseCommand):
+    help = ('Writes synthetic, Zipf distributed traffic (redirects, index page, API) as JSON lines, '
+            'to be replayed by replay_traffic command.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000,
+                            help='Number of generated requests.')
+        parser.add_argument('--links', type=int, default=10000,
+                            help='Number of links seeded before replay, redirects are spread over them.')
+        parser.add_argument('--links-per-client', type=int, default=2,
+                            help='Number of seeded links of every client.')
+        parser.add_argument('--exponent', type=float, default=1.1,
+                            help='Exponent of Zipf distribution of link popularity and client activity.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of random generator, same seed produces the same traffic.')
+        parser.add_argument('--output', default=os.path.join('benchmarks', 'requests.jsonl'),
+                            help='Path of written file.')
+
+    def handle(self, *args, **options):
+        generator = TrafficGenerator(links=options['links'], links_per_client=options['links_per_client'],
+                                     exponent=options['exponent'], seed=options['seed'])
+        written = write_traffic(options['output'], generator.header(), generator.generate(options['requests']))
+        self.stdout.write(self.style.SUCCESS(f"Written {written} requests to {options['output']}"))
@@ -0,0 +1,50 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ShortenerIndex.utils.link_transfer import FORMATS, TransferError, guess_format, import_links, \
+    open_transfer_file, parse_row, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Loads links written by export_links from JSON lines or CSV file, in batches saved by bulk inserts. '
+            'Missing clients are created, bans are taken from the file and link counts of clients are recounted. '
+            'Links with slugs which already exist are skipped, unless --update is passed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Path of the file, "-" for standard input. Paths ending with .gz '
+                                          'are decompressed.')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='Format of the file, by default csv for .csv files and jsonl otherwise.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of links saved in one transaction.')
+        parser.add_argument('--update', action='store_true',
+                            help='Overwrite existing links with the same slugs instead of skipping them.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or guess_format(options['input'])
+        created = updated = skipped = 0
+
+        start = time.perf_counter()
+        with open_transfer_file(options['input'], 'r') as file:
+            links = (parse_row(line_number, row) for line_number, row in read_rows(file, file_format))
+            try:
+                while True:
+                    batch = list(itertools.islice(links, options['batch_size']))
+                    if not batch:
+                        break
+                    batch_created, batch_updated, batch_skipped = import_links(batch, update=options['update'])
+                    created += batch_created
+                    updated += batch_updated
+                    skipped += batch_skipped
+                    total = created + updated + skipped
+                    self.stdout.write(f"Imported {total} links, "
+                                      f"{total / max(time.perf_counter() - start, 1e-9):.0f} links/s")
+            except TransferError as error:
+                raise CommandError(f"{error}, links before this batch were imported")
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished in {elapsed:.1f}s, created {created}, updated {updated} and skipped {skipped} links "
+            f"({(created + updated + skipped) / max(elapsed, 1e-9):.0f} links/s)"))
@@ -0,0 +1,56 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, IntegerField
+from django.utils import timezone
+
+from ShortenerIndex.models import Link, Client
+from ShortenerIndex.utils.link_cache import get_link_resolver
+from ShortenerIndex.utils.link_fragments import bump_links_version
+from ShortenerIndex.utils.utils import case_by_id
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired links in bounded batches and lowers link counts of their owners.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of links deleted in one transaction.')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to wait between batches, to leave room for other queries.')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches, by default runs until no expired link is left.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        batches = 0
+
+        while options['max_batches'] is None or batches < options['max_batches']:
+            # Uses index on expiration_date, oldest links are deleted first
+            candidate_ids = list(Link.objects.filter(expiration_date__lte=now).order_by('expiration_date')
+                                 .values_list('id', flat=True)[:options['batch_size']])
+            if not candidate_ids:
+                break
+
+            with transaction.atomic():
+                # Links are locked and read again, those deleted by their owners since the first read are skipped,
+                # owners already lowered their counts. Owners deleting locked links wait and delete nothing.
+                rows = list(Link.objects.select_for_update(of=('self',)).filter(id__in=candidate_ids)
+                            .values_list('id', 'client_id', 'url_output', 'client__client_address'))
+                deleted_per_client = Counter(client_id for _, client_id, _, _ in rows)
+                Link.objects.filter(id__in=[link_id for link_id, *_ in rows]).delete()
+                Client.objects.filter(id__in=list(deleted_per_client))\
+                    .update(urls_count=F('urls_count') - case_by_id(deleted_per_client, IntegerField()))
+            get_link_resolver().invalidate(*[slug for _, _, slug, _ in rows])
+            bump_links_version(*{address for *_, address in rows})
+
+            deleted += len(rows)
+            batches += 1
+            self.stdout.write(f"Deleted {deleted} expired links")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Finished, deleted {deleted} expired links in {batches} batches"))
@@ -0,0 +1,69 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ShortenerIndex.utils.clients import reconcile_links_counts
+
+
+class Command(BaseCommand):
+    help = ('Fixes urls_count of clients which differs from the number of their links. Clients are checked '
+            'in chunks ordered by id, every chunk is a few short queries, so it may run on a live database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of clients checked in one chunk.')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to wait between chunks, to leave room for other queries.')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many chunks, by default runs until all clients are checked.')
+        parser.add_argument('--checkpoint', default=None,
+                            help='File storing id of the last checked client, interrupted run continues from it.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Start again from the first client after every pass, until interrupted.')
+        parser.add_argument('--interval', type=float, default=300.0,
+                            help='Seconds to wait between passes with --loop.')
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as file:
+                return int(json.load(file)['last_id'])
+        except (ValueError, KeyError, TypeError) as error:
+            raise CommandError(f"Invalid checkpoint file {path}: {error}")
+
+    def write_checkpoint(self, path, last_id):
+        if not path:
+            return
+        # Replaced atomically, so interrupted write never leaves broken checkpoint
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump({'last_id': last_id}, file)
+        os.replace(temporary_path, path)
+
+    def handle(self, *args, **options):
+        last_id = self.read_checkpoint(options['checkpoint'])
+        batches = checked = fixed = 0
+
+        while options['max_batches'] is None or batches < options['max_batches']:
+            checked_id, checked_count, fixed_count = reconcile_links_counts(last_id, options['batch_size'])
+            if checked_id is None:
+                self.stdout.write(self.style.SUCCESS(f"Pass finished, checked {checked} clients, fixed {fixed}"))
+                last_id = 0
+                self.write_checkpoint(options['checkpoint'], last_id)
+                if not options['loop']:
+                    break
+                checked = fixed = 0
+                time.sleep(options['interval'])
+                continue
+
+            last_id = checked_id
+            self.write_checkpoint(options['checkpoint'], last_id)
+            batches += 1
+            checked += checked_count
+            fixed += fixed_count
+            self.stdout.write(f"Checked {checked} clients, fixed {fixed}")
+            if options['sleep']:
+                time.sleep(options['sleep'])
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from ShortenerIndex.utils.hit_counter import get_hit_counter
+from ShortenerIndex.utils.link_cache import get_link_resolver
+from ShortenerIndex.utils.load_test import read_traffic, replay, seed_traffic_links, summarize, \
+    compare_with_baseline
+
+
+class Command(BaseCommand):
+    help = ('Replays traffic written by generate_traffic against the application running in-process, '
+            'reports throughput, latency percentiles and query counts per endpoint. '
+            'Runs on a fresh test database, data of the configured database is not touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', default=os.path.join('benchmarks', 'requests.jsonl'),
+                            help='Path of traffic file.')
+        parser.add_argument('--asgi', action='store_true',
+                            help='Send requests through ASGI handler instead of WSGI, '
+                                 'set ASYNC_VIEWS=1 to measure async views.')
+        parser.add_argument('--warmup', type=int, default=500,
+                            help='Number of first requests replayed but not measured.')
+        parser.add_argument('--baseline', default=None,
+                            help='Path of baseline file, fails if results regressed against it.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write results to --baseline path instead of comparing with it.')
+        parser.add_argument('--rate-limit', action='store_true',
+                            help='Apply RATE_LIMITS to replayed requests, by default they are not limited.')
+        parser.add_argument('--latency-tolerance', type=float, default=0.25,
+                            help='Allowed relative increase of latency and decrease of throughput.')
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError("--save-baseline requires --baseline path")
+        header, records = read_traffic(options['input'])
+        warmup, measured = records[:options['warmup']], records[options['warmup']:]
+        if not measured:
+            raise CommandError(f"Traffic has only {len(records)} requests, less than --warmup")
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Traffic is replayed faster than real clients send it, limits would make results depend on speed
+        # of the machine. Buckets of the running application are never touched.
+        buckets_directory = tempfile.TemporaryDirectory()
+        rate_limit = override_settings(RATE_LIMIT_ENABLED=options['rate_limit'],
+                                       RATE_LIMIT_PATH=os.path.join(buckets_directory.name, 'buckets'))
+        rate_limit.enable()
+        try:
+            seed_traffic_links(header)
+            caches['default'].clear()
+            get_link_resolver().clear()
+
+            replay(warmup, asgi=options['asgi'])
+            start = time.perf_counter()
+            samples = replay(measured, asgi=options['asgi'])
+            summary = summarize(samples, time.perf_counter() - start)
+        finally:
+            # Hits counted during the replay are written to the test database, before it's destroyed
+            get_hit_counter().flush()
+            rate_limit.disable()
+            buckets_directory.cleanup()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.print_summary(summary, options['asgi'])
+        if not options['baseline']:
+            return
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump({'header': header, 'asgi': options['asgi'], 'vendor': connection.vendor,
+                           'summary': summary}, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+            return
+
+        with open(options['baseline']) as file:
+            baseline = json.load(file)
+        if (baseline['header'], baseline['asgi'], baseline['vendor']) != (header, options['asgi'], connection.vendor):
+            self.stdout.write(self.style.WARNING("Baseline was measured with different traffic, handler or database"))
+        regressions = compare_with_baseline(summary, baseline['summary'], options['latency_tolerance'])
+        if regressions:
+            raise CommandError("Performance regressed against baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def print_summary(self, summary, asgi):
+        self.stdout.write(f"{connection.vendor}, {'ASGI' if asgi else 'WSGI'}")
+        self.stdout.write(f"{'endpoint':<14}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'queries':>9}  statuses")
+        for endpoint, stats in summary.items():
+            statuses = ', '.join(f'{status}: {count}' for status, count in stats['statuses'].items())
+            self.stdout.write(f"{endpoint:<14}{stats['requests']:>9}{stats['throughput']:>9.1f}{stats['p50']:>9.3f}"
+                              f"{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['queries']:>9.2f}  {statuses}")
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from .db_router import start_replica_reads, finish_replica_reads, pin_client
+from .utils.metrics import get_request_metrics, start_request, finish_request
+from .utils.rate_limit import get_rate_limiter
+from .utils.utils import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Records wall time, database time and query count of every request under name of the resolved view,
+    metrics are exposed by MetricsView. Should be the first middleware, to measure the others as well.
+    Works with both WSGI and ASGI handlers, without switching between threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.metrics = get_request_metrics()
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Marks the instance as coroutine function for the handler, like Django's MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer, token = start_request()
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.record(request, time.perf_counter() - start, timer)
+            finish_request(token)
+
+    async def __acall__(self, request):
+        timer, token = start_request()
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.record(request, time.perf_counter() - start, timer)
+            finish_request(token)
+
+    def record(self, request, duration, timer):
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else 'unresolved'
+        self.metrics.record(view_name, duration, timer.db_time, timer.queries)
+        if duration >= settings.METRICS_SLOW_REQUEST:
+            logger.warning("Slow request %s %s (%s): %.3f s, %d queries took %.3f s", request.method,
+                           request.path, view_name, duration, timer.queries, timer.db_time)
+
+
+class RateLimitMiddleware:
+    """
+    Limits requests of every client IP to views listed in RATE_LIMITS setting with token buckets
+    shared by workers of the host. Exceeding requests get 429 response before the view runs,
+    requests to other views only pay for one dictionary lookup.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMIT_ENABLED or not settings.RATE_LIMITS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # Limits in tokens per second and burst size
+        self.limits = {key: (per_minute / 60, burst) for key, (per_minute, burst) in settings.RATE_LIMITS.items()}
+        self.buckets = get_rate_limiter()
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            # Checks don't block for long, async handler would otherwise run them in a thread
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self.check(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return self.check(request)
+
+    def check(self, request):
+        """
+        Returns 429 response if client exceeded limit of the requested view, otherwise None.
+        """
+        view_name = request.resolver_match.view_name
+        limit = self.limits.get((view_name, request.method))
+        if limit is None:
+            return None
+
+        wait = self.buckets.take(f'{view_name}|{get_client_ip(request)}', *limit)
+        if not wait:
+            return None
+        response = HttpResponse("Too many requests, try again later.", status=429, content_type='text/plain')
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ReplicaRouter send reads of safe requests to views in DATABASE_REPLICA_VIEWS to replicas.
+    Clients whose unsafe request succeeded are pinned to the primary for a while, to read their own writes.
+    Not used without DATABASE_REPLICAS.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.views = frozenset(settings.DATABASE_REPLICA_VIEWS)
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            # Only sets context variable, async handler would otherwise run it in a thread
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(request)
+        return self.after_response(request, response)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(request)
+        return self.after_response(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.start(request)
+
+    def start(self, request):
+        if request.method in self.safe_methods and request.resolver_match.view_name in self.views:
+            request._replica_reads_token = start_replica_reads(get_client_ip(request))
+
+    def finish(self, request):
+        token = getattr(request, '_replica_reads_token', None)
+        if token is not None:
+            finish_replica_reads(token)
+
+    def after_response(self, request, response):
+        if request.method not in self.safe_methods and response.status_code < 400:
+            pin_client(get_client_ip(request))
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.5 on 2026-10-18 16:58
+
+import secrets
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def create_link_sequence(apps, schema_editor):
+    SlugSequence = apps.get_model('ShortenerIndex', 'SlugSequence')
+    SlugSequence.objects.get_or_create(name='link', defaults={'secret': secrets.token_hex(32)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0005_alter_link_creation_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('next_value', models.BigIntegerField(default=0)),
+                ('secret', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='link',
+            name='url_input',
+            field=models.CharField(max_length=255, validators=[django.core.validators.RegexValidator(message='Only alphabetic and ":/." characters are allowed in URL to shorten.', regex='^[a-zA-Z:/.]*$')]),
+        ),
+        migrations.RunPython(create_link_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0006_slugsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='hits',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
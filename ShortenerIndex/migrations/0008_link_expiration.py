@@ -0,0 +1,26 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:03
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+from django.utils.timezone import utc
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0007_link_hits'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='link',
+            name='duration',
+            field=models.IntegerField(blank=True, help_text='Lifetime of the link in hours, leave empty for permanent link.', null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(87600)]),
+        ),
+        migrations.AlterField(
+            model_name='link',
+            name='expiration_date',
+            field=models.DateTimeField(blank=True, db_index=True, default=datetime.datetime(2055, 12, 11, 23, 7, tzinfo=utc)),
+        ),
+    ]
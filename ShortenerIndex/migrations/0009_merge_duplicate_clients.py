@@ -0,0 +1,32 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:04
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_clients(apps, schema_editor):
+    """
+    Moves links of clients sharing the same address to the oldest of them, so the address can be unique.
+    """
+    Client = apps.get_model('ShortenerIndex', 'Client')
+    Link = apps.get_model('ShortenerIndex', 'Link')
+    duplicates = Client.objects.values('client_address')\
+        .annotate(clients=Count('id'), keep_id=Min('id')).filter(clients__gt=1)
+    for duplicate in duplicates:
+        others = Client.objects.filter(client_address=duplicate['client_address'])\
+            .exclude(id=duplicate['keep_id'])
+        Link.objects.filter(client__in=others).update(client_id=duplicate['keep_id'])
+        Client.objects.filter(id=duplicate['keep_id'])\
+            .update(urls_count=Link.objects.filter(client_id=duplicate['keep_id']).count())
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0008_link_expiration'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_clients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+# Covers all columns read by redirects (ResolvedLink fields), so they are answered with index only scan.
+# Only PostgreSQL supports included columns, elsewhere the unique index on url_output is used.
+REDIRECT_INDEX = 'link_redirect_covering_idx'
+
+
+def create_redirect_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX {REDIRECT_INDEX} ON "ShortenerIndex_link" (url_output) '
+                              f'INCLUDE (id, url_input, expiration_date)')
+
+
+def drop_redirect_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {REDIRECT_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0009_merge_duplicate_clients'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='client_address',
+            field=models.CharField(blank=True, max_length=15, unique=True),
+        ),
+        migrations.RunPython(create_redirect_index, drop_redirect_index),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['client', 'creation_date', 'id'], name='link_client_created_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+from ShortenerIndex.utils.utils import url_hash
+
+
+def hash_urls(apps, schema_editor):
+    """
+    Fills url_hash of existing links, in batches to keep memory bounded on large tables.
+    """
+    Link = apps.get_model('ShortenerIndex', 'Link')
+    last_id = 0
+    while True:
+        links = list(Link.objects.filter(id__gt=last_id).order_by('id').only('id', 'url_input')[:1000])
+        if not links:
+            break
+        for link in links:
+            link.url_hash = url_hash(link.url_input)
+        Link.objects.bulk_update(links, ['url_hash'])
+        last_id = links[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0010_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='url_hash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(hash_urls, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['url_hash', 'client'], name='link_url_hash_idx'),
+        ),
+    ]
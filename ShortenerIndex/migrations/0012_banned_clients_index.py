@@ -0,0 +1,17 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ShortenerIndex', '0011_link_url_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(condition=models.Q(('is_banned', True)), fields=['id'], name='client_banned_idx'),
+        ),
+    ]
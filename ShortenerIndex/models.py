@@ -2,19 +2,32 @@ import datetime
 import pytz
 
 from django.db import models
-from django.core.validators import RegexValidator
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
+from django.utils import timezone
+
+from .utils.utils import url_hash
 # Create your models here.
 
 
 class Client(models.Model):
     urls_count = models.IntegerField(blank=True, default=1)
-    client_address = models.CharField(max_length=15, blank=True)
+    client_address = models.CharField(max_length=15, blank=True, unique=True)
     is_banned = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Few clients are banned, filtering them in admin shouldn't scan all clients
+            models.Index(fields=['id'], condition=models.Q(is_banned=True), name='client_banned_idx'),
+        ]
+
     def __str__(self):
         return f"user-{self.id}"
 
 
+# Ten years, in hours
+MAX_DURATION = 24 * 365 * 10
+
+
 class Link(models.Model):
     # Only signs needed for creating URL are allowed
     alphabetic = RegexValidator(regex=r'^[a-zA-Z:/.]*$',
@@ -23,12 +36,62 @@ class Link(models.Model):
 
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     url_input = models.CharField(max_length=255, validators=[alphabetic])
+    # PostgreSQL additionally has covering index for redirects, see migration 0010
     url_output = models.CharField(max_length=255, unique=True, blank=True)
-    duration = models.IntegerField(blank=True, null=True)
+    # Lifetime of the link in hours, links without duration don't expire in practice
+    duration = models.IntegerField(blank=True, null=True,
+                                   validators=[MinValueValidator(1), MaxValueValidator(MAX_DURATION)],
+                                   help_text='Lifetime of the link in hours, leave empty for permanent link.')
     creation_date = models.DateTimeField(auto_now_add=True)
-    expiration_date = models.DateTimeField(blank=True,
+    expiration_date = models.DateTimeField(blank=True, db_index=True,
                                            default=datetime.datetime(2055, 12, 12,
                                                                      tzinfo=pytz.timezone('Europe/Berlin')))
+    # Redirect count, written in bulk by HitCounter, so it may lag behind for a few seconds
+    hits = models.BigIntegerField(default=0)
+    # Hash of normalized url_input, compact key for finding links by destination
+    url_hash = models.BigIntegerField(blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Ordered listing of links of the client
+            models.Index(fields=['client', 'creation_date', 'id'], name='link_client_created_idx'),
+            # Duplicates of the client, and search by destination in admin
+            models.Index(fields=['url_hash', 'client'], name='link_url_hash_idx'),
+        ]
 
     def __str__(self):
         return f"{self.url_input} ({self.id})"
+
+    def apply_duration(self):
+        """
+        Sets expiration date of the new link from its duration. Called by save, has to be called manually
+        for links created with bulk_create.
+        """
+        if self.duration:
+            self.expiration_date = timezone.now() + datetime.timedelta(hours=self.duration)
+
+    def apply_url_hash(self):
+        """
+        Sets hash of the destination. Called by save, has to be called manually for links created with bulk_create.
+        """
+        self.url_hash = url_hash(self.url_input)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.apply_duration()
+        self.apply_url_hash()
+        super().save(*args, **kwargs)
+
+
+class SlugSequence(models.Model):
+    """
+    Named counter from which workers reserve blocks of numbers that are turned into slugs.
+    Secret is the key of the permutation scrambling the numbers, it's generated once per database
+    and must never change, otherwise newly generated slugs could collide with existing ones.
+    """
+    name = models.CharField(max_length=32, unique=True)
+    next_value = models.BigIntegerField(default=0)
+    secret = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
@@ -0,0 +1,49 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of admin changelists of large tables.
+
+    Unfiltered PostgreSQL tables are counted from planner statistics instead of COUNT(*), which has to scan
+    the whole table. Estimates below estimate_threshold, filtered querysets and other databases are counted
+    exactly, the number of pages may be off by a few while statistics are stale.
+
+    Pages are fetched with late row lookup: OFFSET skips only primary keys, read from the index
+    of the ordering, and full rows (with their select_related joins) are fetched for the page only.
+    """
+    estimate_threshold = 100000
+
+    def estimated_count(self):
+        """
+        Returns estimated number of rows of the unfiltered table, or None if it can't be used.
+        """
+        queryset = self.object_list
+        if queryset.query.where or queryset.query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+        if row is None or row[0] < self.estimate_threshold:
+            return None
+        return int(row[0])
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is not None:
+            return estimate
+        return super().count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        ids = list(self.object_list.values_list('pk', flat=True)[bottom:bottom + self.per_page])
+        # Keeps ordering of the queryset
+        return self._get_page(self.object_list.filter(pk__in=ids), number, self)
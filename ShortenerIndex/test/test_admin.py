@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from ..admin import LinkAdmin
+from ..models import Link, Client
+from ..utils.link_cache import get_link_resolver
+from .test_models import LinkTest, ClientTest
+
+
+class TestLinkAdmin(TestCase):
+    """
+    Tests searching links by slug and destination, and changelist of many links in admin
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        self.test_client = ClientTest.create_client()
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=self.test_client)
+        LinkTest.create_link(url_input='www.onet.pl', url_output='klmnoPQRST', client_instance=self.test_client)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def search(self, term):
+        response = self.client.get(reverse('admin:ShortenerIndex_link_changelist'), {'q': term})
+        return [link.url_output for link in response.context['cl'].result_list]
+
+    def test_search_by_destination(self):
+        self.assertEqual(self.search('http://WWW.wp.pl/'), ['abcdeFGHIJ'])
+
+    def test_search_by_slug(self):
+        self.assertEqual(self.search('klmnoPQRST'), ['klmnoPQRST'])
+        self.assertEqual(self.search('wp'), [])
+
+    def test_changelist_queries_dont_grow_with_rows(self):
+        for number in range(30):
+            LinkTest.create_link(url_output=f'slug{number}', client_instance=self.test_client)
+        url = reverse('admin:ShortenerIndex_link_changelist')
+
+        with patch.object(LinkAdmin, 'list_per_page', 10):
+            # Session, user, count, ids of the page, links of the page with their clients
+            with self.assertNumQueries(5):
+                response = self.client.get(url)
+            with self.assertNumQueries(5):
+                last_page = self.client.get(url, {'p': 4})
+
+        self.assertEqual(len(response.context['cl'].result_list), 10)
+        self.assertEqual([link.url_output for link in last_page.context['cl'].result_list],
+                         ['klmnoPQRST', 'abcdeFGHIJ'])
+
+    def test_deleted_links_are_recounted(self):
+        self.test_client.urls_count = 5
+        self.test_client.save()
+        url = reverse('admin:ShortenerIndex_link_changelist')
+
+        self.client.post(url, {'action': 'delete_selected', 'post': 'yes',
+                               '_selected_action': list(Link.objects.filter(url_output='abcdeFGHIJ')
+                                                        .values_list('id', flat=True))})
+
+        self.test_client.refresh_from_db()
+        self.assertEqual(self.test_client.urls_count, 1)
+
+
+class TestClientAdmin(TestCase):
+    """
+    Tests bulk actions of clients in admin
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        self.test_clients = [ClientTest.create_client(test_ip=f'10.0.0.{number}') for number in range(3)]
+        for number, test_client in enumerate(self.test_clients):
+            LinkTest.create_link(url_output=f'abcdeFGHI{number}', client_instance=test_client)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.url = reverse('admin:ShortenerIndex_client_changelist')
+        self.selected = [test_client.pk for test_client in self.test_clients[:2]]
+
+    def test_ban_clients(self):
+        self.client.post(self.url, {'action': 'ban_clients', '_selected_action': self.selected})
+
+        self.assertEqual(list(Client.objects.filter(is_banned=True).values_list('pk', flat=True)), self.selected)
+
+    def test_purge_links(self):
+        # Resolved links must not be served after they were purged
+        self.client.get(reverse('redirect', args=['abcdeFGHI0']))
+
+        self.client.post(self.url, {'action': 'purge_links', '_selected_action': self.selected})
+        response = self.client.get(reverse('redirect', args=['abcdeFGHI0']))
+
+        self.assertEqual(list(Link.objects.values_list('url_output', flat=True)), ['abcdeFGHI2'])
+        self.assertEqual(list(Client.objects.order_by('pk').values_list('urls_count', flat=True)), [0, 0, 1])
+        self.assertEqual(response.status_code, 404)
+
+    def test_recount_links(self):
+        Client.objects.update(urls_count=4)
+
+        self.client.post(self.url, {'action': 'recount_client_links', '_selected_action': self.selected})
+
+        self.assertEqual(list(Client.objects.order_by('pk').values_list('urls_count', flat=True)), [1, 1, 4])
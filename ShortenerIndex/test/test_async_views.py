@@ -0,0 +1,38 @@
+from django.http import Http404
+from django.test import TestCase
+from django.test.client import AsyncRequestFactory
+
+from ..async_views import AsyncRedirectView
+from ..utils.link_cache import get_link_resolver
+from .test_models import LinkTest, ClientTest
+
+
+class TestAsyncRedirectView(TestCase):
+    def setUp(self):
+        get_link_resolver().clear()
+        self.factory = AsyncRequestFactory()
+        self.view = AsyncRedirectView.as_view()
+        test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=test_client)
+
+    async def test_redirect(self):
+        """
+        Tests redirection with async view, second redirection should be served from the local cache
+        """
+        response = await self.view(self.factory.get('/l/abcdeFGHIJ/'), url_output='abcdeFGHIJ')
+        cached_response = await self.view(self.factory.get('/l/abcdeFGHIJ/'), url_output='abcdeFGHIJ')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'http://www.wp.pl')
+        self.assertEqual(cached_response['Location'], 'http://www.wp.pl')
+        self.assertEqual(get_link_resolver().stats()['misses'], 1)
+
+    async def test_deletion_is_passed_to_sync_view(self):
+        """
+        Deleting a link with POST request is handled by the sync view
+        """
+        response = await self.view(self.factory.post('/l/abcdeFGHIJ/'), url_output='abcdeFGHIJ')
+
+        self.assertEqual(response.status_code, 302)
+        with self.assertRaises(Http404):
+            await self.view(self.factory.get('/l/abcdeFGHIJ/'), url_output='abcdeFGHIJ')
@@ -0,0 +1,217 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+
+from ..models import Link, Client
+from ..utils.clients import resolve_client, claim_links, release_links, reconcile_links_counts, CLIENT_BANNED, \
+    LINK_LIMIT_REACHED
+from ..utils.link_cache import get_link_resolver
+from ..utils.rate_limit import get_rate_limiter
+from ..utils.slugs import SlugAllocator
+from .test_models import LinkTest, ClientTest
+
+
+def reserved_slug_allocator():
+    """
+    Patches allocator of the process with one holding reserved block, so views allocate slugs without queries.
+    """
+    allocator = SlugAllocator(block_size=100)
+    allocator.allocate()
+    return patch('ShortenerIndex.utils.slugs._slug_allocator', allocator)
+
+
+class TestClientResolver(TestCase):
+    """
+    Tests resolving client of the request and claiming links from its quota
+    """
+    def setUp(self):
+        self.request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+
+    def test_client_is_created_once(self):
+        client = resolve_client(self.request)
+        again_client = resolve_client(RequestFactory().get('/', REMOTE_ADDR='10.0.0.1'))
+
+        self.assertEqual(client, again_client)
+        self.assertEqual(client.urls_count, 0)
+        self.assertEqual(Client.objects.get().client_address, '10.0.0.1')
+
+    def test_client_is_memoized_on_request(self):
+        ClientTest.create_client(test_ip='10.0.0.1')
+
+        with self.assertNumQueries(1):
+            client = resolve_client(self.request)
+            same_client = resolve_client(self.request)
+
+        self.assertIs(client, same_client)
+
+    def test_claim_links(self):
+        client = resolve_client(self.request)
+
+        with self.assertNumQueries(1):
+            refusal = claim_links(client, 5)
+        exceeding_refusal = claim_links(client)
+        release_links(client.id, 2)
+        client.refresh_from_db()
+
+        self.assertIsNone(refusal)
+        self.assertEqual(exceeding_refusal, LINK_LIMIT_REACHED)
+        self.assertEqual(client.urls_count, 3)
+
+    def test_claim_links_of_client_banned_after_resolving(self):
+        client = resolve_client(self.request)
+        Client.objects.filter(pk=client.pk).update(is_banned=True)
+
+        refusal = claim_links(client)
+        client.refresh_from_db()
+
+        self.assertEqual(refusal, CLIENT_BANNED)
+        self.assertEqual(client.urls_count, 0)
+
+
+class TestViewQueryCounts(TestCase):
+    """
+    Tests number of queries executed by views of the main page, guards against repeated lookups
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        get_rate_limiter().clear()
+        cache.clear()
+        self.test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=self.test_client)
+
+    def test_index_get(self):
+        # Links of the client
+        with self.assertNumQueries(1):
+            self.client.get(reverse('index'))
+
+    def test_index_post(self):
+        with reserved_slug_allocator():
+            # Client, links to the same destination, savepoint, claim of the link, new link, savepoint release,
+            # links of the client
+            with self.assertNumQueries(7):
+                response = self.client.post(reverse('index'), data={'url_input': 'www.onet.pl'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Link.objects.filter(client=self.test_client).count(), 2)
+
+    def test_index_post_of_shortened_destination(self):
+        # Client, links to the same destination, links of the client
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('index'), data={'url_input': 'WWW.wp.pl/'})
+
+        self.test_client.refresh_from_db()
+        self.assertContains(response, '/l/abcdeFGHIJ')
+        self.assertEqual(Link.objects.filter(client=self.test_client).count(), 1)
+        self.assertEqual(self.test_client.urls_count, 1)
+
+    def test_client_at_limit_gets_shortened_destination(self):
+        Client.objects.filter(pk=self.test_client.pk).update(urls_count=settings.CLIENT_LINK_LIMIT)
+
+        index_response = self.client.post(reverse('index'), data={'url_input': 'www.wp.pl'})
+        api_response = self.client.post(reverse('links-list'), data={'url_input': 'www.wp.pl'})
+        new_response = self.client.post(reverse('links-list'), data={'url_input': 'www.onet.pl'})
+
+        self.assertContains(index_response, '/l/abcdeFGHIJ')
+        self.assertEqual((api_response.status_code, api_response.data['url_output']), (200, 'abcdeFGHIJ'))
+        self.assertEqual(new_response.status_code, 403)
+
+    def test_failed_save_keeps_quota(self):
+        with patch.object(Link, 'save', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.client.post(reverse('index'), data={'url_input': 'www.onet.pl'})
+        with patch('API.views.LinkSerializer.save', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.client.post(reverse('links-list'), data={'url_input': 'www.onet.pl'})
+
+        self.test_client.refresh_from_db()
+        self.assertEqual(self.test_client.urls_count, 1)
+
+    def test_index_post_of_banned_client(self):
+        Client.objects.filter(pk=self.test_client.pk).update(is_banned=True)
+
+        # Client, links of the client, banned client doesn't try to claim the link
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('index'), data={'url_input': 'www.onet.pl'})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_redirect(self):
+        # Link, slug filter is built in background
+        with self.assertNumQueries(1):
+            self.client.get(reverse('redirect', args=['abcdeFGHIJ']))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('redirect', args=['abcdeFGHIJ']))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_link_deletion(self):
+        # Link with its owner, deletion, release of the link
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('redirect', args=['abcdeFGHIJ']))
+
+        self.test_client.refresh_from_db()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.test_client.urls_count, 0)
+
+
+class TestLinksCountReconciliation(TestCase):
+    """
+    Tests fixing drifted urls_count of clients in chunks, with checkpoint of progress
+    """
+    def setUp(self):
+        self.test_clients = [ClientTest.create_client(test_ip=f'10.0.0.{number}') for number in range(5)]
+        for number, test_client in enumerate(self.test_clients):
+            for link_number in range(number % 3):
+                LinkTest.create_link(url_output=f'slug{number}x{link_number}', client_instance=test_client)
+        Client.objects.update(urls_count=1)
+
+    def test_chunk_is_checked_with_three_queries(self):
+        # Clients, grouped count of links, recount of mismatched clients
+        with self.assertNumQueries(3):
+            last_id, checked, fixed = reconcile_links_counts(batch_size=3)
+
+        self.assertEqual(last_id, self.test_clients[2].id)
+        self.assertEqual((checked, fixed), (3, 2))
+        self.assertEqual(list(Client.objects.order_by('id').values_list('urls_count', flat=True)), [0, 1, 2, 1, 1])
+
+    def test_command_continues_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'checkpoint.json')
+
+            call_command('reconcile_urls_count', batch_size=2, max_batches=1, checkpoint=checkpoint, stdout=StringIO())
+            with open(checkpoint) as file:
+                interrupted_at = json.load(file)['last_id']
+            # Already checked clients are not checked again
+            Client.objects.filter(id=self.test_clients[0].id).update(urls_count=3)
+            call_command('reconcile_urls_count', batch_size=2, checkpoint=checkpoint, stdout=StringIO())
+            with open(checkpoint) as file:
+                finished_at = json.load(file)['last_id']
+
+        self.assertEqual(interrupted_at, self.test_clients[1].id)
+        self.assertEqual(finished_at, 0)
+        self.assertEqual(list(Client.objects.order_by('id').values_list('urls_count', flat=True)), [3, 1, 2, 0, 1])
+
+
+class TestSyntheticLinks(TestCase):
+    """
+    Tests that synthetic data of explain_lookups command never touches real clients
+    """
+    def test_clear_deletes_only_synthetic_clients(self):
+        real_client = ClientTest.create_client(test_ip='10.0.0.1')
+        banned_client = ClientTest.create_client(test_ip='10.0.0.2')
+        Client.objects.filter(id=banned_client.id).update(is_banned=True)
+
+        call_command('explain_lookups', seed=5, links_per_client=2, repeat=1, stdout=StringIO())
+        seeded_links = Link.objects.exclude(client__in=[real_client, banned_client]).count()
+        call_command('explain_lookups', clear=True, stdout=StringIO())
+
+        self.assertEqual(seeded_links, 5)
+        self.assertEqual(set(Client.objects.values_list('client_address', flat=True)), {'10.0.0.1', '10.0.0.2'})
+        self.assertFalse(Link.objects.exists())
@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import resolve
+
+from ..db_router import ReplicaRouter, choose_replica, pin_client, start_replica_reads, finish_replica_reads
+from ..middleware import ReplicaRoutingMiddleware
+from ..models import Link
+
+REPLICAS = {'replica_0': 1, 'replica_1': 3}
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class TestReplicaRouter(TestCase):
+    """
+    Tests routing of reads to weighted replicas, and pinning clients which wrote to the primary
+    """
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+
+    def read_alias(self, client_ip='10.0.0.1'):
+        token = start_replica_reads(client_ip)
+        try:
+            return self.router.db_for_read(Link)
+        finally:
+            finish_replica_reads(token)
+
+    def test_reads_outside_of_read_only_views_use_primary(self):
+        self.assertIsNone(self.router.db_for_read(Link))
+        self.assertEqual(self.router.db_for_write(Link), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_0', 'ShortenerIndex'))
+        with override_settings(DATABASE_REPLICAS={}), self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(HttpResponse)
+
+    def test_replicas_are_chosen_by_weight(self):
+        random.seed(0)
+        chosen = Counter(choose_replica(REPLICAS) for _ in range(1000))
+
+        self.assertAlmostEqual(chosen['replica_1'] / 1000, 0.75, delta=0.05)
+        self.assertEqual(set(self.read_alias() for _ in range(50)), set(REPLICAS))
+
+    def test_pinned_client_reads_from_primary(self):
+        pin_client('10.0.0.1')
+
+        self.assertEqual(self.read_alias('10.0.0.1'), 'default')
+        self.assertIn(self.read_alias('10.0.0.2'), REPLICAS)
+
+    def test_middleware_routes_safe_requests_of_read_only_views(self):
+        factory = RequestFactory()
+        aliases = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            aliases.append(self.router.db_for_read(Link))
+            return HttpResponse(status=302 if request.method == 'POST' else 200)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        for request in (factory.get('/l/abcdeFGHIJ/'), factory.get('/admin/'), factory.post('/l/abcdeFGHIJ/'),
+                        factory.get('/l/abcdeFGHIJ/')):
+            request.resolver_match = resolve(request.path)
+            middleware(request)
+
+        self.assertIn(aliases[0], REPLICAS)
+        # Admin and unsafe requests use primary, client is pinned after successful write
+        self.assertEqual(aliases[1:], [None, None, 'default'])
+        self.assertIsNone(self.router.db_for_read(Link))
+
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Link
+from ..models import Client as model_client
+from ..utils.clients import release_links
+from ..utils.link_cache import get_link_resolver
+from ..utils.rate_limit import get_rate_limiter
+from .test_models import LinkTest, ClientTest
+
+
+class TestLinkExpiration(TestCase):
+    """
+    Tests expiration of links with set duration
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        get_rate_limiter().clear()
+        cache.clear()
+        self.test_client = ClientTest.create_client()
+
+    def test_form_sets_expiration(self):
+        self.client.post(reverse('index'), data={'url_input': 'www.onet.pl', 'duration': 3})
+        created_link = Link.objects.get(url_input='www.onet.pl')
+
+        self.assertEqual(created_link.duration, 3)
+        self.assertAlmostEqual(created_link.expiration_date, timezone.now() + timedelta(hours=3),
+                               delta=timedelta(seconds=5))
+
+    def test_expired_link_is_not_redirected(self):
+        expired_link = LinkTest.create_link(url_output='abcdeFGHIJ', client_instance=self.test_client)
+        Link.objects.filter(id=expired_link.id).update(expiration_date=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.get(reverse('redirect', args=['abcdeFGHIJ']))
+
+        self.assertEqual(response.status_code, 410)
+
+    def test_purge_expired_links(self):
+        """
+        Expired links are deleted in batches, and owners link counts are lowered accordingly
+        """
+        other_client = ClientTest.create_client(test_ip='1.2.3.4')
+        model_client.objects.filter(id=self.test_client.id).update(urls_count=3)
+        model_client.objects.filter(id=other_client.id).update(urls_count=1)
+        for slug, owner in (('aaaaaaaaaa', self.test_client), ('bbbbbbbbbb', self.test_client),
+                            ('cccccccccc', other_client)):
+            LinkTest.create_link(url_output=slug, client_instance=owner)
+        LinkTest.create_link(url_output='dddddddddd', client_instance=self.test_client)
+        Link.objects.exclude(url_output='dddddddddd').update(expiration_date=timezone.now() - timedelta(hours=1))
+
+        call_command('purge_expired_links', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(list(Link.objects.values_list('url_output', flat=True)), ['dddddddddd'])
+        self.assertEqual(model_client.objects.get(id=self.test_client.id).urls_count, 1)
+        self.assertEqual(model_client.objects.get(id=other_client.id).urls_count, 0)
+
+    def test_purge_skips_links_deleted_by_owner(self):
+        """
+        Link deleted by its owner after purge selected it lowers the link count only once
+        """
+        model_client.objects.filter(id=self.test_client.id).update(urls_count=2)
+        for slug in ('aaaaaaaaaa', 'bbbbbbbbbb'):
+            LinkTest.create_link(url_output=slug, client_instance=self.test_client)
+        Link.objects.update(expiration_date=timezone.now() - timedelta(hours=1))
+        select_for_update = QuerySet.select_for_update
+
+        def delete_by_owner(queryset, *args, **kwargs):
+            deleted, _ = Link.objects.filter(url_output='aaaaaaaaaa').delete()
+            if deleted:
+                release_links(self.test_client.id)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', delete_by_owner):
+            call_command('purge_expired_links', stdout=StringIO())
+
+        self.assertFalse(Link.objects.exists())
+        self.assertEqual(model_client.objects.get(id=self.test_client.id).urls_count, 0)
@@ -0,0 +1,189 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.test import TestCase, RequestFactory, override_settings
+from django.utils import timezone
+
+from ..fast_redirects import FastRedirectWSGI, FastRedirectASGI
+from ..models import Link
+from ..utils.hit_counter import get_hit_counter
+from ..utils.link_cache import get_link_resolver
+from ..utils.metrics import get_request_metrics
+from .test_models import LinkTest, ClientTest
+
+
+class TestFastRedirectWSGI(TestCase):
+    """
+    Tests answering redirects in front of Django, and passing other requests to it
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        get_hit_counter().flush()
+        get_request_metrics().clear()
+        cache.clear()
+        # Requests without Host header are left to Django
+        self.factory = RequestFactory(HTTP_HOST='testserver')
+        self.application = FastRedirectWSGI(get_wsgi_application())
+        test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        self.link = LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=test_client)
+        expired = LinkTest.create_link(url_output='expired', client_instance=test_client)
+        Link.objects.filter(id=expired.id).update(expiration_date=timezone.now() - timedelta(hours=1))
+
+    def call(self, request):
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+
+        response = self.application(request.environ, start_response)
+        body = b''.join(response)
+        getattr(response, 'close', lambda: None)()
+        status, headers = started[0]
+        return int(status.split()[0]), headers, body
+
+    def test_redirect_is_answered_without_django(self):
+        self.call(self.factory.get('/l/abcdeFGHIJ/'))
+
+        # Link is resolved from the local cache, only hit is counted
+        with self.assertNumQueries(0):
+            status, headers, body = self.call(self.factory.get('/l/abcdeFGHIJ/'))
+            head_status, _, head_body = self.call(self.factory.head('/l/abcdeFGHIJ/'))
+
+        self.assertEqual((status, head_status), (302, 302))
+        self.assertEqual(headers['Location'], 'http://www.wp.pl')
+        self.assertEqual(headers['Content-Length'], '0')
+        self.assertEqual(headers['Referrer-Policy'], 'same-origin')
+        self.assertIn('max-age', headers['Cache-Control'])
+        self.assertEqual((body, head_body), (b'', b''))
+        self.assertEqual(get_hit_counter().stats()['pending_hits'], 3)
+        self.assertIn('linkshortener_request_duration_seconds_count{view="redirect"} 3',
+                      get_request_metrics().render())
+
+    def test_other_requests_reach_django(self):
+        # Unknown and expired links are answered by the view
+        self.assertEqual(self.call(self.factory.get('/l/unknown/'))[0], 404)
+        self.assertEqual(self.call(self.factory.get('/l/expired/'))[0], 410)
+        # Missing slash is added by common middleware
+        self.assertEqual(self.call(self.factory.get('/l/abcdeFGHIJ'))[0], 301)
+        self.assertEqual(self.call(self.factory.get('/'))[0], 200)
+
+        # Deletion goes through middleware, including CSRF protection
+        status, _, _ = self.call(self.factory.post('/l/abcdeFGHIJ/'))
+
+        self.assertEqual(status, 403)
+        self.assertTrue(Link.objects.filter(id=self.link.id).exists())
+
+    @override_settings(ALLOWED_HOSTS=['example.com'])
+    def test_requests_for_other_hosts_reach_django(self):
+        status, _, _ = self.call(self.factory.get('/l/abcdeFGHIJ/'))
+        allowed_status, _, _ = self.call(self.factory.get('/l/abcdeFGHIJ/', HTTP_HOST='example.com:8000'))
+
+        # Django rejects the host
+        self.assertEqual(status, 400)
+        self.assertEqual(allowed_status, 302)
+
+    @override_settings(SECURE_SSL_REDIRECT=True, SECURE_HSTS_SECONDS=3600, SECURE_PROXY_SSL_HEADER=None)
+    def test_plain_http_requests_are_upgraded_by_django(self):
+        # Security middleware reads the settings when created
+        self.application = FastRedirectWSGI(get_wsgi_application())
+        self.call(self.factory.get('/l/abcdeFGHIJ/', secure=True))
+
+        with self.assertNumQueries(0):
+            secure_status, secure_headers, _ = self.call(self.factory.get('/l/abcdeFGHIJ/', secure=True))
+        status, headers, _ = self.call(self.factory.get('/l/abcdeFGHIJ/'))
+
+        # Security middleware redirects to HTTPS, secure requests are answered with HSTS
+        self.assertEqual(status, 301)
+        self.assertEqual(headers['Location'], 'https://testserver/l/abcdeFGHIJ/')
+        self.assertEqual(secure_status, 302)
+        self.assertEqual(secure_headers['Strict-Transport-Security'], 'max-age=3600')
+
+    @override_settings(REDIRECT_MAX_AGE=0)
+    def test_response_matches_django(self):
+        django_status, django_headers, _ = self.call(self.factory.get('/l/abcdeFGHIJ/'))
+        # Hit counter and metrics middleware add no headers, the rest are added only by the fast lane
+        status, headers, _ = self.call(self.factory.get('/l/abcdeFGHIJ/'))
+
+        self.assertEqual(status, django_status)
+        for name in ('Location', 'Content-Type', 'Content-Length', 'Referrer-Policy', 'X-Content-Type-Options'):
+            self.assertEqual(headers[name], django_headers[name])
+
+
+class TestFastRedirectASGI(TestCase):
+    """
+    Tests answering redirects in front of Django under ASGI server
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        get_hit_counter().flush()
+        self.application = FastRedirectASGI(get_asgi_application())
+        test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=test_client)
+
+    async def call(self, path, root_path='', headers=(), method='GET', scheme='http'):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': method, 'scheme': scheme, 'path': root_path + path,
+                 'root_path': root_path, 'query_string': b'', 'headers': [(b'host', b'testserver'), *headers],
+                 'client': ('127.0.0.1', 1234)}
+        await self.application(scope, receive, send)
+        self.body = b''.join(message.get('body', b'') for message in messages[1:])
+        return messages[0]['status'], dict(messages[0]['headers'])
+
+    async def test_redirect_is_answered_without_django(self):
+        status, headers = await self.call('/l/abcdeFGHIJ/')
+        mounted_status, mounted_headers = await self.call('/l/abcdeFGHIJ/', root_path='/shortener')
+
+        self.assertEqual((status, mounted_status), (302, 302))
+        self.assertEqual(headers[b'Location'], b'http://www.wp.pl')
+        self.assertEqual(mounted_headers[b'Location'], b'http://www.wp.pl')
+        self.assertEqual(get_link_resolver().stats()['misses'], 1)
+
+    async def test_head_request_gets_no_body(self):
+        status, headers = await self.call('/l/abcdeFGHIJ/', method='HEAD')
+
+        self.assertEqual(status, 302)
+        self.assertEqual(headers[b'Content-Length'], b'0')
+        self.assertEqual(self.body, b'')
+
+    @override_settings(SECURE_SSL_REDIRECT=True, SECURE_HSTS_SECONDS=3600, SECURE_HSTS_INCLUDE_SUBDOMAINS=True,
+                       SECURE_PROXY_SSL_HEADER=('HTTP_X_FORWARDED_PROTO', 'https'))
+    async def test_plain_http_requests_are_upgraded_by_django(self):
+        self.application = FastRedirectASGI(get_asgi_application())
+        status, headers = await self.call('/l/abcdeFGHIJ/')
+        secure_status, secure_headers = await self.call('/l/abcdeFGHIJ/', scheme='https')
+        proxied_status, proxied_headers = await self.call('/l/abcdeFGHIJ/', headers=[(b'x-forwarded-proto', b'https')])
+
+        self.assertEqual(status, 301)
+        self.assertEqual(headers[b'Location'], b'https://testserver/l/abcdeFGHIJ/')
+        self.assertEqual((secure_status, proxied_status), (302, 302))
+        self.assertEqual(secure_headers[b'Strict-Transport-Security'], b'max-age=3600; includeSubDomains')
+        self.assertEqual(proxied_headers[b'Strict-Transport-Security'], b'max-age=3600; includeSubDomains')
+
+    async def test_unknown_link_reaches_django(self):
+        status, _ = await self.call('/l/unknown/')
+
+        self.assertEqual(status, 404)
+
+    async def test_client_address_is_taken_like_by_django(self):
+        with mock.patch.object(self.application, 'start', wraps=self.application.start) as start:
+            await self.call('/l/abcdeFGHIJ/')
+            await self.call('/l/abcdeFGHIJ/', headers=[(b'x-forwarded-for', b'10.0.0.5, 10.0.0.1')])
+
+        self.assertEqual(start.call_args_list, [mock.call('127.0.0.1'), mock.call('10.0.0.5')])
+
+    @override_settings(ALLOWED_HOSTS=['example.com'])
+    async def test_requests_for_other_hosts_reach_django(self):
+        status, _ = await self.call('/l/abcdeFGHIJ/')
+
+        self.assertEqual(status, 400)
+        self.assertEqual(get_link_resolver().stats()['misses'], 0)
@@ -0,0 +1,115 @@
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Link
+from ..utils.hit_counter import HitCounter, get_hit_counter
+from ..utils.link_cache import get_link_resolver
+from .test_models import LinkTest, ClientTest
+
+
+class TestHitCounter(TestCase):
+    """
+    Tests coalescing of redirect counts
+    """
+    def setUp(self):
+        self.test_client = ClientTest.create_client()
+        self.first_link = LinkTest.create_link(url_output='abcdeFGHIJ', client_instance=self.test_client)
+        self.second_link = LinkTest.create_link(url_output='KLMNOpqrst', client_instance=self.test_client)
+
+    def test_hits_are_written_in_one_query(self):
+        counter = HitCounter(flush_interval=60, max_pending=100)
+
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                counter.record(self.first_link.id)
+            counter.record(self.second_link.id)
+        with self.assertNumQueries(1):
+            flushed = counter.flush()
+
+        self.assertEqual(flushed, 4)
+        self.assertEqual(Link.objects.get(id=self.first_link.id).hits, 3)
+        self.assertEqual(Link.objects.get(id=self.second_link.id).hits, 1)
+        self.assertEqual(counter.stats()['pending_hits'], 0)
+
+    def test_flush_is_triggered_by_pending_limit_and_interval(self):
+        counter = HitCounter(flush_interval=10, max_pending=2)
+
+        with mock.patch('ShortenerIndex.utils.hit_counter.time.monotonic', return_value=counter._last_flush):
+            first_due = counter.add(self.first_link.id)
+            second_due = counter.add(self.first_link.id)
+        idle_counter = HitCounter(flush_interval=10, max_pending=100)
+        with mock.patch('ShortenerIndex.utils.hit_counter.time.monotonic',
+                        return_value=idle_counter._last_flush + 11):
+            late_due = idle_counter.add(self.first_link.id)
+
+        self.assertFalse(first_due)
+        self.assertTrue(second_due)
+        self.assertTrue(late_due)
+
+    def test_failed_hits_are_kept_pending(self):
+        counter = HitCounter(flush_interval=60, max_pending=100)
+        counter.record(self.first_link.id)
+        counter.record(self.first_link.id)
+
+        with mock.patch('ShortenerIndex.utils.hit_counter.Link.objects.filter', side_effect=DatabaseError), \
+                self.assertLogs('ShortenerIndex.utils.hit_counter', 'ERROR'):
+            failed = counter.flush()
+        counter.record(self.first_link.id)
+        flushed = counter.flush()
+
+        self.assertEqual(failed, 0)
+        self.assertEqual(flushed, 3)
+        self.assertEqual(Link.objects.get(id=self.first_link.id).hits, 3)
+
+    def test_hits_of_other_database_are_dropped(self):
+        counter = HitCounter(flush_interval=60, max_pending=100)
+        # Like hits recorded in a test database, which was destroyed before the flush
+        with mock.patch.dict(settings.DATABASES[DEFAULT_DB_ALIAS], NAME='other.sqlite3'):
+            counter.record(self.first_link.id)
+        counter.record(self.second_link.id)
+
+        with self.assertLogs('ShortenerIndex.utils.hit_counter', 'WARNING'):
+            flushed = counter.flush()
+
+        self.assertEqual(flushed, 1)
+        self.assertEqual(Link.objects.get(id=self.first_link.id).hits, 0)
+        self.assertEqual(Link.objects.get(id=self.second_link.id).hits, 1)
+
+    def test_counter_is_not_started_outside_of_workers(self):
+        with mock.patch('ShortenerIndex.utils.hit_counter._hit_counter', None):
+            self.assertIsNone(get_hit_counter()._thread)
+
+    def test_hits_are_flushed_by_thread(self):
+        # Thread isn't stopped, it never wakes up by itself again during tests
+        counter = HitCounter(flush_interval=3600, max_pending=2)
+        flushed = threading.Event()
+
+        # Flusher thread has its own connection, outside of the transaction of the test
+        with mock.patch.object(counter, 'flush', side_effect=lambda: flushed.set()), \
+                mock.patch('ShortenerIndex.utils.hit_counter.atexit.register') as register:
+            counter.start()
+            counter.start()
+            counter.record(self.first_link.id)
+            early = flushed.wait(0.05)
+            # Reaching max_pending wakes the thread up before flush_interval
+            counter.record(self.first_link.id)
+            woken = flushed.wait(5)
+
+        self.assertFalse(early)
+        self.assertTrue(woken)
+        register.assert_called_once()
+
+    @mock.patch('ShortenerIndex.utils.hit_counter._hit_counter', HitCounter(flush_interval=60))
+    def test_redirect_is_counted(self):
+        get_link_resolver().clear()
+
+        self.client.get(reverse('redirect', args=['abcdeFGHIJ']))
+        self.client.get(reverse('redirect', args=['abcdeFGHIJ']))
+        get_hit_counter().flush()
+
+        self.assertEqual(Link.objects.get(id=self.first_link.id).hits, 2)
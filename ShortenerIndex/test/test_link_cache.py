@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from ..utils.link_cache import LinkResolver, ResolvedLink
+from .test_models import LinkTest, ClientTest
+
+
+class TestLinkResolver(TestCase):
+    """
+    Tests two tier slug resolution cache
+    """
+    def setUp(self):
+        self.test_client = ClientTest.create_client()
+        self.test_link = LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ',
+                                              client_instance=self.test_client)
+        caches['default'].clear()
+
+    def test_warm_lookup_does_not_query_database(self):
+        resolver = LinkResolver()
+
+        with self.assertNumQueries(1):
+            first = resolver.resolve('abcdeFGHIJ')
+        with self.assertNumQueries(0):
+            second = resolver.resolve('abcdeFGHIJ')
+
+        self.assertEqual(first, ResolvedLink(id=self.test_link.id, url_input='www.wp.pl',
+                                             expiration_date=self.test_link.expiration_date))
+        self.assertEqual(second, first)
+        self.assertEqual(resolver.stats()['local_hits'], 1)
+        self.assertEqual(resolver.stats()['misses'], 1)
+
+    def test_unknown_and_invalid_slugs(self):
+        resolver = LinkResolver()
+
+        with self.assertNumQueries(0):
+            invalid = resolver.resolve('../admin')
+        unknown = resolver.resolve('doesNotExist')
+
+        self.assertIsNone(invalid)
+        self.assertIsNone(unknown)
+
+    def test_shared_tier_is_used_by_other_workers(self):
+        first_worker = LinkResolver(shared_alias='default')
+        second_worker = LinkResolver(shared_alias='default')
+
+        first_worker.resolve('abcdeFGHIJ')
+        with self.assertNumQueries(0):
+            resolved = second_worker.resolve('abcdeFGHIJ')
+
+        self.assertEqual(resolved.url_input, 'www.wp.pl')
+        self.assertEqual(second_worker.stats()['shared_hits'], 1)
+
+    def test_invalidate_removes_both_tiers(self):
+        resolver = LinkResolver(shared_alias='default')
+        resolver.resolve('abcdeFGHIJ')
+        self.test_link.delete()
+
+        resolver.invalidate('abcdeFGHIJ')
+
+        self.assertIsNone(resolver.resolve('abcdeFGHIJ'))
+
+    def test_local_ttl_and_size_limit(self):
+        resolver = LinkResolver(max_entries=1, local_ttl=10)
+        LinkTest.create_link(url_input='www.onet.pl', url_output='KLMNOpqrst', client_instance=self.test_client)
+
+        with mock.patch('ShortenerIndex.utils.link_cache.time.monotonic', return_value=100):
+            resolver.resolve('abcdeFGHIJ')
+            resolver.resolve('KLMNOpqrst')
+            evicted = resolver.get_local('abcdeFGHIJ')
+        with mock.patch('ShortenerIndex.utils.link_cache.time.monotonic', return_value=111):
+            expired = resolver.get_local('KLMNOpqrst')
+
+        self.assertIsNone(evicted)
+        self.assertIsNone(expired)
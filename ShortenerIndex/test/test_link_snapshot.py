@@ -0,0 +1,124 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Link
+from ..utils.link_cache import LinkResolver
+from ..utils.link_snapshot import LinkSnapshot, SnapshotReader, SnapshotError, write_snapshot
+from .test_models import LinkTest, ClientTest
+
+
+class TestLinkSnapshot(TestCase):
+    """
+    Tests building snapshot of links and resolving redirects from it
+    """
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'links.snapshot')
+        test_client = ClientTest.create_client()
+        self.links = [LinkTest.create_link(url_input=f'www.{name}.pl', url_output=slug, client_instance=test_client)
+                      for name, slug in (('wp', 'abcdeFGHIJ'), ('onet', 'Zyx'), ('interia', 'abcd1234'))]
+        expired = LinkTest.create_link(url_output='expired', client_instance=test_client)
+        Link.objects.filter(id=expired.id).update(expiration_date=timezone.now() - timedelta(hours=1))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_snapshot_contains_live_links(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+        snapshot = LinkSnapshot(self.path)
+
+        self.assertEqual(snapshot.count, 3)
+        self.assertEqual(snapshot.max_id, self.links[-1].id)
+        for link in self.links:
+            self.assertEqual(snapshot.get(link.url_output), (link.id, link.url_input, link.expiration_date))
+        for slug in ('expired', 'abcde', 'abcdeFGHIJK', 'A', 'zzz', ''):
+            self.assertIsNone(snapshot.get(slug))
+
+    def test_snapshot_is_readable_by_other_users(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+
+    def test_damaged_snapshot_is_not_used(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+        with open(self.path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.path) - 1)
+        resolver = LinkResolver(snapshot=SnapshotReader(self.path, reload_interval=0))
+
+        # Logged once, lookups fall through to the database
+        with self.assertLogs('ShortenerIndex.utils.link_snapshot', 'ERROR') as logs, self.assertNumQueries(2):
+            first = resolver.resolve('Zyx')
+            second = resolver.resolve('abcdeFGHIJ')
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual((first.url_input, second.url_input), ('www.onet.pl', 'www.wp.pl'))
+        self.assertEqual(resolver.stats()['snapshot_hits'], 0)
+
+    def test_rows_have_to_be_sorted(self):
+        rows = [('b', 1, 'www.wp.pl', timezone.now()), ('a', 2, 'www.wp.pl', timezone.now())]
+
+        with self.assertRaises(SnapshotError):
+            write_snapshot(self.path, rows, 1, timezone.now())
+
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_resolver_uses_snapshot_without_queries(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+        resolver = LinkResolver(snapshot=SnapshotReader(self.path, reload_interval=0))
+        created = LinkTest.create_link(url_output='created', client_instance=self.links[0].client)
+
+        with self.assertNumQueries(0):
+            resolved = resolver.resolve('abcdeFGHIJ')
+        # Links created after the snapshot are resolved from the database
+        with self.assertNumQueries(1):
+            resolved_created = resolver.resolve('created')
+        resolver.invalidate('Zyx')
+
+        self.assertEqual(resolved.url_input, 'www.wp.pl')
+        self.assertEqual(resolved_created.id, created.id)
+        self.assertEqual(resolver.stats()['snapshot_hits'], 1)
+        self.assertEqual(resolver.snapshot.get('Zyx'), None)
+
+    def test_links_deleted_by_other_workers_are_hidden(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+        deleting = LinkResolver(shared_alias='default', snapshot=SnapshotReader(self.path, reload_interval=0))
+        serving = LinkResolver(shared_alias='default', snapshot=SnapshotReader(self.path, reload_interval=0))
+        served = serving.resolve('Zyx')
+        Link.objects.filter(url_output='Zyx').delete()
+        deleting.invalidate('Zyx')
+
+        # Tombstone in the shared cache hides the link in the snapshot, it's looked up in the database
+        with self.assertNumQueries(1):
+            deleted = serving.resolve('Zyx')
+
+        self.assertEqual(served.url_input, 'www.onet.pl')
+        self.assertIsNone(deleted)
+
+    def test_old_snapshot_is_not_used(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+        reader = SnapshotReader(self.path, reload_interval=0, max_age=0)
+
+        self.assertIsNone(reader.get('Zyx'))
+        self.assertEqual(reader.stats()['links'], 3)
+
+    def test_replaced_snapshot_is_reloaded(self):
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+        reader = SnapshotReader(self.path, reload_interval=0)
+        reader.get('Zyx')
+        Link.objects.filter(url_output='Zyx').delete()
+        reader.discard('Zyx')
+        LinkTest.create_link(url_output='created', client_instance=self.links[0].client)
+
+        call_command('build_link_snapshot', self.path, stdout=StringIO())
+
+        self.assertIsNotNone(reader.get('created'))
+        self.assertIsNone(reader.get('Zyx'))
+        self.assertEqual(reader.stats()['links'], 3)
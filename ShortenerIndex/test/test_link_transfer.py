@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Client, Link
+from ..utils.link_fragments import get_links_version
+from .test_models import LinkTest, ClientTest
+
+COMPARED_FIELDS = ('url_output', 'url_input', 'client__client_address', 'client__is_banned', 'duration',
+                   'creation_date', 'expiration_date', 'hits', 'url_hash')
+
+
+class TestLinkTransfer(TestCase):
+    """
+    Tests exporting links to files and importing them back
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        test_client = ClientTest.create_client(test_ip='10.0.0.1')
+        banned_client = ClientTest.create_client(test_ip='10.0.0.2')
+        Client.objects.filter(id=banned_client.id).update(is_banned=True)
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=test_client)
+        LinkTest.create_link(url_input='www.onet.pl', url_output='Zyx', client_instance=test_client)
+        LinkTest.create_link(url_input='www.interia.pl', url_output='abcd1234', client_instance=banned_client)
+        Link.objects.filter(url_output='Zyx').update(hits=7, duration=5,
+                                                    creation_date=timezone.now() - timedelta(days=3),
+                                                    expiration_date=timezone.now() + timedelta(hours=5))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def links(self):
+        return list(Link.objects.order_by('url_output').values_list(*COMPARED_FIELDS))
+
+    def export(self, name):
+        path = os.path.join(self.directory.name, name)
+        call_command('export_links', path, stdout=StringIO())
+        return path
+
+    def test_links_are_restored_from_export(self):
+        exported = self.links()
+        for name in ('links.jsonl', 'links.csv', 'links.csv.gz'):
+            with self.subTest(name):
+                path = self.export(name)
+                Link.objects.all().delete()
+                Client.objects.all().delete()
+
+                call_command('import_links', path, '--batch-size', '2', stdout=StringIO())
+
+                self.assertEqual(self.links(), exported)
+                self.assertEqual(dict(Client.objects.values_list('client_address', 'urls_count')),
+                                 {'10.0.0.1': 2, '10.0.0.2': 1})
+
+    def test_existing_slugs_are_skipped_or_updated(self):
+        path = self.export('links.jsonl')
+        other_client = ClientTest.create_client(test_ip='10.0.0.3')
+        Link.objects.filter(url_output='Zyx').update(url_input='www.google.com', client=other_client)
+        Link.objects.filter(url_output='abcd1234').delete()
+        output = StringIO()
+
+        call_command('import_links', path, stdout=output)
+        skipped = Link.objects.get(url_output='Zyx')
+        call_command('import_links', path, '--update', stdout=StringIO())
+        updated = Link.objects.get(url_output='Zyx')
+
+        self.assertIn('created 1, updated 0 and skipped 2 links', output.getvalue())
+        self.assertEqual(skipped.url_input, 'www.google.com')
+        self.assertEqual((updated.url_input, updated.client.client_address), ('www.onet.pl', '10.0.0.1'))
+        # Previous owner of the updated link is recounted
+        self.assertEqual(dict(Client.objects.values_list('client_address', 'urls_count')),
+                         {'10.0.0.1': 2, '10.0.0.2': 1, '10.0.0.3': 0})
+
+    def test_previous_owners_of_updated_links_see_the_change(self):
+        path = self.export('links.jsonl')
+        other_client = ClientTest.create_client(test_ip='10.0.0.3')
+        Link.objects.filter(url_output='Zyx').update(client=other_client)
+        versions = {address: get_links_version(address) for address in ('10.0.0.1', '10.0.0.3')}
+
+        call_command('import_links', path, '--update', stdout=StringIO())
+
+        for address, version in versions.items():
+            self.assertNotEqual(get_links_version(address), version)
+
+    def test_links_created_concurrently_are_reported_as_skipped(self):
+        path = self.export('links.jsonl')
+        Link.objects.filter(url_output='abcd1234').delete()
+        other_client = ClientTest.create_client(test_ip='10.0.0.3')
+
+        bulk_create = Link.objects.bulk_create
+
+        def create_concurrently(links, **kwargs):
+            # Same slug saved by another process after the lookup of existing links
+            LinkTest.create_link(url_input='www.google.com', url_output='abcd1234', client_instance=other_client)
+            return bulk_create(links, **kwargs)
+
+        output = StringIO()
+        with mock.patch.object(Link.objects, 'bulk_create', side_effect=create_concurrently):
+            call_command('import_links', path, stdout=output)
+
+        self.assertIn('created 0, updated 0 and skipped 3 links', output.getvalue())
+        self.assertEqual(Link.objects.get(url_output='abcd1234').url_input, 'www.google.com')
+
+    def test_invalid_row_stops_import(self):
+        path = os.path.join(self.directory.name, 'links.jsonl')
+        with open(path, 'w') as file:
+            file.write(json.dumps({'url_output': 'bad slug', 'url_input': 'www.wp.pl'}) + '\n')
+
+        with self.assertRaisesMessage(CommandError, 'Line 1'):
+            call_command('import_links', path, stdout=StringIO())
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from collections import Counter
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Link, Client
+from ..utils.link_cache import get_link_resolver
+from ..utils.load_test import TrafficGenerator, write_traffic, read_traffic, seed_traffic_links, replay, \
+    summarize, compare_with_baseline, link_slug
+
+
+class TestTrafficGenerator(TestCase):
+    """
+    Tests generation of synthetic traffic
+    """
+    def test_traffic_is_deterministic_and_skewed(self):
+        first = list(TrafficGenerator(links=100, seed=1).generate(2000))
+        second = list(TrafficGenerator(links=100, seed=1).generate(2000))
+
+        endpoints = Counter(record['endpoint'] for record in first)
+        redirected = Counter(record['path'] for record in first if record['endpoint'] == 'redirect')
+
+        self.assertEqual(first, second)
+        self.assertGreater(endpoints['redirect'], 1400)
+        self.assertEqual(len(endpoints), 7)
+        # Most popular link gets more than 10% of redirects, with 100 links uniform share would be 1%
+        self.assertGreater(redirected.most_common(1)[0][1], endpoints['redirect'] / 10)
+
+    def test_write_and_read(self):
+        generator = TrafficGenerator(links=10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'requests.jsonl')
+            written = write_traffic(path, generator.header(), generator.generate(5))
+            header, records = read_traffic(path)
+
+        self.assertEqual(written, 5)
+        self.assertEqual(header['links'], 10)
+        self.assertEqual(len(records), 5)
+
+
+class TestReplay(TestCase):
+    """
+    Tests in-process replay of traffic and comparison with baseline
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        cache.clear()
+        self.generator = TrafficGenerator(links=20, links_per_client=2)
+        seed_traffic_links(self.generator.header())
+
+    def test_seeded_links_belong_to_clients(self):
+        self.assertEqual(Link.objects.count(), 20)
+        self.assertEqual(Client.objects.count(), 10)
+        self.assertEqual(Link.objects.get(url_output=link_slug(3)).client.client_address,
+                         Link.objects.get(url_output=link_slug(2)).client.client_address)
+
+    def test_replay_reports_every_endpoint(self):
+        samples = replay(list(self.generator.generate(300)))
+        summary = summarize(samples, wall_time=1.0)
+
+        self.assertEqual(summary['all']['requests'], 300)
+        self.assertEqual(summary['all']['throughput'], 300)
+        self.assertEqual(set(summary['redirect']['statuses']) - {'404'}, {'302'})
+        self.assertEqual(summary['api_list']['statuses'], {'200': summary['api_list']['requests']})
+        self.assertEqual(summary['api_list']['queries'], 1)
+        self.assertLessEqual(summary['redirect']['p50'], summary['redirect']['p99'])
+
+    def test_regressions_against_baseline(self):
+        baseline = {'redirect': {'p50': 1.0, 'p95': 2.0, 'queries': 1.0, 'throughput': 1000}}
+        same = {'redirect': {'p50': 1.1, 'p95': 2.1, 'queries': 1.0, 'throughput': 900}}
+        worse = {'redirect': {'p50': 1.1, 'p95': 4.0, 'queries': 2.0, 'throughput': 900}}
+
+        self.assertEqual(compare_with_baseline(same, baseline), [])
+        self.assertEqual(len(compare_with_baseline(worse, baseline)), 2)
@@ -0,0 +1,67 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient
+from django.urls import reverse
+
+from ..utils.link_cache import get_link_resolver
+from ..utils.metrics import RequestMetrics, get_request_metrics
+from .test_models import LinkTest, ClientTest
+
+
+class TestRequestMetrics(TestCase):
+    """
+    Tests histograms and their Prometheus text format
+    """
+    def test_render(self):
+        metrics = RequestMetrics()
+        metrics.record('redirect', 0.0002, 0.0, 0)
+        metrics.record('redirect', 0.003, 0.001, 2)
+
+        text = metrics.render()
+
+        self.assertIn('linkshortener_request_duration_seconds_bucket{view="redirect",le="0.0005"} 1', text)
+        self.assertIn('linkshortener_request_duration_seconds_bucket{view="redirect",le="0.005"} 2', text)
+        self.assertIn('linkshortener_request_duration_seconds_bucket{view="redirect",le="+Inf"} 2', text)
+        self.assertIn('linkshortener_request_duration_seconds_count{view="redirect"} 2', text)
+        self.assertIn('linkshortener_request_db_duration_seconds_bucket{view="redirect",le="0.001"} 2', text)
+        self.assertIn('linkshortener_request_queries_total{view="redirect"} 2', text)
+
+
+class TestMetricsMiddleware(TestCase):
+    """
+    Tests recording of requests per view and /metrics endpoint
+    """
+    def setUp(self):
+        get_request_metrics().clear()
+        get_link_resolver().clear()
+        cache.clear()
+        test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=test_client)
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('redirect', kwargs={'url_output': 'abcdeFGHIJ'}))
+        self.client.get(reverse('redirect', kwargs={'url_output': 'abcdeFGHIJ'}))
+        self.client.get('/does/not/exist/')
+
+        response = self.client.get(reverse('metrics'))
+        text = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('linkshortener_request_duration_seconds_count{view="index"} 1', text)
+        self.assertIn('linkshortener_request_duration_seconds_count{view="redirect"} 2', text)
+        self.assertIn('linkshortener_request_duration_seconds_count{view="unresolved"} 1', text)
+        # Index lists links of the client with one query, first redirect fetches the link,
+        # second redirect is served from cache
+        self.assertIn('linkshortener_request_queries_total{view="index"} 1', text)
+        self.assertIn('linkshortener_request_queries_total{view="redirect"} 1', text)
+
+    def test_queries_of_asgi_requests_are_recorded(self):
+        async def get_links():
+            return await AsyncClient().get(reverse('links-list'))
+
+        response = async_to_sync(get_links)()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('linkshortener_request_queries_total{view="links-list"} 1', get_request_metrics().render())
@@ -0,0 +1,77 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..utils.rate_limit import SharedTokenBuckets, get_rate_limiter
+
+
+class TestSharedTokenBuckets(TestCase):
+    """
+    Tests token buckets kept in memory mapped file
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'buckets')
+
+    def test_burst_and_refill(self):
+        buckets = SharedTokenBuckets(self.path, slots=16)
+
+        with mock.patch('ShortenerIndex.utils.rate_limit.time.monotonic', return_value=100):
+            burst = [buckets.take('index|127.0.0.1', rate=0.5, capacity=2) for _ in range(3)]
+            other_key = buckets.take('index|127.0.0.2', rate=0.5, capacity=2)
+        with mock.patch('ShortenerIndex.utils.rate_limit.time.monotonic', return_value=102):
+            refilled = buckets.take('index|127.0.0.1', rate=0.5, capacity=2)
+
+        self.assertEqual(burst, [0, 0, 2])
+        self.assertEqual(other_key, 0)
+        self.assertEqual(refilled, 0)
+
+    def test_buckets_written_before_reboot_are_full(self):
+        buckets = SharedTokenBuckets(self.path, slots=16)
+        with mock.patch('ShortenerIndex.utils.rate_limit.time.monotonic', return_value=1000000):
+            buckets.take('index|127.0.0.1', rate=0.5, capacity=1)
+
+        # Monotonic clock restarted from zero
+        with mock.patch('ShortenerIndex.utils.rate_limit.time.monotonic', return_value=100):
+            after_reboot = [buckets.take('index|127.0.0.1', rate=0.5, capacity=1) for _ in range(2)]
+
+        self.assertEqual(after_reboot, [0, 2])
+
+    def test_buckets_are_shared_through_file(self):
+        first_worker = SharedTokenBuckets(self.path, slots=16)
+        second_worker = SharedTokenBuckets(self.path, slots=16)
+
+        first_worker.take('index|127.0.0.1', rate=0.01, capacity=1)
+        limited = second_worker.take('index|127.0.0.1', rate=0.01, capacity=1)
+        second_worker.clear()
+        cleared = first_worker.take('index|127.0.0.1', rate=0.01, capacity=1)
+
+        self.assertGreater(limited, 0)
+        self.assertEqual(cleared, 0)
+
+
+class TestRateLimitMiddleware(TestCase):
+    """
+    Tests 429 responses of limited views
+    """
+    def setUp(self):
+        get_rate_limiter().clear()
+
+    @override_settings(RATE_LIMITS={('index', 'POST'): (1, 2)})
+    def test_limited_requests_are_rejected_before_view(self):
+        for _ in range(2):
+            self.client.post(reverse('index'), data={'url_input': 'www.wp.pl'})
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('index'), data={'url_input': 'www.wp.pl'})
+        other_method = self.client.get(reverse('index'))
+        other_client = self.client.post(reverse('index'), data={'url_input': 'www.wp.pl'},
+                                        REMOTE_ADDR='127.0.0.2')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(other_method.status_code, 200)
+        self.assertEqual(other_client.status_code, 200)
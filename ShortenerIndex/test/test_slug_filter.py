@@ -0,0 +1,182 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Link
+from ..utils.link_cache import get_link_resolver
+from ..utils.rate_limit import get_rate_limiter
+from ..utils.slug_filter import BloomFilter, SlugFilter
+from .test_models import LinkTest, ClientTest
+
+
+class TestBloomFilter(TestCase):
+    """
+    Tests membership answers, size and false positive rate of Bloom filter
+    """
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        for number in range(10000):
+            bloom.add(f'slug{number}')
+
+        false_positives = sum(f'other{number}' in bloom for number in range(10000))
+
+        self.assertTrue(all(f'slug{number}' in bloom for number in range(10000)))
+        self.assertLess(false_positives, 300)
+        self.assertAlmostEqual(bloom.false_positive_rate(), 0.01, delta=0.005)
+        # About 9.6 bits per item for 1% rate
+        self.assertEqual(bloom.memory_bytes, 11982)
+        self.assertEqual(bloom.hash_count, 7)
+
+
+def build_settled(slug_filter):
+    """
+    Builds filter of slug_filter with settle_window 0, the second build is preceded by a scan, so it's settled.
+    """
+    slug_filter.build()
+    slug_filter.build()
+
+
+class TestSlugFilter(TestCase):
+    """
+    Tests answering unknown slugs without queries and picking up links created elsewhere
+    """
+    def setUp(self):
+        self.test_client = ClientTest.create_client()
+        LinkTest.create_link(url_output='abcdeFGHIJ', client_instance=self.test_client)
+
+    def test_unknown_slugs_are_rejected_without_queries(self):
+        slug_filter = SlugFilter(refresh_interval=60, settle_window=0)
+
+        # Count and scan of links by each build
+        with self.assertNumQueries(4):
+            build_settled(slug_filter)
+        with self.assertNumQueries(0):
+            self.assertTrue(slug_filter.might_contain('abcdeFGHIJ'))
+            self.assertFalse(slug_filter.might_contain('doesNotExist'))
+        stats = slug_filter.stats()
+
+        self.assertEqual(stats['items'], 1)
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['memory_bytes'], 179720)
+
+    def test_unsettled_filter_reports_presence(self):
+        slug_filter = SlugFilter(refresh_interval=60)
+
+        unbuilt = slug_filter.might_contain('doesNotExist')
+        slug_filter.build()
+        first_build = slug_filter.might_contain('doesNotExist')
+        slug_filter.settle_window = 0
+        slug_filter.build()
+        settled = slug_filter.might_contain('doesNotExist')
+
+        self.assertTrue(unbuilt)
+        self.assertTrue(first_build)
+        self.assertFalse(settled)
+
+    def test_links_of_other_processes_are_picked_up_by_refresh(self):
+        slug_filter = SlugFilter(refresh_interval=60, settle_window=0)
+        build_settled(slug_filter)
+        LinkTest.create_link(url_output='created', client_instance=self.test_client)
+
+        before_refresh = slug_filter.might_contain('created')
+        with self.assertNumQueries(1):
+            slug_filter.refresh()
+        after_refresh = slug_filter.might_contain('created')
+
+        self.assertFalse(before_refresh)
+        self.assertTrue(after_refresh)
+
+    def test_late_commits_are_picked_up_within_settle_window(self):
+        slug_filter = SlugFilter(refresh_interval=1, settle_window=60)
+        with mock.patch('ShortenerIndex.utils.slug_filter.time') as clock:
+            clock.monotonic.return_value = 1000.0
+            slug_filter.build()
+            clock.monotonic.return_value = 1060.0
+            slug_filter.build()
+            later = LinkTest.create_link(url_output='later', client_instance=self.test_client)
+            Link.objects.filter(id=later.id).update(id=later.id + 10)
+            clock.monotonic.return_value = 1061.0
+            slug_filter.refresh()
+            # Row with smaller id, whose transaction committed after the previous scan
+            Link.objects.create(id=later.id + 5, url_input='www.wp.pl', url_output='early',
+                                client=self.test_client)
+            before_refresh = slug_filter.might_contain('early')
+            clock.monotonic.return_value = 1062.0
+            slug_filter.refresh()
+            after_refresh = slug_filter.might_contain('early')
+
+        self.assertFalse(before_refresh)
+        self.assertTrue(after_refresh)
+        self.assertTrue(slug_filter.might_contain('later'))
+
+    def test_stale_filter_reports_presence(self):
+        slug_filter = SlugFilter(refresh_interval=1, settle_window=60)
+        with mock.patch('ShortenerIndex.utils.slug_filter.time') as clock:
+            clock.monotonic.return_value = 1000.0
+            slug_filter.build()
+            clock.monotonic.return_value = 1060.0
+            slug_filter.build()
+            fresh = slug_filter.might_contain('doesNotExist')
+            clock.monotonic.return_value = 1200.0
+            stale = slug_filter.might_contain('doesNotExist')
+
+        self.assertFalse(fresh)
+        self.assertTrue(stale)
+
+    def test_filter_is_built_by_thread(self):
+        # Thread sleeps after the first update, past the end of the test
+        slug_filter = SlugFilter(refresh_interval=3600)
+        built = threading.Event()
+
+        with mock.patch.object(slug_filter, 'build', side_effect=built.set):
+            slug_filter.start()
+            slug_filter.start()
+
+            self.assertTrue(built.wait(5))
+        self.assertEqual(threading.enumerate().count(slug_filter._thread), 1)
+
+
+class TestRedirectFastPath(TestCase):
+    """
+    Tests 404 of unknown slugs served by the filter of link resolver
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        get_rate_limiter().clear()
+        cache.clear()
+        test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        LinkTest.create_link(url_output='abcdeFGHIJ', client_instance=test_client)
+        slug_filter = get_link_resolver().slug_filter
+        settle_window = mock.patch.object(slug_filter, 'settle_window', 0)
+        settle_window.start()
+        self.addCleanup(settle_window.stop)
+        self.addCleanup(slug_filter.clear)
+        build_settled(slug_filter)
+        self.client.get(reverse('redirect', args=['abcdeFGHIJ']))
+
+    def test_unknown_slug(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('redirect', args=['doesNotExist']))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_created_links_are_added_to_filter(self):
+        created = self.client.post(reverse('links-list'), data={'url_input': 'www.onet.pl'})
+        batch = self.client.post(reverse('links-batch'), data={'url_inputs': ['www.wp.pl']},
+                                 content_type='application/json')
+
+        created_response = self.client.get(reverse('redirect', args=[created.data['url_output']]))
+        batch_response = self.client.get(reverse('redirect', args=[batch.data[0]['url_output']]))
+
+        self.assertEqual(created_response.status_code, 302)
+        self.assertEqual(batch_response.status_code, 302)
+
+    def test_filter_is_reported_in_metrics(self):
+        text = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('linkshortener_slug_filter_items 1', text)
+        self.assertIn('linkshortener_slug_filter_false_positive_rate ', text)
+        self.assertIn('linkshortener_slug_filter_memory_bytes ', text)
@@ -0,0 +1,59 @@
+from django.test import TestCase
+
+from ..models import SlugSequence
+from ..utils.slugs import SlugAllocator, SlugCipher, encode_base62, decode_base62
+
+
+class TestSlugCipher(TestCase):
+    """
+    Tests base62 encoding and scrambling of sequence numbers
+    """
+    def test_base62_round_trip(self):
+        for number in (0, 61, 62, 3843, 218340105584895):
+            encoded = encode_base62(number, 8)
+
+            self.assertEqual(len(encoded), 8)
+            self.assertEqual(decode_base62(encoded), number)
+
+    def test_permutation_is_bijection(self):
+        cipher = SlugCipher(b'test-key', width=2)
+
+        slugs = [cipher.encode(number) for number in range(cipher.domain)]
+
+        self.assertEqual(len(set(slugs)), cipher.domain)
+        self.assertTrue(all(len(slug) == 2 for slug in slugs))
+        self.assertEqual([cipher.decode(slug) for slug in slugs[:100]], list(range(100)))
+
+    def test_consecutive_numbers_are_scrambled(self):
+        cipher = SlugCipher(b'test-key', width=8)
+
+        first, second = cipher.encode(1), cipher.encode(2)
+
+        self.assertNotEqual(first[:6], second[:6])
+        self.assertRaises(ValueError, cipher.encode, cipher.domain)
+
+
+class TestSlugAllocator(TestCase):
+    """
+    Tests reserving blocks of slugs from the database
+    """
+    def test_slugs_are_reserved_in_blocks(self):
+        allocator = SlugAllocator(block_size=10)
+
+        first = allocator.allocate()
+        with self.assertNumQueries(0):
+            rest = allocator.allocate_many(9)
+
+        self.assertEqual(len({first, *rest}), 10)
+        self.assertEqual(SlugSequence.objects.get(name='link').next_value, 10)
+
+    def test_workers_never_share_slugs(self):
+        first_worker = SlugAllocator(block_size=5)
+        second_worker = SlugAllocator(block_size=5)
+
+        slugs = first_worker.allocate_many(7) + second_worker.allocate_many(7) + first_worker.allocate_many(3)
+
+        self.assertEqual(len(set(slugs)), len(slugs))
+        # Requests larger than block size reserve exactly as many numbers as needed
+        self.assertEqual(second_worker.cipher.decode(slugs[7]), 7)
+        self.assertEqual(first_worker.cipher.decode(slugs[-1]), 16)
@@ -2,7 +2,7 @@ import string
 
 from django.test import TestCase
 
-from ..utils.utils import random_sequence
+from ..utils.utils import random_sequence, normalize_url, url_hash
 
 
 class TestUtils(TestCase):
@@ -22,3 +22,10 @@ class TestUtils(TestCase):
 
         self.assertTrue(uses_correct_signs)
         self.assertTrue(has_correct_length)
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url(' WWW.Example.com/Path/ '), 'http://www.example.com/Path')
+        self.assertEqual(normalize_url('https://example.com'), 'https://example.com')
+        self.assertEqual(url_hash('example.com/'), url_hash('http://EXAMPLE.com'))
+        self.assertNotEqual(url_hash('example.com'), url_hash('https://example.com'))
+        self.assertTrue(-2 ** 63 <= url_hash('example.com') < 2 ** 63)
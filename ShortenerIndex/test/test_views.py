@@ -1,15 +1,25 @@
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 
 from ..models import Link
 from ..models import Client as model_client
+from ..utils.link_cache import get_link_resolver
+from ..utils.rate_limit import get_rate_limiter
 from .test_models import LinkTest, ClientTest
 
 DOMAIN = settings.DEFAULT_DOMAIN[:-1]
 
 
 class TestIndexView(TestCase):
+    def setUp(self):
+        get_rate_limiter().clear()
+        cache.clear()
+
     def test_index_page_get(self):
         """
         If index page is accessible, it should return 200 status
@@ -62,12 +72,13 @@ class TestIndexView(TestCase):
         """
         Create 5 links, and test if no more can be created
         """
-        url_to_input = 'www.google.com'
+        # Distinct destinations, shortening the same one again returns the existing link
+        urls_to_input = [f'www.google.{domain}' for domain in ('com', 'pl', 'de', 'fr', 'it', 'es')]
         c = Client()
 
-        for i in range(6):
+        for url_to_input in urls_to_input:
             c.post(reverse('index'), data={'url_input': url_to_input})
-        response = c.post(reverse('index'), data={'url_input': url_to_input})
+        response = c.post(reverse('index'), data={'url_input': 'www.google.nl'})
         all_posts = Link.objects.all().count()
 
         self.assertEqual(response.status_code, 403)
@@ -75,6 +86,10 @@ class TestIndexView(TestCase):
 
 
 class TestRedirectView(TestCase):
+    def setUp(self):
+        get_link_resolver().clear()
+        get_rate_limiter().clear()
+        cache.clear()
 
     def test_link_redirection_without_http_prefix(self):
         """
@@ -93,6 +108,29 @@ class TestRedirectView(TestCase):
         self.assertEqual(full_url, expected_url)
         self.assertEqual(response.status_code, 302)
 
+    def test_redirect_cache_headers(self):
+        """
+        Tests that redirects may be cached until expiration of the link, and 301 is used if configured.
+        """
+        test_client = ClientTest.create_client()
+        LinkTest.create_link(url_output='asdfASDFas', client_instance=test_client)
+        expiring_link = LinkTest.create_link(url_output='qwerQWERqw', client_instance=test_client)
+        Link.objects.filter(id=expiring_link.id).update(expiration_date=timezone.now() + timedelta(seconds=30))
+
+        with self.settings(REDIRECT_MAX_AGE=300):
+            response = self.client.get(reverse('redirect', args=['asdfASDFas']))
+            expiring_response = self.client.get(reverse('redirect', args=['qwerQWERqw']))
+        with self.settings(REDIRECT_PERMANENT=True, REDIRECT_MAX_AGE=0):
+            permanent_response = self.client.get(reverse('redirect', args=['asdfASDFas']))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        self.assertFalse(response.has_header('Vary'))
+        self.assertIn(expiring_response['Cache-Control'], ('public, max-age=29', 'public, max-age=30'))
+        self.assertEqual(permanent_response.status_code, 301)
+        self.assertEqual(permanent_response['Location'], 'http://www.wp.pl')
+        self.assertFalse(permanent_response.has_header('Cache-Control'))
+
     def test_link_redirection_with_http_prefix(self):
         """
         Tests redirection from our website subpage, to intended URL (with http prefix).
@@ -148,4 +186,82 @@ class TestRedirectView(TestCase):
         post_exists = Link.objects.get(url_input=url_to_input)
 
         self.assertEqual(response.status_code, 403)
-        self.assertTrue(post_exists)
\ No newline at end of file
+        self.assertTrue(post_exists)
+
+    def test_unknown_link(self):
+        """
+        Unknown short link should result in 404 instead of server error
+        """
+        response = self.client.get(reverse('redirect', args=['doesNotExist']))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_deleted_link_is_not_served_from_cache(self):
+        """
+        Redirect is cached after first visit, deleting the link has to invalidate it
+        """
+        c = Client()
+        url_to_input = "www.wp.pl"
+
+        c.post(reverse('index'), data={'url_input': url_to_input})
+        found_url_output = Link.objects.get(url_input=url_to_input).url_output
+        first_response = c.get(reverse('redirect', args=[found_url_output]))
+        c.post(reverse('redirect', kwargs={'url_output': found_url_output}))
+        second_response = c.get(reverse('redirect', args=[found_url_output]))
+
+        self.assertEqual(first_response.status_code, 302)
+        self.assertEqual(second_response.status_code, 404)
+
+class TestLinksFragment(TestCase):
+    """
+    Tests caching of the table of client links on the main page
+    """
+    def setUp(self):
+        get_link_resolver().clear()
+        get_rate_limiter().clear()
+        cache.clear()
+        test_client = ClientTest.create_client(test_ip='127.0.0.1')
+        LinkTest.create_link(url_input='www.wp.pl', url_output='abcdeFGHIJ', client_instance=test_client)
+
+    def test_repeated_visit_is_rendered_from_cache(self):
+        first_response = self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            second_response = self.client.get(reverse('index'))
+
+        self.assertContains(first_response, 'abcdeFGHIJ')
+        self.assertContains(second_response, 'abcdeFGHIJ')
+        self.assertContains(second_response, 'formaction="/l/abcdeFGHIJ/"')
+
+    def test_created_and_deleted_links_invalidate_cache(self):
+        self.client.get(reverse('index'))
+        self.client.post(reverse('links-list'), data={'url_input': 'www.onet.pl'})
+        after_api_create = self.client.get(reverse('index'))
+        self.client.post(reverse('redirect', args=['abcdeFGHIJ']))
+        after_delete = self.client.get(reverse('index'))
+
+        self.assertContains(after_api_create, 'www.onet.pl')
+        self.assertContains(after_api_create, 'abcdeFGHIJ')
+        self.assertContains(after_delete, 'www.onet.pl')
+        self.assertNotContains(after_delete, 'abcdeFGHIJ')
+
+    def test_tables_of_clients_are_separate(self):
+        own_response = self.client.get(reverse('index'))
+        other_response = self.client.get(reverse('index'), REMOTE_ADDR='10.0.0.1')
+
+        self.assertContains(own_response, 'abcdeFGHIJ')
+        self.assertNotContains(other_response, 'abcdeFGHIJ')
+
+    def test_cached_delete_buttons_submit_csrf_token(self):
+        """
+        Cached table doesn't contain CSRF tokens, delete buttons submit the form rendered outside of it
+        """
+        c = Client(enforce_csrf_checks=True)
+        c.get(reverse('index'))
+        page = c.get(reverse('index')).content.decode()
+        delete_form = page[page.index('id="delete-link-form"'):]
+        token = delete_form.split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+
+        response = c.post(reverse('redirect', args=['abcdeFGHIJ']), data={'csrfmiddlewaretoken': token})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Link.objects.filter(url_output='abcdeFGHIJ').exists())
@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from .views import IndexView, RedirectView
+from .async_views import AsyncRedirectView
+from .views import IndexView, RedirectView, MetricsView
+
+redirect_view = AsyncRedirectView if settings.ASYNC_VIEWS else RedirectView
 
 urlpatterns = [
     path('', IndexView.as_view(), name="index"),
-    path('l/<str:url_output>/', RedirectView.as_view(), name="redirect"),
+    path('l/<str:url_output>/', redirect_view.as_view(), name="redirect"),
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', MetricsView.as_view(), name='metrics'))
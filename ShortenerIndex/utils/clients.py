@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ..models import Client, Link
+from .utils import get_client_ip, normalize_url, url_hash
+
+# Reasons of refused claim_links
+CLIENT_BANNED = 'banned'
+LINK_LIMIT_REACHED = 'limit'
+
+
+def resolve_client(request):
+    """
+    Returns Client making the request, creating it on first use. Client is fetched with a single query
+    and memoized on the request, so views and helpers called by them can resolve it repeatedly for free.
+    Accepts Django and DRF requests, DRF request shares the memoized client with the wrapped one.
+    """
+    request = getattr(request, '_request', request)
+    client = getattr(request, '_shortener_client', None)
+    if client is None:
+        client, _ = Client.objects.get_or_create(client_address=get_client_ip(request), defaults={'urls_count': 0})
+        request._shortener_client = client
+    return client
+
+
+def check_quota(client, count=1):
+    """
+    Returns CLIENT_BANNED or LINK_LIMIT_REACHED if the resolved client can't create count links, otherwise None.
+    Lets views refuse requests before validating their data, claim_links checks the quota again.
+    """
+    if client.is_banned:
+        return CLIENT_BANNED
+    if client.urls_count + count > settings.CLIENT_LINK_LIMIT:
+        return LINK_LIMIT_REACHED
+    return None
+
+
+def claim_links(client, count=1):
+    """
+    Reserves count links from the quota of the client with one conditional UPDATE, which checks the ban
+    and the limit again, so concurrent requests of the same client can't exceed the limit.
+    Clients which are already refused according to the resolved row don't cause any query.
+    Returns None if links were claimed, otherwise CLIENT_BANNED or LINK_LIMIT_REACHED.
+    """
+    refusal = check_quota(client, count)
+    if refusal is not None:
+        return refusal
+
+    claimed = Client.objects.filter(pk=client.pk, is_banned=False,
+                                    urls_count__lte=settings.CLIENT_LINK_LIMIT - count)\
+        .update(urls_count=F('urls_count') + count)
+    if claimed:
+        client.urls_count += count
+        return None
+    # Row changed since it was resolved, refresh it to tell which condition failed
+    client.refresh_from_db(fields=['urls_count', 'is_banned'])
+    return CLIENT_BANNED if client.is_banned else LINK_LIMIT_REACHED
+
+
+def release_links(client_id, count=1):
+    """
+    Returns count links to the quota of the client, after its links were deleted.
+    """
+    Client.objects.filter(pk=client_id).update(urls_count=F('urls_count') - count)
+
+
+def find_existing_link(client, url_input, duration=None):
+    """
+    Returns link of the client leading to the same destination, which expires no sooner than a new link
+    with the duration would, or None. Candidates are found by a single lookup of url_hash index,
+    and their URLs are compared, so hash collisions never return link to another destination.
+    """
+    requested = Link(url_input=url_input, duration=duration)
+    requested.apply_duration()
+    normalized = normalize_url(url_input)
+    candidates = Link.objects.filter(client=client, url_hash=url_hash(url_input),
+                                     expiration_date__gte=requested.expiration_date)
+    for link in candidates:
+        if normalize_url(link.url_input) == normalized:
+            return link
+    return None
+
+
+def recount_links(clients):
+    """
+    Sets urls_count of the clients from queryset to the number of their links, with a single UPDATE
+    counting links of every client by correlated subquery on the index on client.
+    Returns the number of updated clients.
+    """
+    links_count = Link.objects.filter(client=OuterRef('pk')).order_by().values('client')\
+        .annotate(count=Count('id')).values('count')
+    return clients.update(urls_count=Coalesce(Subquery(links_count), 0))
+
+
+def reconcile_links_counts(after_id=0, batch_size=1000):
+    """
+    Checks urls_count of up to batch_size clients with id greater than after_id, in order of id,
+    against their links counted by one grouped query. Mismatched clients are recounted by one UPDATE,
+    which counts links again at the time of update. Returns (greatest checked id or None, checked, fixed).
+    """
+    clients = list(Client.objects.filter(id__gt=after_id).order_by('id').values_list('id', 'urls_count')[:batch_size])
+    if not clients:
+        return None, 0, 0
+    counts = dict(Link.objects.filter(client_id__in=[client_id for client_id, _ in clients]).order_by()
+                  .values('client_id').annotate(count=Count('id')).values_list('client_id', 'count'))
+    mismatched = [client_id for client_id, urls_count in clients if urls_count != counts.get(client_id, 0)]
+    if mismatched:
+        recount_links(Client.objects.filter(id__in=mismatched))
+    return clients[-1][0], len(clients), len(mismatched)
@@ -0,0 +1,150 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections
+from django.db.models import BigIntegerField, F
+
+from ..models import Link
+from .utils import case_by_id
+
+logger = logging.getLogger(__name__)
+
+
+class HitCounter:
+    """
+    Counts redirects in memory of the worker process and writes them to Link.hits in one UPDATE ... CASE
+    statement, instead of one UPDATE per redirect.
+    Pending hits are flushed by a background thread every flush_interval seconds, or sooner when max_pending
+    hits were accumulated, so redirects never wait for the UPDATE. Remaining hits are flushed when the process
+    exits normally, only a killed process loses up to flush_interval seconds of hits. Hits which failed
+    to be written are kept pending and retried by the next flush.
+    The thread is started by wsgi.py and asgi.py only, other processes flush hits explicitly. Hits are kept
+    per database they were recorded in, so those of a destroyed test database are never written elsewhere.
+    """
+    def __init__(self, flush_interval=10, max_pending=1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = defaultdict(Counter)  # database name -> link id -> hits
+        self._pending_hits = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self.flushed_hits = 0
+        self.flushes = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(flush_interval=settings.HIT_COUNTER_FLUSH_INTERVAL,
+                   max_pending=settings.HIT_COUNTER_MAX_PENDING)
+
+    def add(self, link_id):
+        """
+        Counts the hit in memory only, returns True if pending hits should be flushed now.
+        """
+        database = current_database()
+        with self._lock:
+            self._pending[database][link_id] += 1
+            self._pending_hits += 1
+            return (self._pending_hits >= self.max_pending
+                    or time.monotonic() - self._last_flush >= self.flush_interval)
+
+    def record(self, link_id):
+        """
+        Counts the hit without any IO, wakes the flusher thread up if pending hits should be flushed.
+        """
+        if self.add(link_id):
+            self._wake.set()
+
+    def start(self):
+        """
+        Starts the flusher thread and registers flush at exit of the process, once.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='hit-counter-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                # Thread keeps its own connection, it's recycled like those of requests
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("Flusher of link hits failed")
+
+    def flush(self):
+        """
+        Writes pending hits to the database, returns number of written hits.
+        """
+        with self._lock:
+            pending_by_database, self._pending = self._pending, defaultdict(Counter)
+            self._pending_hits = 0
+            self._last_flush = time.monotonic()
+        database = current_database()
+        pending = pending_by_database.pop(database, None)
+        dropped = sum(sum(hits.values()) for hits in pending_by_database.values())
+        if dropped:
+            logger.warning("Dropped %s link hits recorded in another database", dropped)
+        if not pending:
+            return 0
+
+        # Most links get the same few hits between flushes, so CASE stays short
+        increment = case_by_id(pending, BigIntegerField())
+
+        total = sum(pending.values())
+        try:
+            Link.objects.filter(id__in=list(pending)).update(hits=F('hits') + increment)
+        except DatabaseError:
+            logger.exception("Failed to write %s link hits, they are retried by the next flush", total)
+            with self._lock:
+                self._pending[database].update(pending)
+                self._pending_hits += total
+            return 0
+
+        with self._lock:
+            self.flushed_hits += total
+            self.flushes += 1
+        return total
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_hits': self._pending_hits,
+                'flushed_hits': self.flushed_hits,
+                'flushes': self.flushes,
+            }
+
+
+def current_database():
+    """
+    Returns name of the database which hits are written to, test runners replace it with the test database.
+    """
+    return settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+
+
+_hit_counter = None
+_hit_counter_lock = threading.Lock()
+
+
+def get_hit_counter():
+    """
+    Returns counter shared by the whole worker process, creates it on first use.
+    """
+    global _hit_counter
+    if _hit_counter is None:
+        with _hit_counter_lock:
+            if _hit_counter is None:
+                _hit_counter = HitCounter.from_settings()
+    return _hit_counter
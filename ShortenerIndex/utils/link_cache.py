@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from ..models import Link
+from .link_snapshot import SnapshotReader
+from .slug_filter import SlugFilter
+
+# Fields of Link needed to answer a redirect, in the order they are cached.
+# RESOLVED_VERSION has to be bumped whenever the fields change, so old entries in shared cache are ignored.
+RESOLVED_FIELDS = ('id', 'url_input', 'expiration_date')
+RESOLVED_VERSION = 3
+
+
+class ResolvedLink(namedtuple('ResolvedLink', RESOLVED_FIELDS)):
+    __slots__ = ()
+
+    @property
+    def is_expired(self):
+        return self.expiration_date <= timezone.now()
+
+
+def is_valid_slug(slug):
+    """
+    Only ascii letters and digits are ever used in slugs, anything else can be rejected without lookups.
+    """
+    return 0 < len(slug) <= 255 and slug.isascii() and slug.isalnum()
+
+
+class LinkResolver:
+    """
+    Two tier slug -> Link resolver used by the redirect view.
+    First tier is a bounded LRU kept in memory of the worker process, second (optional) tier is a shared
+    django cache backend, so workers can reuse each other's lookups. Database is queried only when both miss.
+
+    Local entries can't be invalidated in other workers, so local_ttl is the upper bound
+    of how long a deleted link can still be served by them.
+    Optional slug_filter answers lookups of unknown slugs before both tiers, without any IO.
+    Optional snapshot (SnapshotReader) is memory mapped file shared by all workers, checked right after
+    the local tier, links created after it was built are resolved by the other tiers. Links deleted after
+    it was built are hidden in other workers by tombstones in the shared tier, checked on snapshot hits.
+    """
+    def __init__(self, max_entries=10000, local_ttl=60, shared_alias=None, shared_ttl=300, slug_filter=None,
+                 snapshot=None):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+        self.slug_filter = slug_filter
+        self.snapshot = snapshot
+
+        self._entries = OrderedDict()  # slug -> (expires_at, ResolvedLink)
+        self._lock = threading.Lock()
+
+        self.local_hits = 0
+        self.snapshot_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(max_entries=settings.LINK_CACHE_MAX_ENTRIES,
+                   local_ttl=settings.LINK_CACHE_LOCAL_TTL,
+                   shared_alias=settings.LINK_CACHE_SHARED_ALIAS,
+                   shared_ttl=settings.LINK_CACHE_SHARED_TTL,
+                   slug_filter=SlugFilter.from_settings() if settings.SLUG_FILTER_ENABLED else None,
+                   snapshot=SnapshotReader(settings.LINK_SNAPSHOT_PATH, settings.LINK_SNAPSHOT_RELOAD_INTERVAL,
+                                           settings.LINK_SNAPSHOT_MAX_AGE)
+                   if settings.LINK_SNAPSHOT_PATH else None)
+
+    @property
+    def shared_cache(self):
+        if self.shared_alias is None:
+            return None
+        return caches[self.shared_alias]
+
+    @staticmethod
+    def shared_key(slug):
+        return f'link:{slug}'
+
+    @staticmethod
+    def tombstone_key(slug):
+        return f'link-deleted:{slug}'
+
+    def get_local(self, slug):
+        """
+        Returns ResolvedLink from the in-process tier or None. Never does any IO.
+        """
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[slug]
+                return None
+            self._entries.move_to_end(slug)
+            self.local_hits += 1
+            return entry[1]
+
+    def get_snapshot(self, slug):
+        """
+        Returns ResolvedLink from the snapshot or None. Reads memory mapped file, hits are checked
+        for tombstone of the link in the shared tier.
+        """
+        if self.snapshot is None:
+            return None
+        row = self.snapshot.get(slug)
+        if row is None:
+            return None
+        shared_cache = self.shared_cache
+        if shared_cache is not None and shared_cache.get(self.tombstone_key(slug), version=RESOLVED_VERSION):
+            # Deleted by another worker, slug may have been reused by a new link since
+            return None
+        with self._lock:
+            self.snapshot_hits += 1
+        return ResolvedLink(*row)
+
+    def store_local(self, slug, resolved):
+        with self._lock:
+            self._entries[slug] = (time.monotonic() + self.local_ttl, resolved)
+            self._entries.move_to_end(slug)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resolve(self, slug):
+        """
+        Returns ResolvedLink for given slug, or None if link doesn't exist.
+        """
+        if not is_valid_slug(slug):
+            return None
+
+        resolved = self.get_local(slug) or self.get_snapshot(slug)
+        if resolved is not None:
+            return resolved
+        if self.slug_filter is not None and not self.slug_filter.might_contain(slug):
+            return None
+
+        shared_cache = self.shared_cache
+        if shared_cache is not None:
+            cached = shared_cache.get(self.shared_key(slug), version=RESOLVED_VERSION)
+            if cached is not None:
+                resolved = ResolvedLink(*cached)
+                with self._lock:
+                    self.shared_hits += 1
+                self.store_local(slug, resolved)
+                return resolved
+
+        with self._lock:
+            self.misses += 1
+        row = Link.objects.filter(url_output=slug).values_list(*RESOLVED_FIELDS).first()
+        if row is None:
+            return None
+
+        resolved = ResolvedLink(*row)
+        if shared_cache is not None:
+            shared_cache.set(self.shared_key(slug), tuple(resolved), self.shared_ttl, version=RESOLVED_VERSION)
+        self.store_local(slug, resolved)
+        return resolved
+
+    async def aresolve(self, slug):
+        """
+        Async variant of resolve, local tier is answered directly in the event loop,
+        only lookups in shared cache and database are run in a thread. Snapshot is checked in the event loop
+        only without shared tier, since its hits need a lookup of tombstone there.
+        """
+        if not is_valid_slug(slug):
+            return None
+        resolved = self.get_local(slug)
+        if resolved is None and self.shared_alias is None:
+            resolved = self.get_snapshot(slug)
+        if resolved is not None:
+            return resolved
+        if self.slug_filter is not None and not self.slug_filter.might_contain(slug):
+            return None
+        return await sync_to_async(self.resolve)(slug)
+
+    def start(self):
+        """
+        Starts building the slug filter in background, called once the worker process is up.
+        """
+        if self.slug_filter is not None:
+            self.slug_filter.start()
+
+    def register(self, *slugs):
+        """
+        Adds slugs of new links to the slug filter, has to be called whenever link is created.
+        """
+        if self.slug_filter is not None:
+            self.slug_filter.add(*slugs)
+
+    def invalidate(self, *slugs):
+        """
+        Removes links from both tiers, has to be called whenever link is deleted.
+        """
+        with self._lock:
+            for slug in slugs:
+                self._entries.pop(slug, None)
+        if self.slug_filter is not None:
+            self.slug_filter.discard(*slugs)
+        if self.snapshot is not None:
+            self.snapshot.discard(*slugs)
+        shared_cache = self.shared_cache
+        if shared_cache is not None and slugs:
+            valid_slugs = [slug for slug in slugs if is_valid_slug(slug)]
+            if self.snapshot is not None:
+                # Snapshots older than max_age aren't served, so tombstones don't need to outlive it
+                shared_cache.set_many({self.tombstone_key(slug): 1 for slug in valid_slugs},
+                                      self.snapshot.max_age, version=RESOLVED_VERSION)
+            shared_cache.delete_many([self.shared_key(slug) for slug in valid_slugs], version=RESOLVED_VERSION)
+
+    def clear(self):
+        """
+        Drops local tier and slug filter and resets counters, shared tier is left untouched.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.local_hits = self.snapshot_hits = self.shared_hits = self.misses = 0
+        if self.slug_filter is not None:
+            self.slug_filter.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'local_hits': self.local_hits,
+                'snapshot_hits': self.snapshot_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'local_entries': len(self._entries),
+            }
+
+
+_link_resolver = None
+_link_resolver_lock = threading.Lock()
+
+
+def get_link_resolver():
+    """
+    Returns resolver shared by the whole worker process, creates it on first use.
+    """
+    global _link_resolver
+    if _link_resolver is None:
+        with _link_resolver_lock:
+            if _link_resolver is None:
+                _link_resolver = LinkResolver.from_settings()
+    return _link_resolver
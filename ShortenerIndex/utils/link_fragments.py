@@ -0,0 +1,46 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def version_key(client_address):
+    return f'links-version:{client_address}'
+
+
+def get_links_version(client_address):
+    """
+    Returns current version of links table of the client, part of the key of its cached fragment.
+    Missing version is replaced with a new random one, so fragments rendered for any previous version
+    are never served again, even if the version was evicted from cache.
+    """
+    cache = caches[settings.LINKS_FRAGMENT_CACHE_ALIAS]
+    key = version_key(client_address)
+    version = cache.get(key)
+    if version is None:
+        version = secrets.token_hex(8)
+        if not cache.add(key, version, settings.LINKS_FRAGMENT_TTL):
+            # Another worker set the version in the meantime
+            version = cache.get(key, version)
+    return version
+
+
+def bump_links_version(*client_addresses):
+    """
+    Makes cached links tables of the clients stale, has to be called whenever their link is created or deleted.
+    """
+    if client_addresses:
+        caches[settings.LINKS_FRAGMENT_CACHE_ALIAS].delete_many([version_key(address)
+                                                                 for address in client_addresses])
+
+
+def links_fragment_context(client_address):
+    """
+    Returns template context of the cached links table of the client.
+    """
+    return {
+        'client_ip': client_address,
+        'links_version': get_links_version(client_address),
+        'links_fragment_ttl': settings.LINKS_FRAGMENT_TTL,
+        'links_fragment_cache': settings.LINKS_FRAGMENT_CACHE_ALIAS,
+    }
@@ -0,0 +1,200 @@
+import datetime
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+# Header: magic, width of slug keys, number of links, greatest id of a link in the snapshot,
+# start of the export in microseconds since epoch
+HEADER = struct.Struct('<8sQQQq')
+MAGIC = b'LSSNAP01'
+# Record of every link, in order of keys: id, expiration in microseconds since epoch, end of its URL in the blob
+RECORD = struct.Struct('<qqQ')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def to_microseconds(moment):
+    return (moment - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def write_snapshot(path, rows, key_width, started_at):
+    """
+    Writes snapshot of links from rows of (slug, id, url, expiration date), which have to be sorted by slug
+    bytes, as produced by "C" collation. Slugs are padded with zero bytes to key_width, which keeps the order.
+    started_at is the time when reading of rows started, links deleted later may still be in the snapshot.
+    File is written next to path and moved over it, so readers never see partially written snapshot.
+    Returns the number of written links.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    count = max_id = url_end = 0
+    previous_key = b''
+    with tempfile.TemporaryFile() as records, tempfile.TemporaryFile() as blob, \
+            tempfile.NamedTemporaryFile(dir=directory, delete=False) as output:
+        try:
+            output.write(HEADER.pack(MAGIC, key_width, 0, 0, 0))
+            for slug, link_id, url, expiration_date in rows:
+                key = slug.encode()
+                if len(key) > key_width or key <= previous_key:
+                    raise SnapshotError(f"Slug {slug!r} is longer than keys or not in ascending order")
+                previous_key = key
+                encoded_url = url.encode()
+                url_end += len(encoded_url)
+                output.write(key.ljust(key_width, b'\0'))
+                records.write(RECORD.pack(link_id, to_microseconds(expiration_date), url_end))
+                blob.write(encoded_url)
+                count += 1
+                max_id = max(max_id, link_id)
+            for part in (records, blob):
+                part.seek(0)
+                shutil.copyfileobj(part, output)
+            output.seek(0)
+            output.write(HEADER.pack(MAGIC, key_width, count, max_id, to_microseconds(started_at)))
+            output.flush()
+            os.fsync(output.fileno())
+        except BaseException:
+            os.unlink(output.name)
+            raise
+    # Temporary files are readable only by their owner, workers may run as another user
+    os.chmod(output.name, 0o644)
+    os.replace(output.name, path)
+    return count
+
+
+class LinkSnapshot:
+    """
+    Read-only view of a snapshot file mapped into memory. Pages of the file are shared by all processes
+    mapping it through the page cache, lookups binary search the sorted keys without loading the file.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            if self.stat.st_size < HEADER.size:
+                raise SnapshotError(f"{path} is not a link snapshot")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.key_width, self.count, self.max_id, started_at = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a link snapshot")
+        self.started_at = started_at / 1e6
+        self._records_start = HEADER.size + self.count * self.key_width
+        self._blob_start = self._records_start + self.count * RECORD.size
+        # URLs end where the file ends, anything else is a truncated or damaged file
+        url_end = 0
+        if self.count and self._blob_start <= len(self._map):
+            url_end = RECORD.unpack_from(self._map, self._blob_start - RECORD.size)[2]
+        if self._blob_start + url_end != len(self._map):
+            raise SnapshotError(f"{path} is truncated")
+
+    def get(self, slug):
+        """
+        Returns (id, url, expiration date) of the link with the slug, or None if it's not in the snapshot.
+        """
+        key = slug.encode()
+        if len(key) > self.key_width:
+            return None
+        key = key.ljust(self.key_width, b'\0')
+        snapshot_map, width, keys_start = self._map, self.key_width, HEADER.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            start = keys_start + middle * width
+            if snapshot_map[start:start + width] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or snapshot_map[keys_start + low * width:keys_start + (low + 1) * width] != key:
+            return None
+
+        link_id, expiration, url_end = RECORD.unpack_from(snapshot_map, self._records_start + low * RECORD.size)
+        url_start = 0
+        if low:
+            url_start = RECORD.unpack_from(snapshot_map, self._records_start + (low - 1) * RECORD.size)[2]
+        url = snapshot_map[self._blob_start + url_start:self._blob_start + url_end].decode()
+        return link_id, url, EPOCH + datetime.timedelta(microseconds=expiration)
+
+
+class SnapshotReader:
+    """
+    Snapshot at path, reopened when the file is replaced by a new snapshot, which is checked
+    at most every reload_interval seconds. Missing file means empty snapshot, as well as snapshot
+    whose export started more than max_age seconds ago, so links deleted since are never served for longer.
+
+    Snapshot which can't be opened is logged once and treated as missing, until the file is replaced.
+
+    Snapshot is immutable, so links deleted after it was built are hidden right away only in the process
+    which deleted them, LinkResolver hides them in other processes with tombstones in the shared cache.
+    """
+    def __init__(self, path, reload_interval=5.0, max_age=600):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.max_age = max_age
+        self._snapshot = None
+        self._checked_at = None
+        self._deleted = {}  # slug -> time of deletion
+        self._failed = None  # (inode, modification time) of the file which couldn't be opened
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._snapshot = None
+            return
+        version = (stat.st_ino, stat.st_mtime_ns)
+        current = self._snapshot
+        if current is not None and (current.stat.st_ino, current.stat.st_mtime_ns) == version \
+                or version == self._failed:
+            return
+        # Previous map is closed by garbage collector once no lookup uses it
+        try:
+            self._snapshot = LinkSnapshot(self.path)
+        except (OSError, ValueError, SnapshotError):
+            # Lookups go to the other tiers instead of failing every redirect
+            logger.exception("Can't open link snapshot %s, it's not used until it's replaced", self.path)
+            self._snapshot, self._failed = None, version
+            return
+        self._failed = None
+        # Links deleted before the export started aren't in the new snapshot
+        self._deleted = {slug: deleted_at for slug, deleted_at in self._deleted.items()
+                         if deleted_at >= self._snapshot.started_at}
+
+    @property
+    def snapshot(self):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.reload_interval:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= self.reload_interval:
+                    self._reload()
+                    self._checked_at = now
+        return self._snapshot
+
+    def get(self, slug):
+        snapshot = self.snapshot
+        if snapshot is None or slug in self._deleted or time.time() - snapshot.started_at > self.max_age:
+            return None
+        return snapshot.get(slug)
+
+    def discard(self, *slugs):
+        """
+        Hides deleted links of this process.
+        """
+        now = time.time()
+        with self._lock:
+            self._deleted.update((slug, now) for slug in slugs)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'links': snapshot.count if snapshot is not None else 0,
+            'max_id': snapshot.max_id if snapshot is not None else 0,
+            'age': time.time() - snapshot.started_at if snapshot is not None else 0.0,
+        }
@@ -0,0 +1,193 @@
+import contextlib
+import csv
+import datetime
+import gzip
+import json
+import sys
+
+from django.db import transaction
+from django.db.models import DateTimeField
+
+from ..models import Client, Link
+from .clients import recount_links
+from .link_cache import get_link_resolver, is_valid_slug
+from .link_fragments import bump_links_version
+from .utils import case_by_id
+
+# Columns of exported links, owner is identified by address and carries its ban
+TRANSFER_FIELDS = ('url_output', 'url_input', 'client_address', 'client_banned', 'duration',
+                   'creation_date', 'expiration_date', 'hits')
+EXPORTED_VALUES = ('url_output', 'url_input', 'client__client_address', 'client__is_banned', 'duration',
+                   'creation_date', 'expiration_date', 'hits')
+FORMATS = ('jsonl', 'csv')
+
+
+class TransferError(ValueError):
+    pass
+
+
+def guess_format(path):
+    """
+    Returns format of the file from its extension, files compressed with gzip keep the inner extension.
+    """
+    return 'csv' if path.endswith(('.csv', '.csv.gz')) else 'jsonl'
+
+
+@contextlib.contextmanager
+def open_transfer_file(path, mode):
+    """
+    Opens text file for export or import, '-' is standard output or input and paths ending with .gz are compressed.
+    """
+    if path == '-':
+        yield sys.stdout if mode == 'w' else sys.stdin
+    elif path.endswith('.gz'):
+        with gzip.open(path, mode + 't', encoding='utf-8', newline='') as file:
+            yield file
+    else:
+        with open(path, mode, encoding='utf-8', newline='') as file:
+            yield file
+
+
+def export_rows(chunk_size=10000):
+    """
+    Yields links as dicts of TRANSFER_FIELDS in order of id. Rows are streamed by iterator,
+    which uses server-side cursor on PostgreSQL, so memory use doesn't depend on the number of links.
+    """
+    rows = Link.objects.order_by('id').values_list(*EXPORTED_VALUES).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield dict(zip(TRANSFER_FIELDS, row))
+
+
+def write_rows(file, rows, file_format):
+    """
+    Writes rows to the text file, returns the number of written rows.
+    """
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, TRANSFER_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            row['client_banned'] = int(row['client_banned'])
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            file.write(json.dumps(row, default=datetime.datetime.isoformat))
+            file.write('\n')
+            count += 1
+    return count
+
+
+def read_rows(file, file_format):
+    """
+    Yields (line number, row dict) of rows in the text file.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as error:
+                    raise TransferError(f"Line {line_number}: {error}")
+
+
+def parse_row(line_number, row):
+    """
+    Returns Link built from the imported row, with client_address and client_banned of its owner
+    stored in attributes of the same names. CSV values are strings, so every value is converted.
+    """
+    try:
+        slug = row['url_output']
+        if not is_valid_slug(slug):
+            raise ValueError(f"invalid slug {slug!r}")
+        link = Link(url_output=slug, url_input=row['url_input'],
+                    duration=int(row['duration']) if row.get('duration') not in (None, '') else None,
+                    hits=int(row.get('hits') or 0))
+        for field in ('creation_date', 'expiration_date'):
+            # Exported dates are in ISO format
+            setattr(link, field, datetime.datetime.fromisoformat(row[field]))
+        link.client_address = row['client_address']
+        link.client_banned = str(row.get('client_banned', '')).lower() in ('1', 'true')
+    except (KeyError, TypeError, ValueError) as error:
+        raise TransferError(f"Line {line_number}: {error!r}")
+    link.apply_url_hash()
+    return link
+
+
+def upsert_clients(links):
+    """
+    Creates missing owners of the links and sets their bans, assigns client ids to the links.
+    """
+    banned = {link.client_address: link.client_banned for link in links}
+    Client.objects.bulk_create([Client(client_address=address, urls_count=0, is_banned=is_banned)
+                                for address, is_banned in banned.items()], ignore_conflicts=True)
+    for is_banned in (True, False):
+        addresses = [address for address, value in banned.items() if value == is_banned]
+        Client.objects.filter(client_address__in=addresses).exclude(is_banned=is_banned).update(is_banned=is_banned)
+    client_ids = dict(Client.objects.filter(client_address__in=list(banned)).values_list('client_address', 'id'))
+    for link in links:
+        link.client_id = client_ids[link.client_address]
+    return client_ids
+
+
+def restore_creation_dates(links, creation_dates, chunk_size=500):
+    """
+    Sets creation dates of the links inserted by bulk_create, which replaces them with the time of import
+    by auto_now_add, with UPDATE ... CASE statements of chunk_size rows. Inserted rows are found by slug,
+    rows with other owner or destination were created concurrently and skipped by the insert.
+    Returns slugs of inserted links.
+    """
+    imported = {link.url_output: (link.client_id, link.url_input) for link in links}
+    dates_by_id, inserted = {}, set()
+    rows = Link.objects.filter(url_output__in=list(imported)).values_list('url_output', 'id', 'client_id', 'url_input')
+    for slug, link_id, client_id, url_input in rows:
+        if imported[slug] == (client_id, url_input):
+            dates_by_id[link_id] = creation_dates[slug]
+            inserted.add(slug)
+    ids = list(dates_by_id)
+    for start in range(0, len(ids), chunk_size):
+        chunk = {link_id: dates_by_id[link_id] for link_id in ids[start:start + chunk_size]}
+        Link.objects.filter(id__in=list(chunk)).update(
+            creation_date=case_by_id(chunk, DateTimeField(), default=None))
+    return inserted
+
+
+def import_links(links, update=False):
+    """
+    Saves links parsed by parse_row in one transaction. Owners are upserted, links with slugs
+    which already exist are skipped, or overwritten with update, and link counts of owners are recounted.
+    Returns (created, updated, skipped).
+    """
+    count = len(links)
+    links = list({link.url_output: link for link in links}.values())
+    with transaction.atomic():
+        client_ids = upsert_clients(links)
+        existing = {slug: (link_id, client_id, address) for slug, link_id, client_id, address in
+                    Link.objects.filter(url_output__in=[link.url_output for link in links])
+                    .values_list('url_output', 'id', 'client_id', 'client__client_address')}
+        created = [link for link in links if link.url_output not in existing]
+        updated = [link for link in links if link.url_output in existing] if update else []
+        # Updated links are replaced by rows with the same ids, one DELETE and INSERT are much faster
+        # than bulk_update, which evaluates CASE over the whole batch for every row
+        previous_owners = {}  # client id -> address
+        for link in updated:
+            link.id, previous_client_id, previous_address = existing[link.url_output]
+            previous_owners[previous_client_id] = previous_address
+        if updated:
+            Link.objects.filter(id__in=[link.id for link in updated]).delete()
+        creation_dates = {link.url_output: link.creation_date for link in created + updated}
+        # Conflicts with links created since the lookup are skipped as well
+        Link.objects.bulk_create(created + updated, ignore_conflicts=True)
+        inserted = restore_creation_dates(created + updated, creation_dates)
+        # Updated links may move between clients, previous owners are recounted too
+        recount_links(Client.objects.filter(id__in=set(client_ids.values()) | set(previous_owners)))
+    if updated:
+        get_link_resolver().invalidate(*[link.url_output for link in updated])
+    bump_links_version(*client_ids, *previous_owners.values())
+    created_count = sum(link.url_output in inserted for link in created)
+    updated_count = sum(link.url_output in inserted for link in updated)
+    return created_count, updated_count, count - created_count - updated_count
@@ -0,0 +1,286 @@
+import json
+import random
+import string
+import time
+from collections import Counter, defaultdict
+from itertools import accumulate
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, Client as TestClient
+
+from ..models import Link, Client
+
+# Share of every endpoint in generated traffic, redirects dominate like in production
+DEFAULT_MIX = {
+    'redirect': 0.80,
+    'index_get': 0.06,
+    'index_post': 0.03,
+    'api_list': 0.04,
+    'api_retrieve': 0.03,
+    'api_create': 0.03,
+    'api_delete': 0.01,
+}
+
+SLUG_PREFIX = 'load'
+
+# Absolute latency difference in ms which is never reported as regression, protects fast endpoints from noise
+LATENCY_NOISE_FLOOR = 0.2
+
+
+def link_slug(number):
+    return f'{SLUG_PREFIX}{number}'
+
+
+def client_address(number):
+    return f'172.{16 + (number >> 16 & 15)}.{number >> 8 & 255}.{number & 255}'
+
+
+def zipf_cum_weights(count, exponent):
+    """
+    Cumulative weights of ranks 0..count-1 following Zipf distribution, rank 0 is the most popular.
+    """
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class TrafficGenerator:
+    """
+    Generates synthetic traffic against links seeded by seed_traffic_links.
+    Popularity of links and activity of clients follow Zipf distribution with the given exponent,
+    link number n belongs to the client number n // links_per_client. Popularity ranks are shuffled
+    over links, so the most active clients don't own the most popular links.
+    Same parameters and seed always produce the same traffic.
+    """
+    def __init__(self, links=10000, links_per_client=2, exponent=1.1, mix=None, seed=0):
+        self.links = links
+        self.links_per_client = links_per_client
+        self.clients = -(-links // links_per_client)
+        self.exponent = exponent
+        self.mix = mix or DEFAULT_MIX
+        self.seed = seed
+
+        self._random = random.Random(seed)
+        self._link_weights = zipf_cum_weights(self.links, exponent)
+        self._client_weights = zipf_cum_weights(self.clients, exponent)
+        self._deleted = set()
+        self._by_popularity = list(range(self.links))
+        self._random.shuffle(self._by_popularity)
+
+    def header(self):
+        return {
+            'links': self.links,
+            'links_per_client': self.links_per_client,
+            'exponent': self.exponent,
+            'seed': self.seed,
+        }
+
+    def generate(self, count):
+        endpoints = self._random.choices(list(self.mix), weights=list(self.mix.values()), k=count)
+        for endpoint in endpoints:
+            yield getattr(self, f'_{endpoint}')()
+
+    def _pick(self, cum_weights):
+        return self._random.choices(range(len(cum_weights)), cum_weights=cum_weights)[0]
+
+    def _url(self):
+        name = ''.join(self._random.choices(string.ascii_lowercase, k=10))
+        return f'www.{name}.com'
+
+    def _client_link(self, client):
+        """
+        Returns slug of not yet deleted seeded link of the client or of its first link if all were deleted.
+        """
+        numbers = range(client * self.links_per_client, min((client + 1) * self.links_per_client, self.links))
+        alive = [number for number in numbers if number not in self._deleted]
+        return self._random.choice(alive) if alive else numbers[0]
+
+    def _redirect(self):
+        # Visitors are not clients, they only follow links
+        visitor = self.clients + self._random.randrange(self.clients * 10)
+        number = self._by_popularity[self._pick(self._link_weights)]
+        return {'endpoint': 'redirect', 'method': 'GET', 'path': f'/l/{link_slug(number)}/',
+                'address': client_address(visitor)}
+
+    def _index_get(self):
+        return {'endpoint': 'index_get', 'method': 'GET', 'path': '/',
+                'address': client_address(self._pick(self._client_weights))}
+
+    def _index_post(self):
+        return {'endpoint': 'index_post', 'method': 'POST', 'path': '/',
+                'address': client_address(self._pick(self._client_weights)),
+                'data': {'url_input': self._url(), 'duration': 24}}
+
+    def _api_list(self):
+        return {'endpoint': 'api_list', 'method': 'GET', 'path': '/api/links/',
+                'address': client_address(self._pick(self._client_weights))}
+
+    def _api_retrieve(self):
+        client = self._pick(self._client_weights)
+        return {'endpoint': 'api_retrieve', 'method': 'GET',
+                'path': f'/api/links/{link_slug(self._client_link(client))}/', 'address': client_address(client)}
+
+    def _api_create(self):
+        return {'endpoint': 'api_create', 'method': 'POST', 'path': '/api/links/',
+                'address': client_address(self._pick(self._client_weights)),
+                'json': {'url_input': self._url()}}
+
+    def _api_delete(self):
+        client = self._pick(self._client_weights)
+        number = self._client_link(client)
+        self._deleted.add(number)
+        return {'endpoint': 'api_delete', 'method': 'DELETE',
+                'path': f'/api/links/{link_slug(number)}/', 'address': client_address(client)}
+
+
+def write_traffic(path, header, records):
+    """
+    Writes traffic as JSON lines, the first line holds parameters of seeded data.
+    """
+    written = 0
+    with open(path, 'w') as file:
+        file.write(json.dumps({'header': header}) + '\n')
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+            written += 1
+    return written
+
+
+def read_traffic(path):
+    with open(path) as file:
+        header = json.loads(file.readline())['header']
+        records = [json.loads(line) for line in file if line.strip()]
+    return header, records
+
+
+def seed_traffic_links(header, batch_size=5000):
+    """
+    Creates clients and links referenced by traffic generated with the given header.
+    """
+    links, links_per_client = header['links'], header['links_per_client']
+    clients = -(-links // links_per_client)
+    for start in range(0, clients, batch_size):
+        Client.objects.bulk_create([Client(client_address=client_address(number), urls_count=links_per_client)
+                                    for number in range(start, min(start + batch_size, clients))])
+    client_ids = dict(Client.objects.filter(client_address__startswith='172.')
+                      .values_list('client_address', 'id'))
+    for start in range(0, links, batch_size):
+        Link.objects.bulk_create([
+            Link(url_input='www.example.com', url_output=link_slug(number),
+                 client_id=client_ids[client_address(number // links_per_client)])
+            for number in range(start, min(start + batch_size, links))
+        ])
+
+
+def _request_kwargs(record, asgi):
+    # ASGI test client of Django 3.2 turns extra arguments into headers, get_client_ip reads the header first
+    kwargs = {'X-Forwarded-For': record['address']} if asgi else {'REMOTE_ADDR': record['address']}
+    if 'json' in record:
+        kwargs.update(data=json.dumps(record['json']), content_type='application/json')
+    elif 'data' in record:
+        # Submitted like the form in browser, multipart body of the ASGI test client can't be parsed in Django 3.2
+        kwargs.update(data=urlencode(record['data']), content_type='application/x-www-form-urlencoded')
+    return kwargs
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting executed queries, unlike CaptureQueriesContext it doesn't keep them.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def replay(records, asgi=False):
+    """
+    Sends records to the application in-process, one by one, through WSGI or ASGI handler.
+    Returns list of (endpoint, status code, latency in seconds, number of queries) samples.
+    """
+    counter = QueryCounter()
+    # Under ASGI the event loop runs in another thread, but thread sensitive sync code (views, ORM)
+    # runs in this one, so queries are counted on connection of this thread in both cases
+    with connection.execute_wrapper(counter):
+        if asgi:
+            return async_to_sync(_replay_asgi)(records, counter)
+        return _replay_wsgi(records, counter)
+
+
+def _replay_wsgi(records, counter):
+    client = TestClient()
+    samples = []
+    for record in records:
+        counter.count = 0
+        start = time.perf_counter()
+        response = getattr(client, record['method'].lower())(record['path'], **_request_kwargs(record, False))
+        samples.append((record['endpoint'], response.status_code, time.perf_counter() - start, counter.count))
+    return samples
+
+
+async def _replay_asgi(records, counter):
+    client = AsyncClient()
+    samples = []
+    for record in records:
+        counter.count = 0
+        start = time.perf_counter()
+        response = await getattr(client, record['method'].lower())(record['path'], **_request_kwargs(record, True))
+        samples.append((record['endpoint'], response.status_code, time.perf_counter() - start, counter.count))
+    return samples
+
+
+def _percentile(ordered, percent):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def summarize(samples, wall_time):
+    """
+    Aggregates replay samples per endpoint, key "all" holds the whole traffic.
+    Latencies are in milliseconds, throughput in requests per second.
+    """
+    grouped = defaultdict(list)
+    for sample in samples:
+        grouped[sample[0]].append(sample)
+        grouped['all'].append(sample)
+
+    summary = {}
+    for endpoint, endpoint_samples in sorted(grouped.items()):
+        latencies = sorted(elapsed * 1000 for _, _, elapsed, _ in endpoint_samples)
+        summary[endpoint] = {
+            'requests': len(endpoint_samples),
+            'throughput': len(endpoint_samples) / sum(latencies) * 1000 if sum(latencies) else 0.0,
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'queries': sum(queries for *_, queries in endpoint_samples) / len(endpoint_samples),
+            'statuses': dict(sorted(Counter(str(status) for _, status, _, _ in endpoint_samples).items())),
+        }
+    if samples:
+        summary['all']['throughput'] = len(samples) / wall_time if wall_time else 0.0
+    return summary
+
+
+def compare_with_baseline(summary, baseline, latency_tolerance=0.25):
+    """
+    Returns list of regressions of the summary against the baseline summary.
+    Query counts are deterministic, so any increase is a regression, latencies and throughput
+    may worsen by latency_tolerance (fraction) before being reported.
+    """
+    regressions = []
+    for endpoint, expected in baseline.items():
+        actual = summary.get(endpoint)
+        if actual is None:
+            continue
+        if actual['queries'] > expected['queries'] + 0.01:
+            regressions.append(f"{endpoint}: {actual['queries']:.2f} queries per request, "
+                               f"baseline {expected['queries']:.2f}")
+        for key in ('p50', 'p95'):
+            limit = max(expected[key] * (1 + latency_tolerance), expected[key] + LATENCY_NOISE_FLOOR)
+            if actual[key] > limit:
+                regressions.append(f"{endpoint}: {key} {actual[key]:.3f} ms, baseline {expected[key]:.3f} ms")
+        if endpoint == 'all' and actual['throughput'] < expected['throughput'] / (1 + latency_tolerance):
+            regressions.append(f"{endpoint}: throughput {actual['throughput']:.1f} req/s, "
+                               f"baseline {expected['throughput']:.1f} req/s")
+    return regressions
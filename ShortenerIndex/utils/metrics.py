@@ -0,0 +1,149 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Upper bounds of histogram buckets in seconds, +Inf bucket is implicit
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Database time and query count of the request being handled, see time_query
+_current_request = ContextVar('current_request_metrics', default=None)
+
+
+class RequestTimer:
+    """
+    Database time and query count of a single request.
+    """
+    __slots__ = ('db_time', 'queries')
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+
+
+def start_request():
+    """
+    Starts measuring queries of the request handled in current context, returns its timer
+    and token for finish_request. Sync code run by sync_to_async shares the context, so queries
+    of ASGI requests are measured as well.
+    """
+    timer = RequestTimer()
+    return timer, _current_request.set(timer)
+
+
+def finish_request(token):
+    _current_request.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding time of the query to the request handled in current context.
+    Installed on every connection, queries run outside of requests only pay for one context lookup.
+    """
+    timer = _current_request.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.db_time += time.perf_counter() - start
+        timer.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    Receiver of connection_created signal.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(DURATION_BUCKETS, value)] += 1
+        self.sum += value
+
+
+class ViewMetrics:
+    __slots__ = ('duration', 'db_duration', 'queries')
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.db_duration = Histogram()
+        self.queries = 0
+
+
+class RequestMetrics:
+    """
+    In process histograms of request wall time and database time, and query counts, per view name.
+    Every worker process keeps its own metrics, they are reset when the worker restarts.
+    """
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name, duration, db_duration, queries):
+        with self._lock:
+            metrics = self._views.get(view_name)
+            if metrics is None:
+                metrics = self._views[view_name] = ViewMetrics()
+            metrics.duration.observe(duration)
+            metrics.db_duration.observe(db_duration)
+            metrics.queries += queries
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """
+        Returns metrics in Prometheus text exposition format.
+        """
+        lines = []
+        # Rendering is rare and fast, redirects wait for the lock only while metrics are scraped
+        with self._lock:
+            views = sorted(self._views.items())
+            histograms = (
+                ('linkshortener_request_duration_seconds', 'Wall time of requests', 'duration'),
+                ('linkshortener_request_db_duration_seconds', 'Time spent in database queries by requests',
+                 'db_duration'),
+            )
+            for metric, description, attribute in histograms:
+                lines += [f'# HELP {metric} {description}.', f'# TYPE {metric} histogram']
+                for name, metrics in views:
+                    histogram = getattr(metrics, attribute)
+                    cumulative = 0
+                    for bound, count in zip(DURATION_BUCKETS + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{view="{name}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{view="{name}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{view="{name}"}} {cumulative}')
+
+            metric = 'linkshortener_request_queries_total'
+            lines += [f'# HELP {metric} Database queries executed by requests.', f'# TYPE {metric} counter']
+            for name, metrics in views:
+                lines.append(f'{metric}{{view="{name}"}} {metrics.queries}')
+        return '\n'.join(lines) + '\n'
+
+
+_request_metrics = None
+_request_metrics_lock = threading.Lock()
+
+
+def get_request_metrics():
+    """
+    Returns metrics shared by the whole worker process, creates them on first use.
+    """
+    global _request_metrics
+    if _request_metrics is None:
+        with _request_metrics_lock:
+            if _request_metrics is None:
+                _request_metrics = RequestMetrics()
+    return _request_metrics
@@ -0,0 +1,105 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows, buckets are then shared only by threads of one process
+    fcntl = None
+
+# Slot of a bucket: hash of its key, tokens left and time of the last update
+SLOT = struct.Struct('<Qdd')
+
+
+class SharedTokenBuckets:
+    """
+    Token buckets stored in memory mapped file, shared by all worker processes of one host.
+    Every bucket lives in a fixed slot chosen by hash of its key, bucket of another key colliding
+    on the slot is replaced, so the new key starts with full bucket. Checks are atomic, slot is locked
+    with fcntl record lock against other processes and with a thread lock against other threads.
+    Time is taken from monotonic clock, which is shared by processes of the host. Buckets updated
+    in the future were written before a reboot and start full.
+    """
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * SLOT.size
+        if os.fstat(self._fd).st_size < size:
+            # Concurrent workers extend the file to the same size, new bytes are zeroed, which means empty slot
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(path=settings.RATE_LIMIT_PATH, slots=settings.RATE_LIMIT_SLOTS)
+
+    @staticmethod
+    def key_hash(key):
+        # Zero marks empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def take(self, key, rate, capacity):
+        """
+        Takes a token from bucket of the key, refilled with rate tokens per second up to capacity.
+        Returns 0 if token was taken, otherwise number of seconds after which it will be available.
+        """
+        key_hash = self.key_hash(key)
+        offset = key_hash % self.slots * SLOT.size
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT.size, offset)
+            try:
+                stored_hash, tokens, updated = SLOT.unpack_from(self._map, offset)
+                now = time.monotonic()
+                # Monotonic clock starts again after reboot, while the file in temporary directory may remain
+                if stored_hash != key_hash or updated > now:
+                    tokens, updated = capacity, now
+                tokens = min(capacity, tokens + (now - updated) * rate)
+
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+                return wait
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT.size, offset)
+
+    def clear(self):
+        """
+        Empties buckets of all keys, in every process.
+        """
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                self._map[:] = bytes(len(self._map))
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Returns buckets of the worker process, opens the shared file on first use.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = SharedTokenBuckets.from_settings()
+    return _rate_limiter
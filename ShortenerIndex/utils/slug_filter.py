@@ -0,0 +1,291 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+
+from ..models import Link
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Bloom filter sized for capacity items with the given false positive rate.
+    Positions are derived from the builtin hash of the item (double hashing of its two halves),
+    which is randomized per process, so the filter must never be shared with other processes.
+    """
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, item):
+        """
+        Adds the item, items which seem to be present already are not counted again.
+        """
+        value = hash(item) & 0xFFFFFFFFFFFFFFFF
+        position, step = value & 0xFFFFFFFF, value >> 32 | 1
+        size, bits, added = self.size, self.bits, False
+        for _ in range(self.hash_count):
+            position %= size
+            index, mask = position >> 3, 1 << (position & 7)
+            if not bits[index] & mask:
+                bits[index] |= mask
+                added = True
+            position += step
+        if added:
+            self.count += 1
+
+    def __contains__(self, item):
+        # Same positions as in add, most absent items are rejected by the first few
+        value = hash(item) & 0xFFFFFFFFFFFFFFFF
+        position, step = value & 0xFFFFFFFF, value >> 32 | 1
+        size, bits = self.size, self.bits
+        for _ in range(self.hash_count):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+        return True
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def false_positive_rate(self):
+        """
+        Expected false positive rate with the number of added items.
+        """
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+class SlugFilter:
+    """
+    Bloom filter of slugs of all links, kept in memory of the worker process. Redirects to slugs
+    which are certainly absent are answered with 404 without any query.
+
+    Filter is built and refreshed by a background thread started with the worker, lookups never do any IO.
+    Rebuilt filter replaces the previous one only when it's complete, until the first one is built all slugs
+    are reported as present. Links created by this process are added right away, links created by other
+    processes are picked up by incremental scans of links with greater id every refresh_interval seconds.
+
+    Ids are assigned before commit, so a row may become visible after rows with greater ids were scanned.
+    Every scan starts from the greatest id seen by a scan which started settle_window seconds earlier,
+    so rows are picked up as long as their transaction is shorter than settle_window. The first filter
+    can't know which rows were uncommitted when it was built, its misses are reported as present
+    until it's rebuilt settle_window seconds later. Misses are reported as present as well when
+    the filter wasn't refreshed for settle_window seconds longer than expected, e.g. while the database
+    is unavailable.
+    Scans read the primary database, lagging replica could make them skip links for good.
+    Deleted slugs can't be removed from Bloom filter, they only raise false positive rate (their lookups
+    fall through to the database), so the filter is rebuilt every rebuild_interval seconds and
+    whenever it's filled over its capacity.
+    """
+    def __init__(self, error_rate=0.001, refresh_interval=1.0, rebuild_interval=3600, settle_window=60,
+                 min_capacity=100000, chunk_size=10000):
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.settle_window = settle_window
+        self.min_capacity = min_capacity
+        self.chunk_size = chunk_size
+
+        self._filter = None
+        self._settled = False  # misses of the filter are certain
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._scan_from = 0  # ids greater than this one are scanned by the next refresh
+        self._last_id = 0  # greatest id seen by scans
+        self._scans = deque()  # (start time, greatest id seen) of recent scans
+        self._added = None  # slugs added while the filter is being built
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.deleted = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(error_rate=settings.SLUG_FILTER_ERROR_RATE,
+                   refresh_interval=settings.SLUG_FILTER_REFRESH_INTERVAL,
+                   rebuild_interval=settings.SLUG_FILTER_REBUILD_INTERVAL,
+                   settle_window=settings.SLUG_FILTER_SETTLE_WINDOW)
+
+    def start(self):
+        """
+        Starts the thread which builds and refreshes the filter, once per process.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Thread of the parent doesn't survive fork of the worker
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='slug-filter', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                # Thread keeps its own connection, it's recycled like those of requests
+                close_old_connections()
+                if self._needs_build(time.monotonic()):
+                    self.build()
+                else:
+                    self.refresh()
+            except Exception:
+                logger.exception("Slug filter update failed")
+            time.sleep(self.refresh_interval)
+
+    def _scan(self, from_id):
+        """
+        Returns (id, slug) of links with id greater than from_id.
+        """
+        rows = Link.objects.using(DEFAULT_DB_ALIAS).filter(id__gt=from_id).order_by().values_list('id', 'url_output')
+        return rows.iterator(chunk_size=self.chunk_size)
+
+    def _record_scan(self, started, scanned_id):
+        """
+        Records finished scan, returns the id from which the next scan has to start.
+        """
+        self._last_id = max(self._last_id, scanned_id)
+        self._scans.append((started, self._last_id))
+        settled_at = started - self.settle_window
+        while len(self._scans) > 1 and self._scans[1][0] <= settled_at:
+            self._scans.popleft()
+        if self._scans[0][0] <= settled_at:
+            return self._scans[0][1]
+        return None
+
+    def build(self):
+        """
+        Builds new filter from slugs of all links and replaces the current one.
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._added = []
+            # Filter is settled if scans before its build cover transactions which were running during the build
+            settled = bool(self._scans) and self._scans[0][0] <= started - self.settle_window
+        capacity = max(self.min_capacity, Link.objects.using(DEFAULT_DB_ALIAS).count() * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        scanned_id = 0
+        for link_id, slug in self._scan(0):
+            bloom.add(slug)
+            scanned_id = max(scanned_id, link_id)
+        with self._lock:
+            for slug in self._added:
+                bloom.add(slug)
+            self._filter, self._settled, self._added = bloom, settled, None
+            self._built_at = self._refreshed_at = started
+            scan_from = self._record_scan(started, scanned_id)
+            self._scan_from = scanned_id if scan_from is None else scan_from
+            self.deleted = 0
+
+    def refresh(self):
+        """
+        Adds slugs of links which became visible since the previous scans.
+        """
+        started = time.monotonic()
+        with self._lock:
+            scan_from = self._scan_from
+        rows = list(self._scan(scan_from))
+        with self._lock:
+            if self._filter is None:
+                return
+            for _, slug in rows:
+                self._filter.add(slug)
+            scan_from = self._record_scan(started, max((link_id for link_id, _ in rows), default=scan_from))
+            if scan_from is not None:
+                self._scan_from = max(self._scan_from, scan_from)
+            self._refreshed_at = started
+
+    def _needs_build(self, now):
+        return (self._filter is None or now - self._built_at >= self.rebuild_interval
+                or not self._settled and now - self._built_at >= self.settle_window
+                or self._filter.count > self._filter.capacity)
+
+    def might_contain(self, slug):
+        """
+        Returns False if no link has the slug, True if it may exist. Never does any IO.
+        """
+        if self._pid is not None and self._pid != os.getpid():
+            self.start()
+        with self._lock:
+            if self._filter is None or slug in self._filter:
+                return True
+            stale = time.monotonic() - self._refreshed_at > self.refresh_interval + self.settle_window
+            if not self._settled or stale:
+                return True
+            self.rejected += 1
+            return False
+
+    def add(self, *slugs):
+        """
+        Adds slugs of links created by this process.
+        """
+        with self._lock:
+            if self._filter is not None:
+                for slug in slugs:
+                    self._filter.add(slug)
+            if self._added is not None:
+                self._added.extend(slugs)
+
+    def discard(self, *slugs):
+        """
+        Records deleted links, their slugs stay in the filter until it's rebuilt.
+        """
+        with self._lock:
+            self.deleted += len(slugs)
+
+    def clear(self):
+        """
+        Drops the filter, it's built again by the next update of the thread.
+        """
+        with self._lock:
+            self._filter, self._settled = None, False
+            self._scan_from = self._last_id = 0
+            self._scans.clear()
+            self.deleted = self.rejected = 0
+
+    def stats(self):
+        with self._lock:
+            if self._filter is None:
+                return {'items': 0, 'memory_bytes': 0, 'false_positive_rate': 0.0,
+                        'deleted': self.deleted, 'rejected': self.rejected}
+            return {
+                'items': self._filter.count,
+                'memory_bytes': self._filter.memory_bytes,
+                'false_positive_rate': self._filter.false_positive_rate(),
+                'deleted': self.deleted,
+                'rejected': self.rejected,
+            }
+
+    def render(self):
+        """
+        Returns stats in Prometheus text exposition format.
+        """
+        stats = self.stats()
+        metrics = (
+            ('linkshortener_slug_filter_items', 'gauge', 'Slugs added to the filter', stats['items']),
+            ('linkshortener_slug_filter_memory_bytes', 'gauge', 'Memory used by bits of the filter',
+             stats['memory_bytes']),
+            ('linkshortener_slug_filter_false_positive_rate', 'gauge',
+             'Expected false positive rate of the filter, deleted links are not included',
+             stats['false_positive_rate']),
+            ('linkshortener_slug_filter_deleted', 'gauge', 'Deleted links still present in the filter',
+             stats['deleted']),
+            ('linkshortener_slug_filter_rejected_total', 'counter', 'Lookups answered as missing by the filter',
+             stats['rejected']),
+        )
+        lines = []
+        for metric, metric_type, description, value in metrics:
+            lines += [f'# HELP {metric} {description}.', f'# TYPE {metric} {metric_type}', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
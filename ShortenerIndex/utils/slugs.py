@@ -0,0 +1,183 @@
+import hashlib
+import secrets
+import string
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import SlugSequence
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+ALPHABET_INDEX = {sign: index for index, sign in enumerate(ALPHABET)}
+
+
+def encode_base62(number, width):
+    """
+    Encodes non negative number as base62 string left padded to given width.
+    """
+    signs = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        signs.append(ALPHABET[remainder])
+    return ''.join(reversed(signs)).rjust(width, ALPHABET[0])
+
+
+def decode_base62(slug):
+    """
+    Decodes base62 string, raises ValueError for signs outside of the alphabet.
+    """
+    number = 0
+    for sign in slug:
+        try:
+            number = number * BASE + ALPHABET_INDEX[sign]
+        except KeyError:
+            raise ValueError(f"'{sign}' is not a base62 sign")
+    return number
+
+
+class SlugCipher:
+    """
+    Keyed bijection of numbers from range [0, 62 ** width) into base62 slugs of exactly that width.
+    Uses balanced feistel network with cycle walking, so consecutive numbers result in unrelated slugs
+    and different numbers always result in different slugs.
+    """
+    rounds = 4
+
+    def __init__(self, key, width):
+        self.key = key[:64]
+        self.width = width
+        self.domain = BASE ** width
+        self.half_bits = ((self.domain - 1).bit_length() + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+
+    def _round_function(self, round_number, value):
+        digest = hashlib.blake2b(value.to_bytes(8, 'big'), digest_size=8, key=self.key,
+                                 salt=round_number.to_bytes(16, 'big')).digest()
+        return int.from_bytes(digest, 'big') & self.half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round_number in range(self.rounds):
+            left, right = right, left ^ self._round_function(round_number, right)
+        return (left << self.half_bits) | right
+
+    def _decrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round_number in reversed(range(self.rounds)):
+            left, right = right ^ self._round_function(round_number, left), left
+        return (left << self.half_bits) | right
+
+    def permute(self, number):
+        if not 0 <= number < self.domain:
+            raise ValueError(f"{number} is out of range of {self.width} signs long slugs")
+        number = self._encrypt(number)
+        while number >= self.domain:
+            number = self._encrypt(number)
+        return number
+
+    def restore(self, number):
+        number = self._decrypt(number)
+        while number >= self.domain:
+            number = self._decrypt(number)
+        return number
+
+    def encode(self, number):
+        return encode_base62(self.permute(number), self.width)
+
+    def decode(self, slug):
+        """
+        Returns sequence number the slug was generated from, raises ValueError for foreign slugs.
+        """
+        if len(slug) != self.width:
+            raise ValueError(f"Slug has to be {self.width} signs long")
+        return self.restore(decode_base62(slug))
+
+
+class SlugAllocator:
+    """
+    Generates unique slugs without checking database for collisions.
+    Every worker reserves a block of sequence numbers from SlugSequence row at once, and encodes
+    numbers from it with SlugCipher. Blocks never overlap, so slugs are unique across processes and nodes.
+    Numbers left in the block when process exits are simply never used.
+    """
+    def __init__(self, width=8, block_size=100, sequence_name='link'):
+        self.width = width
+        self.block_size = block_size
+        self.sequence_name = sequence_name
+
+        self._cipher = None
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(width=settings.SLUG_LENGTH, block_size=settings.SLUG_BLOCK_SIZE)
+
+    @property
+    def cipher(self):
+        if self._cipher is None:
+            self._reserve(0)
+        return self._cipher
+
+    def _reserve(self, size):
+        """
+        Moves shared counter by size, returns reserved range of numbers.
+        Runs in its own transaction, so reservation is committed even if the caller's transaction
+        is rolled back later (otherwise another worker could get the same block).
+        """
+        with transaction.atomic(durable=True):
+            updated = SlugSequence.objects.filter(name=self.sequence_name)\
+                .update(next_value=F('next_value') + size)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        SlugSequence.objects.create(name=self.sequence_name, next_value=size,
+                                                    secret=secrets.token_hex(32))
+                except IntegrityError:
+                    # Another worker created the sequence in the meantime
+                    SlugSequence.objects.filter(name=self.sequence_name)\
+                        .update(next_value=F('next_value') + size)
+            end, secret = SlugSequence.objects.filter(name=self.sequence_name)\
+                .values_list('next_value', 'secret').get()
+
+        if self._cipher is None:
+            self._cipher = SlugCipher(secret.encode(), self.width)
+        return end - size, end
+
+    def allocate_many(self, count):
+        """
+        Returns list of count new unique slugs.
+        """
+        with self._lock:
+            numbers = []
+            while len(numbers) < count:
+                if self._next >= self._end:
+                    self._next, self._end = self._reserve(max(self.block_size, count - len(numbers)))
+                taken = min(self._end - self._next, count - len(numbers))
+                numbers.extend(range(self._next, self._next + taken))
+                self._next += taken
+            cipher = self._cipher
+        return [cipher.encode(number) for number in numbers]
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+
+_slug_allocator = None
+_slug_allocator_lock = threading.Lock()
+
+
+def get_slug_allocator():
+    """
+    Returns allocator shared by the whole worker process, creates it on first use.
+    """
+    global _slug_allocator
+    if _slug_allocator is None:
+        with _slug_allocator_lock:
+            if _slug_allocator is None:
+                _slug_allocator = SlugAllocator.from_settings()
+    return _slug_allocator
@@ -1,5 +1,10 @@
+import hashlib
 import random
 import string
+from collections import defaultdict
+from urllib.parse import urlsplit, urlunsplit
+
+from django.db.models import Case, Value, When
 
 
 def random_sequence(length):
@@ -13,3 +18,36 @@ def get_client_ip(request):
     else:
         ip = request.META.get('REMOTE_ADDR')
     return ip
+
+
+def case_by_id(values_by_id, output_field, default=0):
+    """
+    Builds CASE expression returning value assigned to the id of the row, for bulk UPDATE of many rows.
+    Ids with equal values are grouped into one WHEN, which keeps the expression short.
+    """
+    ids_by_value = defaultdict(list)
+    for row_id, value in values_by_id.items():
+        ids_by_value[value].append(row_id)
+    return Case(*[When(id__in=ids, then=Value(value)) for value, ids in ids_by_value.items()],
+                default=Value(default), output_field=output_field)
+
+
+def normalize_url(url):
+    """
+    Returns destination URL in the form used to find duplicates. Scheme is added like redirects do it,
+    scheme and host are lowercased and trailing slashes of the path are removed.
+    """
+    url = url.strip()
+    # Same rule as in redirect_to_link, so URLs which redirect to the same place are equal
+    if not url.startswith('http'):
+        url = 'http://' + url
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query,
+                       parts.fragment))
+
+
+def url_hash(url):
+    """
+    Returns signed 64 bit hash of normalized URL, stored in indexed Link.url_hash column.
+    """
+    return int.from_bytes(hashlib.blake2b(normalize_url(url).encode(), digest_size=8).digest(), 'big', signed=True)
@@ -1,12 +1,24 @@
-from django.http import HttpResponse, HttpResponseRedirect, HttpResponseForbidden
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponsePermanentRedirect, HttpResponseForbidden, \
+    HttpResponseGone, Http404
 from django.shortcuts import render
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.views import View
 
 from .forms import ShortenLinkForm
-from .models import Link, Client
+from .models import Link
 
-from .utils.utils import random_sequence, get_client_ip
+from .utils.clients import resolve_client, claim_links, release_links, find_existing_link, \
+    CLIENT_BANNED, LINK_LIMIT_REACHED
+from .utils.hit_counter import get_hit_counter
+from .utils.link_cache import get_link_resolver
+from .utils.link_fragments import bump_links_version, links_fragment_context
+from .utils.metrics import get_request_metrics
+from .utils.slugs import get_slug_allocator
+from .utils.utils import get_client_ip
 
 
 class IndexView(View):
@@ -18,12 +30,14 @@ class IndexView(View):
         """
         form = ShortenLinkForm()
         client_ip = get_client_ip(request)
-        current_user_data = Link.objects.filter(client__client_address=client_ip).select_related('client')
+        # Queried only if cached table of links is stale
+        current_user_data = Link.objects.filter(client__client_address=client_ip)
         base_url = request.build_absolute_uri('/l/')
         context = {
             'form': form,
             'current_user_data': current_user_data,
             'base_url': base_url,
+            **links_fragment_context(client_ip),
         }
 
         return render(request, 'ShortenerIndex/index.html', context=context)
@@ -36,65 +50,50 @@ class IndexView(View):
 
         """
         form = ShortenLinkForm(request.POST or None)
+        client_ip = get_client_ip(request)
+        # Data for displaying users created short links, queried only if cached table of links is stale
         context = {
             'form': form,
+            'current_user_data': Link.objects.filter(client__client_address=client_ip),
+            'base_url': request.build_absolute_uri('/l/'),
+            **links_fragment_context(client_ip),
         }
 
-        # Data for displaying users created short links
-        base_url = request.build_absolute_uri('/l/')
-        client_ip = get_client_ip(request)
-
-        current_user_data = None
-        try:
-            # User exists, template can display his links
-            current_user_data = Link.objects.filter(client__client_address=client_ip).select_related('client')
-            context['current_user_data'] = current_user_data
-        except Link.DoesNotExist:
-            # User does not exist, he'll be created later, when he attempts to shorten link
-            pass
-
-        context['base_url'] = base_url
-
         # link shortening
         if form.is_valid():
-            slug = random_sequence(10)
-
-            # Try creating string not present already in db for input url 10 times
-            attempt = 0
-            while Link.objects.filter(url_output=slug).count() != 0:
-                slug = random_sequence(10)
-                if attempt > 10:
-                    return HttpResponse("<h1>Failed to generate unique short link</h1>")  # todo: Use template here
-                attempt += 1
-
-            # check if user exists, create user if needed, check if he's allowed to shorten links
-            requester_ip = get_client_ip(request)
-            if not Client.objects.filter(client_address=requester_ip).exists():
-                selected_client = Client(client_address=requester_ip)
-                selected_client.save()
-
-            else:
-                selected_client = Client.objects.get(client_address=requester_ip)
-
-                # check if user is allowed to shorten links and return page with error if needed
-                if selected_client.is_banned is True:
-                    context['shortening_error'] = "You are banned from shortening links!"
-                    return render(request, 'ShortenerIndex/index.html', context=context, status=403)
-                if selected_client.urls_count >= 5:
-                    context['shortening_error'] = "You have reached 5 shortened links limit. " \
-                                                 "Remove at least one of your old links and try again!"
-                    return render(request, 'ShortenerIndex/index.html', context=context, status=403)
-
-                selected_client.urls_count += 1
-                selected_client.save()
-
+            selected_client = resolve_client(request)
             url = form.cleaned_data["url_input"]
-            new_url = Link(url_input=url, url_output=slug, client=selected_client)
-            new_url.save()
-
-            # Pass info on users links, so they can be displayed in template
-            current_user_data = Link.objects.filter(client__client_address=client_ip).select_related('client')
-            context['current_user_data'] = current_user_data
+            # Limit is checked by claim_links, existing links are returned even to clients at the limit
+            refusal = CLIENT_BANNED if selected_client.is_banned else None
+            existing = None
+            if refusal is None:
+                # Shortening the same destination again returns the existing link, without using the quota
+                existing = find_existing_link(selected_client, url, form.cleaned_data["duration"])
+            if refusal is None and existing is None:
+                # Allocated slugs are unique, no need to check database for collisions. Slug is reserved
+                # outside of the transaction, reservation must not be rolled back
+                slug = get_slug_allocator().allocate()
+                with transaction.atomic():
+                    # Quota and ban are checked again by a single UPDATE, rolled back if the link can't be saved
+                    refusal = claim_links(selected_client)
+                    if refusal is None:
+                        Link(url_input=url, url_output=slug, client=selected_client,
+                             duration=form.cleaned_data["duration"]).save()
+            if refusal == CLIENT_BANNED:
+                context['shortening_error'] = "You are banned from shortening links!"
+                return render(request, 'ShortenerIndex/index.html', context=context, status=403)
+            if refusal == LINK_LIMIT_REACHED:
+                context['shortening_error'] = f"You have reached {settings.CLIENT_LINK_LIMIT} shortened links " \
+                                             "limit. Remove at least one of your old links and try again!"
+                return render(request, 'ShortenerIndex/index.html', context=context, status=403)
+
+            if existing is not None:
+                slug = existing.url_output
+            else:
+                get_link_resolver().register(slug)
+                # Table of links is rendered again, with the new link
+                bump_links_version(client_ip)
+                context.update(links_fragment_context(client_ip))
 
             # Full url leading to shortened link
             shortened_url = request.build_absolute_uri('/l/' + slug)
@@ -105,32 +104,74 @@ class IndexView(View):
         return render(request, 'ShortenerIndex/index.html', context=context)
 
 
+def redirect_max_age(data):
+    """
+    Returns seconds for which browsers and proxies may cache redirect of the link, never past its expiration.
+    """
+    seconds_left = (data.expiration_date - timezone.now()).total_seconds()
+    return max(0, min(settings.REDIRECT_MAX_AGE, int(seconds_left)))
+
+
+def redirect_to_link(data):
+    """
+    Returns response redirecting to the destination of resolved link, used by sync and async redirect views.
+    Redirects and gone responses may be cached by shared caches, they are the same for every client.
+    """
+    if data is None:
+        raise Http404("Link not found")
+    if data.is_expired:
+        response = HttpResponseGone()
+        if settings.REDIRECT_MAX_AGE:
+            patch_cache_control(response, public=True, max_age=settings.REDIRECT_MAX_AGE)
+        return response
+
+    # Without this check, django could redirect user to subpage of our page in some cases
+    url = data.url_input if data.url_input.startswith("http") else "http://" + data.url_input
+    response_class = HttpResponsePermanentRedirect if settings.REDIRECT_PERMANENT else HttpResponseRedirect
+    response = response_class(url)
+    if settings.REDIRECT_MAX_AGE:
+        patch_cache_control(response, public=True, max_age=redirect_max_age(data))
+    return response
+
+
 class RedirectView(View):
     """
     Redirect to external website using slug argument
     """
     # Redirects user to proper URL using shortened link
     def get(self, request, url_output):
-        data = Link.objects.filter(url_output=url_output).first()
-
-        # Without this check, django could redirect user to subpage of our page in some cases
-        if data.url_input.startswith("http"):
-            return HttpResponseRedirect(data.url_input)
-        return HttpResponseRedirect("http://" + data.url_input)
+        data = get_link_resolver().resolve(url_output)
+        if data is not None and not data.is_expired and settings.HIT_COUNTER_ENABLED:
+            get_hit_counter().record(data.id)
+        return redirect_to_link(data)
 
     # Used for deletion of specific link, and lowering link count for specific user
     def post(self, request, url_output):
+        try:
+            # Owner of the link is fetched by the same query
+            link = Link.objects.select_related('client').only('client__client_address').get(url_output=url_output)
+        except Link.DoesNotExist:
+            raise Http404("Link not found")
 
-        client_ip = get_client_ip(request)
-        current_user_data = Link.objects.select_related('client').get(url_output=url_output)
+        if link.client.client_address != get_client_ip(request):
+            return HttpResponseForbidden()
 
-        current_link = Link.objects.get(url_output=url_output)
-        current_user = Client.objects.get(client_address=current_user_data.client.client_address)
+        deleted, _ = link.delete()
+        # Link may have been deleted concurrently, e.g. by purge of expired links, which lowered the count
+        if deleted:
+            release_links(link.client_id)
+        bump_links_version(link.client.client_address)
+        get_link_resolver().invalidate(url_output)
+        return HttpResponseRedirect(reverse('index'))
 
-        if current_user_data.client.client_address == client_ip:
-            current_user.urls_count -= 1
-            current_user.save()
-            current_link.delete()
-            return HttpResponseRedirect(reverse('index'))
-        else:
-            return HttpResponseForbidden()
+
+class MetricsView(View):
+    """
+    Exposes request metrics of this worker process in Prometheus text format.
+    """
+    def get(self, request):
+        text = get_request_metrics().render()
+        slug_filter = get_link_resolver().slug_filter
+        if slug_filter is not None:
+            text += slug_filter.render()
+        return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')